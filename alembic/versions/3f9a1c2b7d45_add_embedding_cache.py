@@ -0,0 +1,49 @@
+"""add embedding cache
+
+Revision ID: 3f9a1c2b7d45
+Revises: e84bd2b1d17e
+Create Date: 2026-10-18 09:12:41.118204
+
+"""
+
+import pgvector
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9a1c2b7d45"
+down_revision: Union[str, Sequence[str], None] = "e84bd2b1d17e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "embedding_cache",
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("model", sa.String(), nullable=True),
+        sa.Column("task_type", sa.String(), nullable=True),
+        sa.Column(
+            "embedding", pgvector.sqlalchemy.vector.VECTOR(dim=768), nullable=True
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index(
+        op.f("ix_embedding_cache_model"), "embedding_cache", ["model"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_embedding_cache_model"), table_name="embedding_cache")
+    op.drop_table("embedding_cache")
@@ -0,0 +1,129 @@
+"""add task change tracking
+
+Revision ID: 46736deda0d3
+Revises: 9d5c3e7f2b60
+Create Date: 2026-10-18 20:12:37.518264
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "46736deda0d3"
+down_revision: Union[str, Sequence[str], None] = "9d5c3e7f2b60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # existing tasks start at version 0: clients begin with a full GET /tasks
+    op.add_column(
+        "tasks",
+        sa.Column(
+            "change_version", sa.BigInteger(), server_default="0", nullable=False
+        ),
+    )
+    op.create_table(
+        "task_change_versions",
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["owner_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("owner_id"),
+    )
+    op.create_table(
+        "task_tombstones",
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("change_version", sa.BigInteger(), nullable=False),
+        sa.Column("task_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "deleted_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(
+            ["owner_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("owner_id", "change_version"),
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION tasks_track_changes() RETURNS trigger AS $$
+        DECLARE
+            new_version bigint;
+        BEGIN
+            INSERT INTO task_change_versions AS v (owner_id, version)
+            VALUES (COALESCE(NEW.owner_id, OLD.owner_id), 1)
+            ON CONFLICT (owner_id) DO UPDATE SET version = v.version + 1
+            RETURNING v.version INTO new_version;
+
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO task_tombstones (owner_id, change_version, task_id)
+                VALUES (OLD.owner_id, new_version, OLD.id);
+                RETURN OLD;
+            END IF;
+
+            NEW.change_version := new_version;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_track_inserts "
+        "BEFORE INSERT ON tasks "
+        "FOR EACH ROW EXECUTE FUNCTION tasks_track_changes()"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_track_updates "
+        "BEFORE UPDATE ON tasks "
+        "FOR EACH ROW WHEN ("
+        "(OLD.title, OLD.description, OLD.status, OLD.summary, OLD.enrichment_state) "
+        "IS DISTINCT FROM "
+        "(NEW.title, NEW.description, NEW.status, NEW.summary, NEW.enrichment_state)"
+        ") EXECUTE FUNCTION tasks_track_changes()"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_track_deletes "
+        "AFTER DELETE ON tasks "
+        "FOR EACH ROW EXECUTE FUNCTION tasks_track_changes()"
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_owner_change_version",
+            "tasks",
+            ["owner_id", "change_version"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_owner_change_version",
+            table_name="tasks",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+    op.execute("DROP TRIGGER IF EXISTS tasks_track_deletes ON tasks")
+    op.execute("DROP TRIGGER IF EXISTS tasks_track_updates ON tasks")
+    op.execute("DROP TRIGGER IF EXISTS tasks_track_inserts ON tasks")
+    op.execute("DROP FUNCTION IF EXISTS tasks_track_changes()")
+    op.drop_table("task_tombstones")
+    op.drop_table("task_change_versions")
+    op.drop_column("tasks", "change_version")
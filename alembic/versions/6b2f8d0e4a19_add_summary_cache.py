@@ -0,0 +1,45 @@
+"""add summary cache
+
+Revision ID: 6b2f8d0e4a19
+Revises: a4d0e6b9c317
+Create Date: 2026-10-18 19:20:07.412830
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6b2f8d0e4a19"
+down_revision: Union[str, Sequence[str], None] = "a4d0e6b9c317"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "summary_cache",
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("model", sa.String(), nullable=True),
+        sa.Column("summary", sa.String(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index(
+        op.f("ix_summary_cache_model"), "summary_cache", ["model"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_summary_cache_model"), table_name="summary_cache")
+    op.drop_table("summary_cache")
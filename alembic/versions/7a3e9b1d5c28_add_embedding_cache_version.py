@@ -0,0 +1,35 @@
+"""add embedding cache version
+
+Revision ID: 7a3e9b1d5c28
+Revises: fc33016ebc83
+Create Date: 2026-10-18 21:04:17.530962
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7a3e9b1d5c28"
+down_revision: Union[str, Sequence[str], None] = "fc33016ebc83"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # cached vectors so far were all made with EMBEDDING_VERSION 1, the
+    # default is dropped again so new rows always carry their own version
+    op.add_column(
+        "embedding_cache",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=True),
+    )
+    op.alter_column("embedding_cache", "version", server_default=None)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("embedding_cache", "version")
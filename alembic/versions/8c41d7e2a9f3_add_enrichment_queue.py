@@ -0,0 +1,70 @@
+"""add enrichment queue
+
+Revision ID: 8c41d7e2a9f3
+Revises: 3f9a1c2b7d45
+Create Date: 2026-10-18 10:02:13.540117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8c41d7e2a9f3"
+down_revision: Union[str, Sequence[str], None] = "3f9a1c2b7d45"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+enrichment_state = sa.Enum("PENDING", "READY", "FAILED", name="enrichmentstate")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    enrichment_state.create(op.get_bind(), checkfirst=True)
+    op.add_column(
+        "tasks",
+        sa.Column(
+            "enrichment_state",
+            enrichment_state,
+            server_default="READY",
+            nullable=True,
+        ),
+    )
+    op.create_table(
+        "enrichment_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("task_id", sa.Integer(), nullable=False),
+        sa.Column("generation", sa.Integer(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column(
+            "run_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(["task_id"], ["tasks.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("task_id"),
+    )
+    op.create_index(
+        op.f("ix_enrichment_jobs_run_at"), "enrichment_jobs", ["run_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_enrichment_jobs_run_at"), table_name="enrichment_jobs")
+    op.drop_table("enrichment_jobs")
+    op.drop_column("tasks", "enrichment_state")
+    enrichment_state.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,49 @@
+"""add task embedding model
+
+Revision ID: 9d5c3e7f2b60
+Revises: 6b2f8d0e4a19
+Create Date: 2026-10-18 19:31:52.904117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9d5c3e7f2b60"
+down_revision: Union[str, Sequence[str], None] = "6b2f8d0e4a19"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # existing vectors came from the only model there was when this revision
+    # was written. A constant default is stored in the catalog instead of
+    # rewriting every row (and its HNSW entry); dropping it afterwards keeps
+    # the value for those rows only. Deployments that embedded with something
+    # else get their stamps fixed by `python -m app.reembed`.
+    op.add_column(
+        "tasks",
+        sa.Column(
+            "embedding_model",
+            sa.String(),
+            server_default="models/gemini-embedding-001",
+            nullable=True,
+        ),
+    )
+    op.add_column(
+        "tasks",
+        sa.Column("embedding_version", sa.Integer(), server_default="1", nullable=True),
+    )
+    op.alter_column("tasks", "embedding_model", server_default=None)
+    op.alter_column("tasks", "embedding_version", server_default=None)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("tasks", "embedding_version")
+    op.drop_column("tasks", "embedding_model")
@@ -0,0 +1,100 @@
+"""add binary quantized embeddings
+
+Revision ID: a4d0e6b9c317
+Revises: 5e19c7a3b0d6
+Create Date: 2026-10-18 19:41:52.093714
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import BIT
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a4d0e6b9c317"
+down_revision: Union[str, Sequence[str], None] = "5e19c7a3b0d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def pgvector_version(connection):
+    version = connection.execute(
+        sa.text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    ).scalar()
+    return tuple(int(p) for p in (version or "0").split(".")[:2])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("tasks", sa.Column("embeddings_bq", BIT(768), nullable=True))
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION tasks_quantize_embeddings() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.embeddings IS NULL THEN
+                NEW.embeddings_bq := NULL;
+            ELSE
+                NEW.embeddings_bq := (
+                    SELECT string_agg(CASE WHEN x > 0 THEN '1' ELSE '0' END, '' ORDER BY i)
+                    FROM unnest(NEW.embeddings::real[]) WITH ORDINALITY AS t(x, i)
+                )::bit(768);
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_quantize_embeddings "
+        "BEFORE INSERT OR UPDATE OF embeddings ON tasks "
+        "FOR EACH ROW EXECUTE FUNCTION tasks_quantize_embeddings()"
+    )
+
+    # backfill in batches, committing each one so no long transaction holds
+    # row locks across the whole table
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        has_bit_support = pgvector_version(connection) >= (0, 7)
+
+        if has_bit_support:
+            quantized = "binary_quantize(embeddings)::bit(768)"
+        else:
+            quantized = (
+                "(SELECT string_agg(CASE WHEN x > 0 THEN '1' ELSE '0' END, '' "
+                "ORDER BY i) FROM unnest(embeddings::real[]) "
+                "WITH ORDINALITY AS t(x, i))::bit(768)"
+            )
+
+        while True:
+            converted = connection.execute(
+                sa.text(
+                    f"UPDATE tasks SET embeddings_bq = {quantized} WHERE id IN ("
+                    "SELECT id FROM tasks "
+                    "WHERE embeddings IS NOT NULL AND embeddings_bq IS NULL "
+                    "LIMIT :batch_size)"
+                ),
+                {"batch_size": BATCH_SIZE},
+            ).rowcount
+            if not converted:
+                break
+
+        if has_bit_support:
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_embeddings_bq_hnsw "
+                "ON tasks USING hnsw (embeddings_bq bit_hamming_ops) "
+                "WITH (m = 16, ef_construction = 64)"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_tasks_embeddings_bq_hnsw")
+    op.execute("DROP TRIGGER IF EXISTS tasks_quantize_embeddings ON tasks")
+    op.execute("DROP FUNCTION IF EXISTS tasks_quantize_embeddings()")
+    op.drop_column("tasks", "embeddings_bq")
@@ -0,0 +1,36 @@
+"""add hnsw index on task embeddings
+
+Revision ID: b7e3f0a4c812
+Revises: 8c41d7e2a9f3
+Create Date: 2026-10-18 11:20:54.902371
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e3f0a4c812"
+down_revision: Union[str, Sequence[str], None] = "8c41d7e2a9f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY can't run inside a transaction, and keeps the table
+    # writable while the index builds
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_embeddings_hnsw "
+            "ON tasks USING hnsw (embeddings vector_cosine_ops) "
+            "WITH (m = 16, ef_construction = 64)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_tasks_embeddings_hnsw")
@@ -0,0 +1,35 @@
+"""add task tombstone pruning
+
+Revision ID: c5f2a8e6d914
+Revises: 7a3e9b1d5c28
+Create Date: 2026-10-18 21:36:52.184730
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5f2a8e6d914"
+down_revision: Union[str, Sequence[str], None] = "7a3e9b1d5c28"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # nothing pruned yet: every version handed out is still in range
+    op.add_column(
+        "task_change_versions",
+        sa.Column(
+            "pruned_version", sa.BigInteger(), server_default="0", nullable=False
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("task_change_versions", "pruned_version")
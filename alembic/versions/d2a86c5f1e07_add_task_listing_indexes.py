@@ -0,0 +1,56 @@
+"""add task listing indexes
+
+Revision ID: d2a86c5f1e07
+Revises: b7e3f0a4c812
+Create Date: 2026-10-18 12:05:37.261904
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d2a86c5f1e07"
+down_revision: Union[str, Sequence[str], None] = "b7e3f0a4c812"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_owner_status_id",
+            "tasks",
+            ["owner_id", "status", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_tasks_owner_id_id",
+            "tasks",
+            ["owner_id", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_owner_id_id",
+            table_name="tasks",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_tasks_owner_status_id",
+            table_name="tasks",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
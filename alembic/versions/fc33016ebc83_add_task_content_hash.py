@@ -0,0 +1,31 @@
+"""add task content hash
+
+Revision ID: fc33016ebc83
+Revises: 46736deda0d3
+Create Date: 2026-10-18 20:47:05.362918
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "fc33016ebc83"
+down_revision: Union[str, Sequence[str], None] = "46736deda0d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # no backfill: some existing vectors were embedded from "None" for an
+    # omitted field, NULL makes the next edit of such a task re-embed it
+    op.add_column("tasks", sa.Column("content_hash", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("tasks", "content_hash")
@@ -1,24 +1,230 @@
-import google.generativeai as genai
+import asyncio
+import hashlib
 from .config import settings
+from .cache import EmbeddingCache, embedding_cache_key, normalize_text
+from .embeddings import get_provider
+from .metrics import track
+from .resilience import Guard
+from .models import TaskDB
 
-api_key = settings.GEMINI_API_KEY
+# repeated texts (popular search terms, unchanged tasks) skip the remote call
+embedding_cache = EmbeddingCache(
+    settings.EMBEDDING_CACHE_SIZE, persist=settings.EMBEDDING_CACHE_PERSIST
+)
+# deadline, circuit breaker and hedging for every provider call
+embedding_guard = Guard(settings.EMBEDDING_PROVIDER)
 
 
-def get_embedding(text: str, task_type: str = "retrieval_document"):
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not found in environment variables")
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched calls.
 
-    # Configure the library
-    genai.configure(api_key=api_key)
+    Texts submitted within `window` seconds of each other (or until
+    `max_size` texts are waiting) are sent together through `embed_batch`,
+    and each caller gets its own vector back. A text that is already waiting
+    or in flight shares the existing future instead of being sent twice.
+    """
 
-    # We need to specify the model.
-    model = "models/gemini-embedding-001"
+    def __init__(self, embed_batch, window: float, max_size: int):
+        self.embed_batch = embed_batch
+        self.window = window
+        self.max_size = max_size
+        self.batches = 0
+        self.texts = 0
+        self.deduplicated = 0
+        self._futures = {}
+        self._pending = {}
+        self._timers = {}
+        self._sending = set()
 
-    result = genai.embed_content(
-        model=model,
-        content=text,
-        task_type=task_type,
-        output_dimensionality=768,
+    async def submit(self, text: str, task_type: str):
+        future = self._futures.get((task_type, text))
+
+        if future is not None:
+            self.deduplicated += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[(task_type, text)] = future
+
+            pending = self._pending.setdefault(task_type, [])
+            pending.append(text)
+
+            if len(pending) >= self.max_size:
+                self._flush(task_type)
+            elif task_type not in self._timers:
+                self._timers[task_type] = loop.call_later(
+                    self.window, self._flush, task_type
+                )
+
+        # a cancelled caller must not cancel the result other callers share
+        return await asyncio.shield(future)
+
+    def _flush(self, task_type: str):
+        timer = self._timers.pop(task_type, None)
+        if timer is not None:
+            timer.cancel()
+
+        texts = self._pending.pop(task_type, [])
+        if not texts:
+            return
+
+        send = asyncio.ensure_future(self._send(texts, task_type))
+        self._sending.add(send)
+        send.add_done_callback(self._sending.discard)
+
+    async def _send(self, texts: list[str], task_type: str):
+        self.batches += 1
+        self.texts += len(texts)
+
+        try:
+            embeddings = await self.embed_batch(texts, task_type)
+            if len(embeddings) != len(texts):
+                raise ValueError(
+                    f"expected {len(texts)} embeddings, got {len(embeddings)}"
+                )
+        except Exception as e:
+            for text in texts:
+                future = self._futures.pop((task_type, text))
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for text, embedding in zip(texts, embeddings):
+            future = self._futures.pop((task_type, text))
+            if not future.done():
+                future.set_result(embedding)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "deduplicated": self.deduplicated,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+        }
+
+
+# asyncio semaphores and batcher futures belong to the loop that created
+# them, so we keep one set per running loop (in production: exactly one)
+_semaphore = None
+_batcher = None
+_loop = None
+
+
+def _get_semaphore():
+    global _semaphore, _batcher, _loop
+
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _loop is not loop:
+        _semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENCY)
+        _batcher = EmbeddingBatcher(
+            _embed_and_cache,
+            window=settings.EMBEDDING_BATCH_WINDOW_MS / 1000,
+            max_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        )
+        _loop = loop
+
+    return _semaphore
+
+
+def get_batcher():
+    _get_semaphore()
+    return _batcher
+
+
+async def _embed_remote(texts: list[str], task_type: str):
+    # "remote" as seen from the cache: whatever EMBEDDING_PROVIDER runs
+    semaphore = _get_semaphore()
+
+    async def attempt():
+        with track(settings.EMBEDDING_PROVIDER):
+            return await get_provider().embed(texts, task_type)
+
+    async with semaphore:
+        return await embedding_guard.call(attempt, settings.EMBEDDING_TIMEOUT)
+
+
+async def _embed_and_cache(texts: list[str], task_type: str):
+    embeddings = await _embed_remote(texts, task_type)
+
+    await embedding_cache.set_many(
+        {
+            embedding_cache_key(text, task_type): embedding
+            for text, embedding in zip(texts, embeddings)
+        },
+        task_type,
+    )
+
+    return embeddings
+
+
+def task_text(title: str, description: str):
+    """The text a task is embedded from."""
+    return f"{title}: {description}"
+
+
+def content_hash(title: str, description: str):
+    """
+    Fingerprint of a task's embedded text, stored with its vector: a task
+    whose hash still matches doesn't need a new embedding.
+    """
+    text = normalize_text(task_text(title, description))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embedding_stamp():
+    """What produced the vectors embedded now, stored next to each of them."""
+    return {
+        "embedding_model": get_provider().model,
+        "embedding_version": settings.EMBEDDING_VERSION,
+    }
+
+
+def current_embeddings():
+    """
+    Conditions for tasks whose vector is comparable with a query embedded
+    now. Vectors from another model (or an older EMBEDDING_VERSION) live in
+    a different space; they are left out until `python -m app.reembed`
+    catches up with them.
+    """
+    return (
+        TaskDB.embedding_model == get_provider().model,
+        TaskDB.embedding_version == settings.EMBEDDING_VERSION,
+    )
+
+
+async def get_embedding(text: str, task_type: str = "retrieval_document"):
+    text = normalize_text(text)
+
+    embedding = await embedding_cache.get(embedding_cache_key(text, task_type))
+    if embedding is not None:
+        return embedding
+
+    if not settings.EMBEDDING_BATCHING:
+        return (await _embed_and_cache([text], task_type))[0]
+
+    return await get_batcher().submit(text, task_type)
+
+
+async def get_embeddings(texts: list[str], task_type: str = "retrieval_document"):
+    """
+    Embed many texts at once (bulk imports): one cache lookup for all of them,
+    then the misses go out in EMBEDDING_BATCH_MAX_SIZE batches, at most
+    EMBEDDING_MAX_CONCURRENCY at a time. Duplicates are embedded once.
+    """
+    texts = [normalize_text(text) for text in texts]
+    keys = {text: embedding_cache_key(text, task_type) for text in texts}
+
+    cached = await embedding_cache.get_many(list(set(keys.values())))
+    vectors = {text: cached[key] for text, key in keys.items() if key in cached}
+
+    missing = [text for text in keys if text not in vectors]
+    size = settings.EMBEDDING_BATCH_MAX_SIZE
+    batches = [missing[i : i + size] for i in range(0, len(missing), size)]
+    results = await asyncio.gather(
+        *(_embed_and_cache(batch, task_type) for batch in batches)
     )
+    for batch, embeddings in zip(batches, results):
+        vectors.update(zip(batch, embeddings))
 
-    return result["embedding"]
+    return [vectors[text] for text in texts]
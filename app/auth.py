@@ -1,21 +1,53 @@
-from passlib.context import CryptContext
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from jose import jwt
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException
 from .models import UserDB
-from .database import get_db
+from .database import get_async_db
 from .config import settings
+from .cache import LRUCache
+from .metrics import track
+from .schemas import Principal
+
+
+# built on first use, passlib is only needed once someone signs up or logs in
+pwd_context = None
+
+
+def get_pwd_context():
+    global pwd_context
+
+    if pwd_context is None:
+        from passlib.context import CryptContext
+
+        # min/max rounds pinned to the configured cost, so verify_and_update
+        # flags hashes made with any other cost for a rehash
+        pwd_context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__rounds=settings.BCRYPT_ROUNDS,
+            bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+            bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+        )
+
+    return pwd_context
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 
 oauth2_schema = OAuth2PasswordBearer(tokenUrl="users/login")
 
+# verified principals keyed by token signature, so a warm token never
+# touches the users table
+principal_cache = LRUCache(settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -28,11 +60,66 @@ def create_access_token(data: dict):
 
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify_password(password: str, hashed_password: str):
-    return pwd_context.verify(password, hashed_password)
+    return get_pwd_context().verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated thread pool (bcrypt releases the GIL) so a
+    burst of signups/logins doesn't stall the event loop. At most
+    `workers + max_queue` calls are admitted at once, the rest get a 429.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.limit = workers + max_queue
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="bcrypt")
+
+    async def run(self, fn, *args):
+        # only touched from the event loop thread, so no lock needed
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many login attempts, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with track("bcrypt"):
+                return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "limit": self.limit,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE
+)
+
+
+async def hash_password(password: str):
+    return await password_hasher.run(get_password_hash, password)
+
+
+async def check_password(password: str, hashed_password: str):
+    """Returns (valid, new_hash); new_hash is set when the cost changed."""
+    return await password_hasher.run(
+        get_pwd_context().verify_and_update, password, hashed_password
+    )
 
 
 def verify_token(token: str):
@@ -44,17 +131,47 @@ def verify_token(token: str):
         return None
 
 
+def token_signature(token: str):
+    return token.rsplit(".", 1)[-1]
+
+
+def invalidate_user(user_id: int):
+    """Forget every cached token of a user. Returns how many were dropped."""
+    return principal_cache.discard_where(lambda principal: principal.id == user_id)
+
+
+@event.listens_for(UserDB, "after_update")
+@event.listens_for(UserDB, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.id)
+
+
 async def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_schema)
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_schema)
 ):
     verified = verify_token(token)
 
-    if not verified:
+    # signed with our key but not an access token (e.g. a profiling token)
+    if not verified or "sub" not in verified or verified.get("scope") == "profile":
         raise HTTPException(status_code=403, detail="access denied")
 
-    user = db.get(UserDB, verified["sub"])
+    key = token_signature(token)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+
+    user = await db.get(UserDB, int(verified["sub"]))
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return user
+    # end the read so the connection goes back to the pool while the route
+    # awaits AI calls; expire_on_commit=False keeps `user` loaded
+    await db.commit()
+
+    principal = Principal.model_validate(user)
+    # never keep a principal around longer than its token is valid
+    ttl = min(settings.AUTH_CACHE_TTL, verified["exp"] - time.time())
+    principal_cache.set(key, principal, ttl=ttl)
+
+    return principal
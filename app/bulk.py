@@ -0,0 +1,323 @@
+"""
+Bulk task import (POST /tasks/bulk).
+
+Tasks arrive as a JSON array or as an NDJSON stream and are handled
+BULK_CHUNK_SIZE at a time. Each chunk is validated, then summarized and
+embedded in one go: `get_ai_summaries` and `get_embeddings` dedupe, batch
+and bound the remote calls. The chunk is then inserted with a multi-row
+INSERT ... RETURNING in its own transaction. A bad item only fails itself,
+and a failed chunk doesn't undo the ones before it. NDJSON is consumed as
+it streams in, so a large import is never held in memory whole.
+
+In ENRICHMENT_MODE=background the AI step is skipped and the new tasks are
+queued for the enrichment workers instead. With AI_DEGRADED_MODE, so are the
+tasks of a chunk whose AI calls hit an outage.
+"""
+
+import asyncio
+import json
+import logging
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from .ai import content_hash, embedding_stamp, get_embeddings, task_text
+from .config import settings
+from .enrichment import enqueue_many, wake_workers
+from .matrix import matrix_cache
+from .models import TaskDB
+from .resilience import unavailable_errors
+from .schemas import (
+    BulkImportResult,
+    BulkTaskResult,
+    EnrichmentState,
+    Principal,
+    TaskCreate,
+)
+from .services import get_ai_summaries
+
+logger = logging.getLogger(__name__)
+
+NDJSON_TYPES = {
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonl",
+    "application/x-jsonlines",
+}
+
+
+class InvalidItem(Exception):
+    pass
+
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return InvalidItem(f"invalid JSON: {e}")
+
+
+def _too_large(detail: str):
+    return HTTPException(status_code=413, detail=detail)
+
+
+async def _read_body(request: Request):
+    limit = settings.BULK_MAX_BODY_BYTES
+    detail = f"A JSON array body may be at most {limit} bytes, use NDJSON"
+
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise _too_large(detail)
+
+    body = bytearray()
+    async for data in request.stream():
+        body += data
+        if len(body) > limit:
+            raise _too_large(detail)
+
+    return bytes(body)
+
+
+async def read_items(request: Request):
+    """Yield the submitted items one by one, parsed but not validated."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if content_type in NDJSON_TYPES:
+        limit = settings.BULK_MAX_LINE_BYTES
+        buffer = b""
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in [*lines, buffer]:
+                if len(line) > limit:
+                    raise _too_large(f"NDJSON lines may be at most {limit} bytes")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+
+        if buffer.strip():
+            yield _parse_line(buffer)
+        return
+
+    try:
+        items = json.loads(await _read_body(request))
+    except ValueError:
+        items = None
+
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=400, detail="Body must be a JSON array or NDJSON"
+        )
+    if len(items) > settings.BULK_MAX_TASKS:
+        raise _too_large(f"At most {settings.BULK_MAX_TASKS} tasks per import")
+
+    for item in items:
+        yield item
+
+
+def _validate(item):
+    if isinstance(item, InvalidItem):
+        raise item
+
+    try:
+        return TaskCreate.model_validate(item)
+    except ValidationError as e:
+        raise InvalidItem(
+            "; ".join(
+                f"{'.'.join(map(str, error['loc'])) or 'task'}: {error['msg']}"
+                for error in e.errors()
+            )
+        )
+
+
+def _pending_row(user: Principal, task: TaskCreate):
+    return {
+        **task.model_dump(),
+        "owner_id": user.id,
+        "enrichment_state": EnrichmentState.PENDING,
+    }
+
+
+async def _enrich(chunk: list[tuple[int, TaskCreate]], results: dict, deferred: list):
+    """
+    Fill in summaries and return embeddings. Failed items go to `results`,
+    and in AI_DEGRADED_MODE the ones whose summary hit an outage go to
+    `deferred`.
+    """
+    summaries, embeddings = await asyncio.gather(
+        get_ai_summaries([task.description for _, task in chunk]),
+        get_embeddings(
+            [task_text(task.title, task.description) for _, task in chunk],
+            task_type="retrieval_document",
+        ),
+    )
+
+    enriched = []
+    for (index, task), summary, embedding in zip(chunk, summaries, embeddings):
+        if settings.AI_DEGRADED_MODE and isinstance(summary, unavailable_errors()):
+            deferred.append((index, task))
+            continue
+        if isinstance(summary, Exception):
+            results[index] = BulkTaskResult(
+                index=index, error=f"summary failed: {summary}"
+            )
+            continue
+
+        task.summary = summary
+        enriched.append((index, task, embedding))
+
+    return enriched
+
+
+async def _prepare_chunk(user: Principal, chunk: list[tuple[int, TaskCreate]]):
+    """
+    Rows to insert as (index, values): enriched ones and ones to queue for
+    the enrichment workers. Plus results for items that failed.
+    """
+    results = {}
+
+    if settings.ENRICHMENT_MODE == "background":
+        return [], [(index, _pending_row(user, task)) for index, task in chunk], results
+
+    deferred = []
+    try:
+        enriched = await _enrich(chunk, results, deferred)
+    except Exception as e:
+        if settings.AI_DEGRADED_MODE and isinstance(e, unavailable_errors()):
+            logger.warning(
+                "bulk import: AI unavailable, deferring enrichment of %s tasks: %r",
+                len(chunk),
+                e,
+            )
+            pending = [(index, _pending_row(user, task)) for index, task in chunk]
+            return [], pending, results
+
+        logger.warning("bulk import: embedding %s tasks failed: %s", len(chunk), e)
+        for index, _ in chunk:
+            results[index] = BulkTaskResult(index=index, error=f"embedding failed: {e}")
+        return [], [], results
+
+    if deferred:
+        logger.warning(
+            "bulk import: summaries unavailable, deferring enrichment of %s tasks",
+            len(deferred),
+        )
+
+    stamp = embedding_stamp()
+    rows = [
+        (
+            index,
+            {
+                **task.model_dump(),
+                **stamp,
+                "owner_id": user.id,
+                "embeddings": embedding,
+                "content_hash": content_hash(task.title, task.description),
+            },
+        )
+        for index, task, embedding in enriched
+    ]
+    pending = [(index, _pending_row(user, task)) for index, task in deferred]
+    return rows, pending, results
+
+
+async def _insert(db: AsyncSession, rows: list[tuple[int, dict]]):
+    if not rows:
+        return []
+
+    return (
+        await db.scalars(
+            insert(TaskDB).returning(TaskDB.id, sort_by_parameter_order=True),
+            [values for _, values in rows],
+        )
+    ).all()
+
+
+async def _insert_chunk(
+    db: AsyncSession, rows: list[tuple[int, dict]], pending: list[tuple[int, dict]]
+):
+    """Insert enriched `rows` and `pending` ones, queueing the latter."""
+    try:
+        ids = await _insert(db, rows)
+        pending_ids = await _insert(db, pending)
+        await enqueue_many(db, pending_ids)
+        await db.commit()
+        if pending_ids:
+            wake_workers()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.warning(
+            "bulk import: inserting %s tasks failed: %s", len(rows) + len(pending), e
+        )
+        return [
+            BulkTaskResult(index=index, error="could not be saved")
+            for index, _ in rows + pending
+        ]
+
+    return [
+        BulkTaskResult(index=index, id=id)
+        for (index, _), id in zip(rows + pending, ids + pending_ids)
+    ]
+
+
+async def import_tasks(db: AsyncSession, user: Principal, items):
+    results = []
+    chunk = []
+    index = 0
+    # the AI calls for one chunk overlap with reading and inserting the
+    # previous one
+    preparing = None
+
+    async def insert_prepared():
+        rows, pending, failed = await preparing
+        results.extend(failed.values())
+        if rows or pending:
+            results.extend(await _insert_chunk(db, rows, pending))
+
+    async def flush():
+        nonlocal preparing
+
+        prepared = asyncio.create_task(_prepare_chunk(user, list(chunk)))
+        chunk.clear()
+        if preparing:
+            await insert_prepared()
+        preparing = prepared
+
+    try:
+        async for item in items:
+            if index == settings.BULK_MAX_TASKS:
+                # NDJSON has no length up front, stop reading at the limit
+                results.append(
+                    BulkTaskResult(
+                        index=index,
+                        error=f"import stopped after {settings.BULK_MAX_TASKS} tasks",
+                    )
+                )
+                break
+
+            try:
+                chunk.append((index, _validate(item)))
+            except InvalidItem as e:
+                results.append(BulkTaskResult(index=index, error=str(e)))
+
+            index += 1
+            if len(chunk) >= settings.BULK_CHUNK_SIZE:
+                await flush()
+
+        if chunk:
+            await flush()
+        if preparing:
+            await insert_prepared()
+    finally:
+        if preparing and not preparing.done():
+            preparing.cancel()
+
+    results.sort(key=lambda result: result.index)
+    created = sum(result.id is not None for result in results)
+    if created:
+        # cheaper to reload the user's search matrix than to patch it per task
+        matrix_cache.invalidate(user.id)
+
+    return BulkImportResult(
+        created=created, failed=len(results) - created, results=results
+    )
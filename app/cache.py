@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import delete, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from .config import settings
+from .database import AsyncSessionLocal
+from .embeddings import get_provider
+from .models import EmbeddingCacheDB, SummaryCacheDB
+
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU mapping with hit/miss counters. Entries
+    expire after `ttl` seconds when one is given (per cache or per entry).
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        if self.maxsize <= 0:
+            return
+
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def discard_where(self, predicate):
+        """Drop every entry whose value matches `predicate`, returns the count."""
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def normalize_text(text: str):
+    # collapse whitespace so "buy  milk " and "buy milk" share an entry
+    return " ".join(text.split())
+
+
+def embedding_cache_key(
+    text: str,
+    task_type: str,
+    model: str | None = None,
+    dimensions: int | None = None,
+    version: int | None = None,
+):
+    model = model or get_provider().model
+    dimensions = dimensions or settings.EMBEDDING_DIMENSIONS
+    version = version or settings.EMBEDDING_VERSION
+    raw = "\x1f".join(
+        [model, task_type, str(dimensions), f"v{version}", normalize_text(text)]
+    )
+
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TwoTierCache:
+    """
+    An in-process LRU in front of a table of `key`, `model` and `column`
+    (the cached value). Subclasses name the table and, when the stored form
+    differs from the cached one, decode rows with `decode`.
+
+    The persistent tier is best effort: a database hiccup only costs the
+    remote call the cache would have saved.
+    """
+
+    table = None
+    column = "value"
+    label = "cache"
+
+    def __init__(self, maxsize: int, persist: bool = True, session_factory=None):
+        self.memory = LRUCache(maxsize)
+        self.persist = persist
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def decode(value):
+        return value
+
+    async def get(self, key: str):
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: list[str]):
+        """{key: value} for the keys found in either tier."""
+        found = {}
+        for key in keys:
+            value = self.memory.get(key)
+            if value is not None:
+                found[key] = value
+
+        missing = [key for key in keys if key not in found]
+        if self.persist and missing:
+            loaded = await self._load_many(missing)
+            self.db_hits += len(loaded)
+            for key, value in loaded.items():
+                self.memory.set(key, value)
+            found.update(loaded)
+
+        self.misses += len(set(keys) - found.keys())
+        return found
+
+    async def set(self, key: str, value, model: str):
+        await self.set_many({key: value}, model)
+
+    async def set_many(self, values: dict, model: str, **columns):
+        """Cache `values` by key, `columns` are stored with each row."""
+        for key, value in values.items():
+            self.memory.set(key, value)
+
+        if self.persist and values:
+            await self._store(
+                [
+                    {"key": key, "model": model, self.column: value, **columns}
+                    for key, value in values.items()
+                ]
+            )
+
+    async def clear(self):
+        self.memory.clear()
+
+        if self.persist:
+            async with self.session_factory() as db:
+                await db.execute(delete(self.table))
+                await db.commit()
+
+    def stats(self):
+        memory = self.memory.stats()
+        lookups = memory["hits"] + self.db_hits + self.misses
+
+        return {
+            "memory_size": memory["size"],
+            "memory_hits": memory["hits"],
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": (memory["hits"] + self.db_hits) / lookups if lookups else 0.0,
+        }
+
+    async def _load_many(self, keys: list[str]):
+        column = getattr(self.table, self.column)
+        try:
+            async with self.session_factory() as db:
+                rows = await db.execute(
+                    select(self.table.key, column).where(self.table.key.in_(keys))
+                )
+                return {key: self.decode(value) for key, value in rows}
+        except SQLAlchemyError as e:
+            logger.warning("%s read failed: %s", self.label, e)
+            return {}
+
+    async def _store(self, rows: list[dict]):
+        stmt = (
+            insert(self.table)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["key"])
+        )
+
+        try:
+            async with self.session_factory() as db:
+                await db.execute(stmt)
+                await db.commit()
+        except SQLAlchemyError as e:
+            logger.warning("%s write failed: %s", self.label, e)
+
+
+class EmbeddingCache(TwoTierCache):
+    """
+    Two tier embedding cache: an in-process LRU in front of the
+    `embedding_cache` table. Keys come from `embedding_cache_key`, so entries
+    for another model or dimensionality can never be returned.
+    """
+
+    table = EmbeddingCacheDB
+    column = "embedding"
+    label = "embedding cache"
+
+    @staticmethod
+    def decode(value):
+        return [float(x) for x in value]
+
+    async def set(self, key: str, embedding: list[float], task_type: str, model=None):
+        await self.set_many({key: embedding}, task_type, model)
+
+    async def set_many(self, embeddings: dict, task_type: str, model=None):
+        await super().set_many(
+            embeddings,
+            model or get_provider().model,
+            task_type=task_type,
+            version=settings.EMBEDDING_VERSION,
+        )
+
+    async def invalidate(self, model: str | None = None, version: int | None = None):
+        """
+        Drop cached vectors not produced by `model` at `version` (default:
+        the configured provider's model and EMBEDDING_VERSION). Keys already
+        tell them apart, this only reclaims the space, so run it once no
+        process embeds with the old pair anymore, see `main`.
+        """
+        model = model or get_provider().model
+        version = version or settings.EMBEDDING_VERSION
+        self.memory.clear()
+
+        if not self.persist:
+            return 0
+
+        try:
+            async with self.session_factory() as db:
+                deleted = await db.execute(
+                    delete(EmbeddingCacheDB).where(
+                        or_(
+                            EmbeddingCacheDB.model.is_distinct_from(model),
+                            EmbeddingCacheDB.version.is_distinct_from(version),
+                        )
+                    )
+                )
+                await db.commit()
+                return deleted.rowcount
+        except SQLAlchemyError as e:
+            logger.warning("embedding cache invalidate failed: %s", e)
+            return 0
+
+
+def summary_cache_key(text: str, model: str, prompt_version: int):
+    raw = "\x1f".join([model, str(prompt_version), normalize_text(text)])
+
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SummaryCache(TwoTierCache):
+    """
+    Two tier cache of LLM summaries: an in-process LRU in front of the
+    `summary_cache` table. Keys come from `summary_cache_key`, so a new model
+    or prompt version starts from an empty cache instead of needing an
+    invalidation.
+    """
+
+    table = SummaryCacheDB
+    column = "summary"
+    label = "summary cache"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Drop cached embeddings of other models or EMBEDDING_VERSIONs."
+    )
+    parser.add_argument("--model", help="model to keep, default: the configured one")
+    parser.add_argument(
+        "--version", type=int, help="version to keep, default: EMBEDDING_VERSION"
+    )
+    args = parser.parse_args()
+
+    deleted = asyncio.run(EmbeddingCache(0).invalidate(args.model, args.version))
+    print(f"dropped {deleted} cached embeddings")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
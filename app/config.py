@@ -9,6 +9,136 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str
     GEMINI_API_KEY: str
     FRONTEND_URL: str = "http://localhost:5173"
+    # GET /metrics is open unless this is set, then it wants it as a bearer token
+    METRICS_TOKEN: str | None = None
+
+    # profiling (app/profiling.py): requests with an X-Profile token from
+    # `python -m app.profiling`, plus this share of all requests, get a stack
+    # profile and their SQL timings written to PROFILE_DIR. SELECTs slower
+    # than PROFILE_EXPLAIN_MS also get EXPLAIN (ANALYZE, BUFFERS).
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_MS: float = 2.0
+    PROFILE_EXPLAIN_MS: float = 50.0
+    PROFILE_DIR: str = "profiles"
+
+    # bcrypt runs on its own thread pool; requests beyond the workers plus
+    # PASSWORD_HASH_QUEUE waiting ones are turned away with a 429. Stored
+    # hashes with a different cost are rehashed on the next login.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE: int = 32
+
+    # verified tokens are cached per process; a user change or delete drops
+    # them right away in this process, other processes catch up within the TTL
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: int = 60
+
+    # database pool
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # CREATE EXTENSION IF NOT EXISTS vector on startup, for databases nobody
+    # ran the migrations on; entrypoint.sh turns it off after `alembic upgrade`
+    DB_CREATE_EXTENSION: bool = True
+
+    # summaries: descriptions of at most SUMMARY_FAST_PATH_WORDS words are
+    # their own summary and never reach the LLM
+    SUMMARY_MODEL: str = "llama-3.1-8b-instant"
+    SUMMARY_CACHE_SIZE: int = 2048
+    SUMMARY_CACHE_PERSIST: bool = True
+    SUMMARY_FAST_PATH_WORDS: int = 3
+    SUMMARY_MAX_CONCURRENCY: int = 8
+    # descriptions per completion when summarizing in bulk
+    SUMMARY_BATCH_SIZE: int = 20
+    SUMMARY_TIMEOUT: float = 10.0
+
+    # POST /tasks/bulk: max tasks per request, tasks per AI batch/transaction,
+    # max size of a JSON array body and of one NDJSON line
+    BULK_MAX_TASKS: int = 10000
+    BULK_CHUNK_SIZE: int = 500
+    BULK_MAX_BODY_BYTES: int = 16 * 2**20
+    BULK_MAX_LINE_BYTES: int = 2**20
+    # GET /tasks/changes: deleted task ids are kept this long, clients that
+    # last synced before that reload the whole list
+    TASK_TOMBSTONE_RETENTION_DAYS: int = 30
+    # GET /tasks/export: rows fetched per server-side cursor round trip
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # embeddings: "gemini", "local" (ONNX model on our CPUs) or "hashing"
+    # (deterministic, offline), see app/embeddings.py
+    EMBEDDING_PROVIDER: str = "gemini"
+    EMBEDDING_MODEL: str = "models/gemini-embedding-001"
+    EMBEDDING_DIMENSIONS: int = 768
+    # host:port of a plaintext gRPC stand-in for the Gemini API (benchmarks)
+    GEMINI_API_ENDPOINT: str | None = None
+    # bump when what gets embedded changes (e.g. the "title: description"
+    # recipe) without the model changing, then run `python -m app.reembed`
+    EMBEDDING_VERSION: int = 1
+    EMBEDDING_CACHE_SIZE: int = 2048
+    EMBEDDING_CACHE_PERSIST: bool = True
+    EMBEDDING_TIMEOUT: float = 10.0
+    EMBEDDING_MAX_CONCURRENCY: int = 8
+    EMBEDDING_BATCHING: bool = True
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0
+    EMBEDDING_BATCH_MAX_SIZE: int = 64
+    EMBEDDING_LOCAL_MODEL: str = ""
+    EMBEDDING_LOCAL_BATCH_SIZE: int = 32
+    EMBEDDING_LOCAL_MAX_TOKENS: int = 256
+    EMBEDDING_LOCAL_THREADS: int = 0
+    # e5-style models expect "query: " / "passage: " prefixes
+    EMBEDDING_LOCAL_QUERY_PREFIX: str = ""
+    EMBEDDING_LOCAL_DOCUMENT_PREFIX: str = ""
+
+    # AI call guardrails (app/resilience.py): after AI_BREAKER_FAILURES
+    # failed calls in a row a backend is skipped for AI_BREAKER_RESET_SECONDS,
+    # then a single probe call decides whether it's back. AI_HEDGE_PERCENTILE
+    # (e.g. 95, 0 = off) re-sends calls slower than that percentile. With
+    # AI_DEGRADED_MODE, an unavailable AI (deadline, open circuit, connection
+    # error, 5xx/429) doesn't fail the request: inline
+    # task writes are stored and queued for the enrichment workers (which in
+    # inline mode sleep until a write is deferred), searches are answered
+    # lexically
+    AI_BREAKER_FAILURES: int = 5
+    AI_BREAKER_RESET_SECONDS: float = 30.0
+    AI_HEDGE_PERCENTILE: float = 0.0
+    AI_DEGRADED_MODE: bool = True
+
+    # "inline" awaits summary + embedding in the request, "background" stores
+    # the task right away and lets the enrichment workers fill them in
+    ENRICHMENT_MODE: str = "inline"
+    ENRICHMENT_WORKERS: int = 2
+    ENRICHMENT_MAX_ATTEMPTS: int = 5
+    ENRICHMENT_RETRY_BASE_SECONDS: float = 2.0
+    ENRICHMENT_LEASE_SECONDS: int = 120
+    ENRICHMENT_POLL_SECONDS: float = 1.0
+
+    # hybrid search: RRF constant, candidates taken from each side before
+    # fusing, and how many words a term may have for auto mode's lexical path
+    SEARCH_RRF_K: int = 60
+    SEARCH_CANDIDATES: int = 50
+    SEARCH_LEXICAL_MAX_WORDS: int = 2
+
+    # HNSW search knobs: a higher ef_search trades latency for recall, and
+    # iterative scans (pgvector >= 0.8) keep scanning the index until enough
+    # rows survive the owner filter ("off", "relaxed_order", "strict_order")
+    HNSW_EF_SEARCH: int = 40
+    HNSW_ITERATIVE_SCAN: str = "strict_order"
+
+    # binary search: shortlist VECTOR_RERANK_CANDIDATES tasks by hamming
+    # distance over the 1-bit quantized embeddings, then rank the shortlist by
+    # exact cosine distance
+    VECTOR_BINARY_SEARCH: bool = False
+    VECTOR_RERANK_CANDIDATES: int = 40
+
+    # in-process search: rank each user's embeddings with NumPy instead of
+    # pgvector. Per-user matrices share a memory budget, are refreshed after
+    # VECTOR_MATRIX_TTL seconds, and users with more than
+    # VECTOR_MATRIX_MAX_TASKS embedded tasks stay on pgvector
+    VECTOR_MATRIX_SEARCH: bool = False
+    VECTOR_MATRIX_MEMORY_MB: int = 256
+    VECTOR_MATRIX_MAX_TASKS: int = 20000
+    VECTOR_MATRIX_TTL: int = 300
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -1,54 +1,239 @@
-from sqlalchemy.orm import Session
-from .models import TaskDB, UserDB
-from .schemas import Task, UserCreate, TaskUpdate
-from .auth import get_password_hash, verify_password
-from .ai import get_embedding
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import (
+    Float,
+    Integer,
+    column,
+    delete,
+    false,
+    func,
+    literal,
+    select,
+    text,
+    update,
+    values,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from . import models
+from .models import (
+    EnrichmentJobDB,
+    TaskChangeVersionDB,
+    TaskDB,
+    TaskTombstoneDB,
+    UserDB,
+)
+from .schemas import (
+    Task,
+    UserCreate,
+    TaskUpdate,
+    EnrichmentState,
+    Principal,
+    TaskSelection,
+    TaskStatus,
+)
+from .auth import hash_password, check_password
+from .ai import (
+    content_hash,
+    current_embeddings,
+    embedding_stamp,
+    get_embedding,
+    task_text,
+)
+from .cache import normalize_text
 from .services import get_ai_summary
+from .enrichment import enqueue, wake_workers
+from .matrix import matrix_cache
+from .resilience import unavailable_errors
+from .config import settings
 
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(UserDB).filter(UserDB.username == username).first()
+logger = logging.getLogger(__name__)
 
 
-def create_user(db: Session, user: UserCreate):
-    user.password = get_password_hash(user.password)
-    new_user = UserDB(username=user.username, hashed_password=user.password)
+async def get_user_by_username(db: AsyncSession, username: str):
+    return await db.scalar(select(UserDB).where(UserDB.username == username))
+
+
+async def create_user(db: AsyncSession, user: UserCreate):
+    # end the username check's transaction, don't hold a pooled connection
+    # while bcrypt runs
+    await db.commit()
+    user.password = await hash_password(user.password)
+    # a new user has no tasks, setting it up front saves a lazy load
+    # (which AsyncSession can't do) when the response is serialized
+    new_user = UserDB(username=user.username, hashed_password=user.password, tasks=[])
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     return new_user
 
 
-def authenticate_user(db: Session, user: UserCreate):
-    existing_user = db.query(UserDB).filter(UserDB.username == user.username).first()
+async def authenticate_user(db: AsyncSession, user: UserCreate):
+    existing_user = await get_user_by_username(db, user.username)
 
     if existing_user:
-        if verify_password(user.password, existing_user.hashed_password):
+        # don't hold a pooled connection while bcrypt runs
+        await db.commit()
+
+        valid, new_hash = await check_password(
+            user.password, existing_user.hashed_password
+        )
+        if valid:
+            # BCRYPT_ROUNDS changed since this hash was made
+            if new_hash:
+                existing_user.hashed_password = new_hash
+                await db.commit()
             return existing_user
         else:
             return False
     return None
 
 
-def create_task(db: Session, task: Task, user: UserDB, embeddings: list[float]):
-    new_task = TaskDB(**task.model_dump(), owner_id=user.id, embeddings=embeddings)
+async def create_task(
+    db: AsyncSession, task: Task, user: Principal, embeddings: list[float]
+):
+    new_task = TaskDB(
+        **task.model_dump(),
+        **embedding_stamp(),
+        owner_id=user.id,
+        embeddings=embeddings,
+        content_hash=content_hash(task.title, task.description),
+    )
     db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
+    await db.commit()
+    await db.refresh(new_task)
+    matrix_cache.upsert(user.id, new_task.id, embeddings)
     return new_task
 
 
-def get_tasks(db: Session, user: UserDB, status: str | None = None):
-    query = db.query(TaskDB).filter(TaskDB.owner_id == user.id)
+async def create_pending_task(db: AsyncSession, task: Task, user: Principal):
+    # summary and embedding are filled in later by the enrichment workers
+    new_task = TaskDB(
+        **task.model_dump(),
+        owner_id=user.id,
+        enrichment_state=EnrichmentState.PENDING,
+    )
+    db.add(new_task)
+    await db.flush()
+    await enqueue(db, new_task.id)
+    await db.commit()
+    await db.refresh(new_task)
+    return new_task
+
+
+# only the columns the Task response needs
+TASK_COLUMNS = load_only(
+    TaskDB.id,
+    TaskDB.title,
+    TaskDB.description,
+    TaskDB.status,
+    TaskDB.summary,
+    TaskDB.enrichment_state,
+)
+
+
+async def get_tasks(
+    db: AsyncSession,
+    user: Principal,
+    status: str | None = None,
+    limit: int | None = None,
+    cursor: int | None = None,
+):
+    query = select(TaskDB).options(TASK_COLUMNS).where(TaskDB.owner_id == user.id)
 
     if status:
-        query = query.filter(TaskDB.status == status.upper())
+        query = query.where(TaskDB.status == status.upper())
+
+    # keyset pagination: the cursor is the last id of the previous page
+    if cursor is not None:
+        query = query.where(TaskDB.id > cursor)
 
-    return query.all()
+    query = query.order_by(TaskDB.id)
 
+    if limit:
+        query = query.limit(limit)
 
-def get_task(db: Session, task_id: int, user: UserDB):
-    task = db.get(TaskDB, task_id)
+    return (await db.scalars(query)).all()
+
+
+async def get_change_window(db: AsyncSession, user: Principal):
+    """
+    (pruned_version, version): the versions GET /tasks/changes can still
+    answer for, from the last one whose tombstones were dropped to the latest.
+    """
+    row = (
+        await db.execute(
+            select(
+                TaskChangeVersionDB.pruned_version, TaskChangeVersionDB.version
+            ).where(TaskChangeVersionDB.owner_id == user.id)
+        )
+    ).first()
+    # no row yet: the user never had a task
+    return tuple(row) if row else (0, 0)
+
+
+async def get_change_version(db: AsyncSession, user: Principal):
+    _, version = await get_change_window(db, user)
+    return version
+
+
+async def get_changes(db: AsyncSession, user: Principal, since: int):
+    """
+    Tasks created or changed and ids of tasks deleted after version `since`,
+    or None when that version is newer than any handed out or older than the
+    tombstones kept. The version is read first, so the lists may already
+    hold some later changes; they come again next time, which is harmless.
+    """
+    pruned_version, version = await get_change_window(db, user)
+
+    if not pruned_version <= since <= version:
+        return None
+
+    upserted = await db.scalars(
+        select(TaskDB)
+        .options(TASK_COLUMNS)
+        .where(TaskDB.owner_id == user.id, TaskDB.change_version > since)
+        .order_by(TaskDB.change_version)
+    )
+    deleted = await db.scalars(
+        select(TaskTombstoneDB.task_id)
+        .where(
+            TaskTombstoneDB.owner_id == user.id,
+            TaskTombstoneDB.change_version > since,
+        )
+        .order_by(TaskTombstoneDB.change_version)
+    )
+
+    return version, upserted.all(), deleted.all()
+
+
+async def prune_tombstones(db: AsyncSession, user: Principal):
+    """
+    Drop the user's tombstones older than TASK_TOMBSTONE_RETENTION_DAYS and
+    remember the newest one dropped. Runs with each delete, so the table only
+    grows with recent deletions. The caller commits.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        days=settings.TASK_TOMBSTONE_RETENTION_DAYS
+    )
+    pruned = await db.scalars(
+        delete(TaskTombstoneDB)
+        .where(TaskTombstoneDB.owner_id == user.id, TaskTombstoneDB.deleted_at < cutoff)
+        .returning(TaskTombstoneDB.change_version)
+    )
+    pruned = pruned.all()
+
+    if pruned:
+        await db.execute(
+            update(TaskChangeVersionDB)
+            .where(TaskChangeVersionDB.owner_id == user.id)
+            .values(pruned_version=max(pruned))
+        )
+
+
+async def get_task(db: AsyncSession, task_id: int, user: Principal):
+    task = await db.get(TaskDB, task_id)
 
     if not task or task.owner_id != user.id:
         return None
@@ -56,8 +241,8 @@ def get_task(db: Session, task_id: int, user: UserDB):
     return task
 
 
-def delete_task(db: Session, task_id: int, user: UserDB):
-    task = get_task(db, task_id, user)
+async def delete_task(db: AsyncSession, task_id: int, user: Principal):
+    task = await get_task(db, task_id, user)
 
     if not task or not user:
         return None
@@ -66,14 +251,16 @@ def delete_task(db: Session, task_id: int, user: UserDB):
         return None
 
     deleted_task = Task.model_validate(task)
-    db.delete(task)
-    db.commit()
+    await db.delete(task)
+    await prune_tombstones(db, user)
+    await db.commit()
+    matrix_cache.remove(user.id, [task_id])
 
     return deleted_task
 
 
-def mark_complete(db: Session, task_id: int, user: UserDB):
-    task = get_task(db, task_id, user)
+async def mark_complete(db: AsyncSession, task_id: int, user: Principal):
+    task = await get_task(db, task_id, user)
 
     if not task or not user:
         return None
@@ -81,14 +268,14 @@ def mark_complete(db: Session, task_id: int, user: UserDB):
         return None
 
     task.status = "COMPLETED"
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
 
     return task
 
 
-def mark_pending(db: Session, task_id: int, user: UserDB):
-    task = get_task(db, task_id, user)
+async def mark_pending(db: AsyncSession, task_id: int, user: Principal):
+    task = await get_task(db, task_id, user)
 
     if not task or not user:
         return None
@@ -96,57 +283,377 @@ def mark_pending(db: Session, task_id: int, user: UserDB):
         return None
 
     task.status = "PENDING"
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
 
     return task
 
 
-def search_tasks(db: Session, user: UserDB, query_vector: list[float]):
+def _selected(user: Principal, selection: TaskSelection):
+    conditions = [TaskDB.owner_id == user.id]
+
+    if selection.ids is not None:
+        conditions.append(TaskDB.id.in_(selection.ids))
+    if selection.where_status is not None:
+        conditions.append(TaskDB.status == selection.where_status)
+
+    return conditions
+
+
+async def set_status(
+    db: AsyncSession, user: Principal, selection: TaskSelection, status: TaskStatus
+):
+    """Change the status of every selected task in one statement, returns ids."""
+    ids = await db.scalars(
+        update(TaskDB)
+        .where(*_selected(user, selection))
+        # rows already in that state would only be rewritten for nothing
+        .where(TaskDB.status != status)
+        .values(status=status)
+        .returning(TaskDB.id)
+        .execution_options(synchronize_session=False)
+    )
+    ids = ids.all()
+    await db.commit()
+
+    return ids
+
+
+async def delete_tasks(db: AsyncSession, user: Principal, selection: TaskSelection):
+    """Delete every selected task in one statement, returns ids."""
+    ids = await db.scalars(
+        delete(TaskDB)
+        .where(*_selected(user, selection))
+        .returning(TaskDB.id)
+        .execution_options(synchronize_session=False)
+    )
+    ids = ids.all()
+    await prune_tombstones(db, user)
+    await db.commit()
+    matrix_cache.remove(user.id, ids)
+
+    return ids
+
+
+_pgvector_version = None
+
+
+async def pgvector_version(db: AsyncSession):
+    global _pgvector_version
+
+    if _pgvector_version is None:
+        _pgvector_version = await (await db.connection()).run_sync(
+            models.pgvector_version
+        )
+
+    return _pgvector_version
+
+
+async def apply_hnsw_settings(db: AsyncSession):
+    """Set the HNSW knobs for the current transaction."""
+    params = {"ef_search": str(settings.HNSW_EF_SEARCH)}
+    sql = "SELECT set_config('hnsw.ef_search', :ef_search, true)"
+
+    # hnsw.iterative_scan only exists from pgvector 0.8 on
+    if await pgvector_version(db) >= (0, 8):
+        params["iterative_scan"] = settings.HNSW_ITERATIVE_SCAN
+        sql += ", set_config('hnsw.iterative_scan', :iterative_scan, true)"
+
+    await db.execute(text(sql), params)
+
+
+def binary_quantize(vector: list[float]):
+    # same rule as the tasks_quantize_embeddings trigger: one bit per sign
+    return "".join("1" if x > 0 else "0" for x in vector)
+
+
+async def nearest_tasks(
+    db: AsyncSession,
+    user: Principal,
+    query_vector: list[float],
+    limit: int,
+    threshold: float,
+):
+    """(id, distance) of the user's closest tasks, nearest first."""
+    if settings.VECTOR_MATRIX_SEARCH:
+        matrix = await matrix_cache.load(db, user.id)
+        if matrix is not None:
+            return _ranked_values(matrix.search(query_vector, limit, threshold))
+
+    await apply_hnsw_settings(db)
+
     # 1. Calculate the distance (0 = identical, 2 = opposite)
     distance = TaskDB.embeddings.cosine_distance(query_vector)
 
     # 2. Build the query
     # We filter by owner FIRST for security
-    # Then we filter by distance < 0.7 to remove irrelevant "noise"
-    results = (
-        db.query(TaskDB)
-        .filter(TaskDB.owner_id == user.id)
-        .filter(distance < 0.40)
-        .order_by(distance)
-        .limit(5)
-        .all()
+    # Then we filter by distance < threshold to remove irrelevant "noise"
+    query = (
+        select(TaskDB.id, distance.label("distance"))
+        .where(TaskDB.owner_id == user.id)
+        .where(*current_embeddings())
+        .where(distance < threshold)
+    )
+
+    if settings.VECTOR_BINARY_SEARCH:
+        # coarse pass on the bit index, exact distance for the shortlist only
+        bits = binary_quantize(query_vector)
+        if await pgvector_version(db) >= (0, 7):
+            hamming = TaskDB.embeddings_bq.hamming_distance(bits)
+        else:
+            hamming = func.bit_count(TaskDB.embeddings_bq.op("#")(bits))
+
+        shortlist = (
+            select(TaskDB.id)
+            .where(TaskDB.owner_id == user.id, *current_embeddings())
+            .order_by(hamming)
+            .limit(max(limit, settings.VECTOR_RERANK_CANDIDATES))
+            .cte("shortlist")
+            .prefix_with("MATERIALIZED")
+        )
+        query = query.join(shortlist, TaskDB.id == shortlist.c.id)
+
+    return query.order_by(distance).limit(limit)
+
+
+def _ranked_values(ranked: list[tuple[int, float]]):
+    # results computed in-process, as a VALUES list the callers can join
+    if not ranked:
+        return select(TaskDB.id, literal(0.0).label("distance")).where(false())
+
+    nearest = values(
+        column("id", Integer), column("distance", Float), name="nearest"
+    ).data(ranked)
+    return select(nearest.c.id, nearest.c.distance)
+
+
+async def search_tasks(
+    db: AsyncSession,
+    user: Principal,
+    query_vector: list[float],
+    limit: int = 5,
+    threshold: float = 0.40,
+):
+    nearest = (await nearest_tasks(db, user, query_vector, limit, threshold)).subquery()
+
+    results = await db.scalars(
+        select(TaskDB)
+        .join(nearest, TaskDB.id == nearest.c.id)
+        .order_by(nearest.c.distance)
     )
 
-    return results
+    return results.all()
+
 
+def is_quoted(term: str):
+    term = term.strip()
+    return len(term) > 1 and term[0] == term[-1] == '"'
 
-async def update_task(db: Session, task_id: int, task_update: TaskUpdate, user: UserDB):
-    db_task = (
-        db.query(TaskDB)
-        .filter(TaskDB.id == task_id, TaskDB.owner_id == user.id)
-        .first()
+
+def prefers_lexical(term: str):
+    """Short or quoted terms (ticket numbers, names) are keyword lookups."""
+    return is_quoted(term) or len(term.split()) <= settings.SEARCH_LEXICAL_MAX_WORDS
+
+
+def _lexical_ranked(user: Principal, term: str, limit: int):
+    # websearch syntax: "exact phrase", or, -excluded
+    query = func.websearch_to_tsquery("english", term)
+    rank = func.ts_rank_cd(TaskDB.search_vector, query)
+
+    return (
+        select(TaskDB.id, func.row_number().over(order_by=rank.desc()).label("rank"))
+        .where(TaskDB.owner_id == user.id)
+        .where(TaskDB.search_vector.bool_op("@@")(query))
+        .order_by(rank.desc())
+        .limit(limit)
     )
 
-    if not db_task:
-        return None
 
+async def lexical_search(db: AsyncSession, user: Principal, term: str, limit: int = 5):
+    ranked = _lexical_ranked(user, term, limit).subquery()
+
+    results = await db.scalars(
+        select(TaskDB).join(ranked, TaskDB.id == ranked.c.id).order_by(ranked.c.rank)
+    )
+
+    return results.all()
+
+
+async def hybrid_search(
+    db: AsyncSession,
+    user: Principal,
+    term: str,
+    query_vector: list[float],
+    limit: int = 5,
+    threshold: float = 0.40,
+):
+    """
+    Full-text and vector search in one statement, merged with reciprocal
+    rank fusion: score = sum of 1 / (SEARCH_RRF_K + rank) over both lists.
+    """
+    candidates = max(limit, settings.SEARCH_CANDIDATES)
+    nearest = (
+        await nearest_tasks(db, user, query_vector, candidates, threshold)
+    ).subquery()
+    semantic = select(
+        nearest.c.id,
+        func.row_number().over(order_by=nearest.c.distance).label("rank"),
+    ).subquery()
+    lexical = _lexical_ranked(user, term, candidates).subquery()
+
+    k = settings.SEARCH_RRF_K
+    score = (
+        func.coalesce(1.0 / (k + semantic.c.rank), 0)
+        + func.coalesce(1.0 / (k + lexical.c.rank), 0)
+    ).label("score")
+    fused = (
+        select(func.coalesce(semantic.c.id, lexical.c.id).label("id"), score)
+        .select_from(semantic.join(lexical, semantic.c.id == lexical.c.id, full=True))
+        .order_by(score.desc())
+        .limit(limit)
+        .subquery()
+    )
+
+    results = await db.scalars(
+        select(TaskDB)
+        .join(fused, TaskDB.id == fused.c.id)
+        .order_by(fused.c.score.desc(), TaskDB.id)
+    )
+
+    return results.all()
+
+
+def _apply_update(db_task: TaskDB, task_update: TaskUpdate):
     # Update Title
     if task_update.title:
         db_task.title = task_update.title
 
-    # Update Description and recalculate summary
+    # Update Description
     if task_update.description:
         db_task.description = task_update.description
-        ai_summary = await get_ai_summary(task_update.description)
-        db_task.summary = ai_summary
 
-    # recalculate embedding
-    if task_update.title or task_update.description:
-        combined_text = f"{task_update.title}: {task_update.description}"
-        embedding = get_embedding(combined_text, task_type="retrieval_document")
-        db_task.embeddings = embedding
 
-    db.commit()
-    db.refresh(db_task)
+def _ai_work(db_task: TaskDB, old_description: str):
+    # content_hash is what the stored embedding was made from (NULL: unknown),
+    # so an unchanged task costs no AI call at all. A task that isn't READY
+    # may keep the summary of a description an outage left unsummarized
+    work = {}
+    if (
+        normalize_text(db_task.description) != normalize_text(old_description)
+        or db_task.summary is None
+        or db_task.enrichment_state != EnrichmentState.READY
+    ):
+        work["summary"] = get_ai_summary(db_task.description)
+    if content_hash(db_task.title, db_task.description) != db_task.content_hash:
+        work["embeddings"] = get_embedding(
+            task_text(db_task.title, db_task.description),
+            task_type="retrieval_document",
+        )
+
+    return work
+
+
+# inline updates redo the AI calls when the task was edited while they ran
+UPDATE_TASK_ATTEMPTS = 3
+
+
+class TaskConflictError(Exception):
+    """The task kept changing while an inline update ran its AI calls."""
+
+
+async def update_task(
+    db: AsyncSession, task_id: int, task_update: TaskUpdate, user: Principal
+):
+    query = select(TaskDB).where(TaskDB.id == task_id, TaskDB.owner_id == user.id)
+    db_task = await db.scalar(query)
+
+    if not db_task:
+        return None
+
+    old_content = (db_task.title, db_task.description)
+    old_hash = content_hash(db_task.title, db_task.description)
+
+    _apply_update(db_task, task_update)
+
+    new_hash = content_hash(db_task.title, db_task.description)
+
+    # queue the AI work instead of blocking the PUT
+    if settings.ENRICHMENT_MODE == "background":
+        if new_hash != old_hash:
+            db_task.enrichment_state = EnrichmentState.PENDING
+            await enqueue(db, db_task.id)
+
+        await db.commit()
+        return db_task
+
+    results = {}
+    for _ in range(UPDATE_TASK_ATTEMPTS):
+        work = _ai_work(db_task, old_content[1])
+        if not work:
+            break
+
+        # don't sit idle in a transaction while the AI calls run; the edit
+        # is applied again to the row as it is afterwards
+        await db.rollback()
+
+        # summary and embedding don't depend on each other, run them together
+        try:
+            results = dict(zip(work, await asyncio.gather(*work.values())))
+        except unavailable_errors() as e:
+            if not settings.AI_DEGRADED_MODE:
+                raise
+            logger.warning(
+                "updating task %s without AI, enrichment deferred: %r", task_id, e
+            )
+            results = None
+
+        db_task = await db.scalar(query)
+        if not db_task:
+            # deleted by another request while the AI calls ran
+            return None
+
+        edited = (db_task.title, db_task.description) != old_content
+        old_content = (db_task.title, db_task.description)
+        _apply_update(db_task, task_update)
+        new_hash = content_hash(db_task.title, db_task.description)
+        if not edited or results is None:
+            break
+
+        # edited meanwhile, the results are for text that is gone: redo
+        # the AI part for what the row says now
+        results = {}
+    else:
+        raise TaskConflictError(task_id)
+
+    if results is None:
+        # save the edit now, the enrichment workers redo the AI part
+        db_task.enrichment_state = EnrichmentState.PENDING
+        await enqueue(db, db_task.id)
+        await db.commit()
+        wake_workers()
+        return db_task
+
+    if "summary" in results:
+        db_task.summary = results["summary"]
+    if "embeddings" in results:
+        db_task.embeddings = results["embeddings"]
+        db_task.content_hash = new_hash
+        for key, value in embedding_stamp().items():
+            setattr(db_task, key, value)
+
+    # drop the job queued while the AI was down once this update did all of
+    # its work, a new summary and an embedding of the current text
+    if (
+        db_task.enrichment_state != EnrichmentState.READY
+        and "summary" in results
+        and db_task.content_hash == new_hash
+    ):
+        db_task.enrichment_state = EnrichmentState.READY
+        await db.execute(
+            delete(EnrichmentJobDB).where(EnrichmentJobDB.task_id == task_id)
+        )
+
+    await db.commit()
+    if "embeddings" in results:
+        matrix_cache.upsert(user.id, db_task.id, results["embeddings"])
     return db_task
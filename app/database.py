@@ -1,19 +1,69 @@
 from .config import settings
+from .metrics import TimedAsyncAdaptedQueuePool, instrument_engine
+from .profiling import capture_statements
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 
-# creat the engine
-engine = create_engine(settings.DATABASE_URL)
+# creat the engine (sync, used by alembic and scripts)
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
 # create the session local class
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 # create the base class
 Base = declarative_base()
 
 
+def async_database_url(url: str):
+    # DATABASE_URL is shared with alembic, so it names the sync driver
+    return make_url(url).set(drivername="postgresql+asyncpg")
+
+
+def create_app_async_engine(url: str, **kwargs):
+    if "poolclass" not in kwargs:
+        kwargs.update(
+            poolclass=TimedAsyncAdaptedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+
+    # no pgvector codec is registered on purpose: asyncpg passes unknown
+    # types as text, which is the format the Vector column type speaks
+    async_engine = create_async_engine(
+        async_database_url(url),
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        # asyncpg's prepared statement cache; set to 0 behind pgbouncer
+        connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+        **kwargs,
+    )
+    # query timings and pool usage for GET /metrics, SQL of profiled requests
+    instrument_engine(async_engine.sync_engine)
+    capture_statements(async_engine.sync_engine)
+
+    return async_engine
+
+
+# the API runs on the async engine so queries don't block the event loop
+async_engine = create_app_async_engine(settings.DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,302 @@
+"""
+Embedding providers.
+
+EMBEDDING_PROVIDER picks the backend that `app.ai` sends (batched, cached)
+texts to:
+
+- "gemini": Google's embedding API (EMBEDDING_MODEL).
+- "local": an ONNX sentence-transformer style model on our own CPU cores.
+  EMBEDDING_LOCAL_MODEL points at a directory with `model.onnx` and a
+  Hugging Face `tokenizer.json`; needs `pip install onnxruntime tokenizers`.
+- "hashing": deterministic feature hashing of words and word pairs, no model
+  and no network. Good enough to load-test search offline.
+
+Every provider returns L2-comparable vectors of EMBEDDING_DIMENSIONS floats,
+and its `model` string goes into the cache key so vectors from different
+backends never mix.
+"""
+
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .config import settings
+
+
+class EmbeddingProvider(ABC):
+    """Turns a batch of texts into one vector per text."""
+
+    model: str
+    dimensions: int
+
+    @abstractmethod
+    async def embed(self, texts: list[str], task_type: str) -> list[list[float]]:
+        """One vector of `dimensions` floats per text, in order."""
+
+
+class GeminiProvider(EmbeddingProvider):
+    def __init__(
+        self,
+        model: str,
+        dimensions: int,
+        api_key: str | None,
+        endpoint: str | None = None,
+    ):
+        self.model = model
+        self.dimensions = dimensions
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self._client = None
+        self._loop = None
+
+    def _get_client(self):
+        # the SDK takes a good part of a second to import (it pulls in
+        # IPython helpers), so only processes that embed with Gemini pay it
+        import grpc
+        import google.ai.generativelanguage as glm
+        from google.ai.generativelanguage_v1beta.services.generative_service.transports import (
+            GenerativeServiceGrpcAsyncIOTransport,
+        )
+
+        # grpc.aio channels belong to the loop that created them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self.endpoint:
+                # local stand-in (benchmarks/fakes.py): no TLS, no key
+                channel = grpc.aio.insecure_channel(self.endpoint)
+                self._client = glm.GenerativeServiceAsyncClient(
+                    transport=GenerativeServiceGrpcAsyncIOTransport(channel=channel)
+                )
+            elif not self.api_key:
+                raise ValueError("GEMINI_API_KEY not found in environment variables")
+            else:
+                self._client = glm.GenerativeServiceAsyncClient(
+                    client_options={"api_key": self.api_key}
+                )
+            self._loop = loop
+
+        return self._client
+
+    async def embed(self, texts: list[str], task_type: str):
+        import google.generativeai as genai
+
+        result = await genai.embed_content_async(
+            model=self.model,
+            content=texts,
+            task_type=task_type,
+            output_dimensionality=self.dimensions,
+            client=self._get_client(),
+            request_options={"timeout": settings.EMBEDDING_TIMEOUT},
+        )
+
+        return result["embedding"]
+
+
+def mean_pool(hidden: np.ndarray, mask: np.ndarray):
+    """Average token states, ignoring padding: (batch, tokens, dim) -> (batch, dim)."""
+    mask = mask[..., None].astype(hidden.dtype)
+    return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+def fit_dimensions(vectors: np.ndarray, dimensions: int, seed: int = 0):
+    """
+    Bring model output to the column width and L2-normalize. Narrower
+    outputs are zero padded (cosine unchanged), wider ones go through a fixed
+    random projection, which roughly preserves cosine similarity.
+    """
+    width = vectors.shape[1]
+
+    if width < dimensions:
+        vectors = np.pad(vectors, ((0, 0), (0, dimensions - width)))
+    elif width > dimensions:
+        rng = np.random.default_rng(seed)
+        projection = rng.normal(0, 1 / np.sqrt(dimensions), (width, dimensions))
+        vectors = vectors @ projection.astype(vectors.dtype)
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def local_model_id(model_dir: str):
+    """
+    `local:<directory name>:<hash of model.onnx>`. The directory name alone
+    would let two different models (.../v1/model, .../v2/model) share cached
+    vectors and stamps.
+    """
+    digest = hashlib.sha256()
+    with open(os.path.join(model_dir, "model.onnx"), "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            digest.update(block)
+
+    name = os.path.basename(os.path.normpath(model_dir))
+    return f"local:{name}:{digest.hexdigest()[:16]}"
+
+
+class LocalProvider(EmbeddingProvider):
+    """
+    Batched ONNX inference on a single dedicated thread (onnxruntime spreads
+    each run over its own intra-op threads and releases the GIL). The model
+    and tokenizer load on first use.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        dimensions: int,
+        batch_size: int = 32,
+        max_tokens: int = 256,
+        session=None,
+        tokenizer=None,
+    ):
+        self.model_dir = model_dir
+        self.model = local_model_id(model_dir)
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self._session = session
+        self._tokenizer = tokenizer
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="embeddings")
+
+    def _load(self):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_PROVIDER=local needs `pip install onnxruntime tokenizers`"
+            ) from e
+
+        options = onnxruntime.SessionOptions()
+        if settings.EMBEDDING_LOCAL_THREADS:
+            options.intra_op_num_threads = settings.EMBEDDING_LOCAL_THREADS
+
+        self._session = onnxruntime.InferenceSession(
+            os.path.join(self.model_dir, "model.onnx"),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._tokenizer = Tokenizer.from_file(
+            os.path.join(self.model_dir, "tokenizer.json")
+        )
+
+    def _prefix(self, task_type: str):
+        if task_type == "retrieval_query":
+            return settings.EMBEDDING_LOCAL_QUERY_PREFIX
+        return settings.EMBEDDING_LOCAL_DOCUMENT_PREFIX
+
+    def _run(self, texts: list[str]):
+        if self._session is None:
+            self._load()
+
+        self._tokenizer.enable_truncation(self.max_tokens)
+        self._tokenizer.enable_padding()
+        encodings = self._tokenizer.encode_batch(texts)
+
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+
+        names = {i.name for i in self._session.get_inputs()}
+        if "token_type_ids" in names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+
+        # first output: token states (batch, tokens, dim) or, for models
+        # exported with pooling, sentence vectors (batch, dim)
+        output = self._session.run(None, feeds)[0]
+        if output.ndim == 3:
+            output = mean_pool(output, mask)
+
+        return fit_dimensions(output.astype(np.float32), self.dimensions)
+
+    async def embed(self, texts: list[str], task_type: str):
+        prefix = self._prefix(task_type)
+        loop = asyncio.get_running_loop()
+        vectors = []
+
+        for start in range(0, len(texts), self.batch_size):
+            batch = [prefix + text for text in texts[start : start + self.batch_size]]
+            vectors.extend(
+                (await loop.run_in_executor(self._executor, self._run, batch)).tolist()
+            )
+
+        return vectors
+
+
+class HashingProvider(EmbeddingProvider):
+    """
+    Signed feature hashing of lowercased words and adjacent word pairs.
+    Texts sharing words land close together, which is all a load test or an
+    offline dev setup needs. Uses blake2b, so vectors are stable across
+    processes (unlike hash()).
+    """
+
+    model = "hashing:v1"
+    _token = re.compile(r"\w+")
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    def _features(self, text: str):
+        words = self._token.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def _embed(self, texts: list[str]):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                # a zero vector has no cosine distance to anything
+                vectors[row, 0] = 1.0
+                continue
+
+            for feature in features:
+                digest = hashlib.blake2b(
+                    feature.encode("utf-8"), digest_size=8
+                ).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value >> 63 else -1.0
+                vectors[row, value % self.dimensions] += sign
+
+        return fit_dimensions(vectors, self.dimensions).tolist()
+
+    async def embed(self, texts: list[str], task_type: str):
+        return self._embed(texts)
+
+
+_provider = None
+
+
+def create_provider(name: str):
+    if name == "gemini":
+        return GeminiProvider(
+            settings.EMBEDDING_MODEL,
+            settings.EMBEDDING_DIMENSIONS,
+            settings.GEMINI_API_KEY,
+            settings.GEMINI_API_ENDPOINT,
+        )
+    if name == "local":
+        if not settings.EMBEDDING_LOCAL_MODEL:
+            raise ValueError("EMBEDDING_PROVIDER=local needs EMBEDDING_LOCAL_MODEL")
+        return LocalProvider(
+            settings.EMBEDDING_LOCAL_MODEL,
+            settings.EMBEDDING_DIMENSIONS,
+            batch_size=settings.EMBEDDING_LOCAL_BATCH_SIZE,
+            max_tokens=settings.EMBEDDING_LOCAL_MAX_TOKENS,
+        )
+    if name == "hashing":
+        return HashingProvider(settings.EMBEDDING_DIMENSIONS)
+
+    raise ValueError(f"unknown EMBEDDING_PROVIDER: {name}")
+
+
+def get_provider():
+    global _provider
+
+    if _provider is None:
+        _provider = create_provider(settings.EMBEDDING_PROVIDER)
+
+    return _provider
@@ -0,0 +1,289 @@
+"""
+Background AI enrichment.
+
+In ENRICHMENT_MODE=background, tasks are stored without a summary/embedding
+and an `enrichment_jobs` row is queued in the same transaction. Workers claim
+due jobs with `SELECT ... FOR UPDATE SKIP LOCKED`, lease them for
+ENRICHMENT_LEASE_SECONDS (so a crashed worker's job becomes visible again),
+and retry failures with exponential backoff until ENRICHMENT_MAX_ATTEMPTS.
+
+Workers run inside the API process (see `lifespan`) or standalone:
+
+    python -m app.enrichment
+
+In inline mode the queue only holds tasks whose AI calls were deferred
+(AI_DEGRADED_MODE), so the API process's workers sleep while it is empty and
+are woken by the requests that defer a task.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .ai import content_hash, embedding_stamp, get_embedding, task_text
+from .matrix import matrix_cache
+from .config import settings
+from .database import AsyncSessionLocal
+from .models import EnrichmentJobDB, TaskDB
+from .schemas import EnrichmentState
+from .services import get_ai_summary
+
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue(db: AsyncSession, task_id: int):
+    """Queue (or re-queue) enrichment for a task. The caller commits."""
+    stmt = insert(EnrichmentJobDB).values(task_id=task_id, generation=0, attempts=0)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["task_id"],
+        set_={
+            "generation": EnrichmentJobDB.generation + 1,
+            "attempts": 0,
+            "run_at": stmt.excluded.run_at,
+            "last_error": None,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def enqueue_many(db: AsyncSession, task_ids: list[int]):
+    """Queue enrichment for freshly inserted tasks. The caller commits."""
+    if task_ids:
+        await db.execute(
+            insert(EnrichmentJobDB).values(
+                [{"task_id": id, "generation": 0, "attempts": 0} for id in task_ids]
+            )
+        )
+
+
+async def claim_job(db: AsyncSession):
+    now = datetime.now(timezone.utc)
+    job = await db.scalar(
+        select(EnrichmentJobDB)
+        .where(EnrichmentJobDB.run_at <= now)
+        .order_by(EnrichmentJobDB.run_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+
+    if not job:
+        return None
+
+    # take a lease instead of holding the row lock across the AI calls
+    job.attempts += 1
+    job.run_at = now + timedelta(seconds=settings.ENRICHMENT_LEASE_SECONDS)
+    await db.commit()
+
+    return job.id, job.task_id, job.generation, job.attempts
+
+
+def retry_delay(attempts: int):
+    return settings.ENRICHMENT_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+
+
+async def enrich(title: str, description: str):
+    summary, embedding = await asyncio.gather(
+        get_ai_summary(description),
+        get_embedding(task_text(title, description), task_type="retrieval_document"),
+    )
+
+    return summary, embedding
+
+
+async def process_next(session_factory=AsyncSessionLocal):
+    """Claim and run one due job. Returns False when the queue is empty."""
+    async with session_factory() as db:
+        claimed = await claim_job(db)
+        if not claimed:
+            return False
+
+        job_id, task_id, generation, attempts = claimed
+        task = await db.get(TaskDB, task_id)
+
+        if not task:
+            await db.execute(
+                delete(EnrichmentJobDB).where(EnrichmentJobDB.id == job_id)
+            )
+            await db.commit()
+            return True
+
+        title, description, owner_id = task.title, task.description, task.owner_id
+        # don't sit idle in a transaction while the AI calls run
+        await db.rollback()
+
+        try:
+            summary, embedding = await enrich(title, description)
+        except Exception as e:
+            logger.warning(
+                "enrichment of task %s failed (attempt %s): %s", task_id, attempts, e
+            )
+
+            current = (
+                EnrichmentJobDB.id == job_id,
+                EnrichmentJobDB.generation == generation,
+            )
+
+            if attempts >= settings.ENRICHMENT_MAX_ATTEMPTS:
+                gave_up = await db.execute(delete(EnrichmentJobDB).where(*current))
+                if gave_up.rowcount:
+                    await db.execute(
+                        update(TaskDB)
+                        .where(TaskDB.id == task_id)
+                        .values(enrichment_state=EnrichmentState.FAILED)
+                    )
+            else:
+                await db.execute(
+                    update(EnrichmentJobDB)
+                    .where(*current)
+                    .values(
+                        run_at=datetime.now(timezone.utc)
+                        + timedelta(seconds=retry_delay(attempts)),
+                        last_error=str(e)[:500],
+                    )
+                )
+            await db.commit()
+            return True
+
+        # if the task was edited while we were running, the job was re-queued
+        # with a new generation and stays around to enrich the new content
+        done = await db.execute(
+            delete(EnrichmentJobDB).where(
+                EnrichmentJobDB.id == job_id, EnrichmentJobDB.generation == generation
+            )
+        )
+
+        # compare by content hash, not exact text: an edit that only changes
+        # whitespace isn't re-queued, and its task still needs this result
+        enriched_hash = content_hash(title, description)
+        task = await db.scalar(
+            select(TaskDB)
+            .where(TaskDB.id == task_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+
+        if not task:
+            await db.commit()
+            return True
+
+        if content_hash(task.title, task.description) != enriched_hash:
+            # replaced by other text; if nothing re-queued it, this job was
+            # the last one for the task, so queue the new text now
+            if done.rowcount:
+                await enqueue(db, task_id)
+            await db.commit()
+            return True
+
+        task.summary = summary
+        task.embeddings = embedding
+        task.content_hash = enriched_hash
+        for key, value in embedding_stamp().items():
+            setattr(task, key, value)
+        if done.rowcount:
+            task.enrichment_state = EnrichmentState.READY
+
+        await db.commit()
+        matrix_cache.upsert(owner_id, task_id, embedding)
+        return True
+
+
+async def queue_empty(session_factory=AsyncSessionLocal):
+    """No job queued at all, not even a retry that isn't due yet."""
+    async with session_factory() as db:
+        return await db.scalar(select(EnrichmentJobDB.id).limit(1)) is None
+
+
+async def run_worker(
+    stop: asyncio.Event,
+    session_factory=AsyncSessionLocal,
+    wake: asyncio.Event | None = None,
+):
+    """
+    Work the queue until `stop` is set. With `wake`, the worker sleeps on it
+    while the queue is empty instead of polling.
+    """
+    while not stop.is_set():
+        idle = False
+        try:
+            processed = await process_next(session_factory)
+            if not processed and wake:
+                # cleared before looking, so a job queued meanwhile wakes us
+                wake.clear()
+                idle = await queue_empty(session_factory)
+        except Exception as e:
+            logger.exception("enrichment worker error: %s", e)
+            processed = False
+
+        if idle:
+            await wake.wait()
+        elif not processed:
+            try:
+                await asyncio.wait_for(stop.wait(), settings.ENRICHMENT_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+class WorkerPool:
+    """
+    `size` workers in this process. An `on_demand` pool only polls while
+    jobs are queued, and sleeps otherwise until `wake` is called.
+    """
+
+    def __init__(self, size: int, on_demand: bool = False):
+        self.size = size
+        self._stop = asyncio.Event()
+        self._wake = asyncio.Event() if on_demand else None
+        self._workers = []
+
+    def start(self):
+        self._workers = [
+            asyncio.create_task(run_worker(self._stop, wake=self._wake))
+            for _ in range(self.size)
+        ]
+
+    def wake(self):
+        if self._wake:
+            self._wake.set()
+
+    async def stop(self):
+        self._stop.set()
+        self.wake()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+
+_pool: WorkerPool | None = None
+
+
+def start_workers(on_demand: bool = False):
+    """Start the workers of this process, see `wake_workers`."""
+    global _pool
+
+    _pool = WorkerPool(settings.ENRICHMENT_WORKERS, on_demand=on_demand)
+    _pool.start()
+    return _pool
+
+
+def wake_workers():
+    """
+    Call after committing queued jobs: an on-demand pool may be asleep.
+    Without workers in this process, standalone ones pick the jobs up.
+    """
+    if _pool:
+        _pool.wake()
+
+
+async def main():
+    pool = WorkerPool(settings.ENRICHMENT_WORKERS)
+    pool.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await pool.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,28 +1,88 @@
+import logging
+import secrets
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException
-from .database import engine, Base, get_db
-from .schemas import Task, UserCreate, User, TaskCreate, SearchRequest, TaskUpdate
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from .database import async_engine, get_async_db
+from .schemas import (
+    Task,
+    UserCreate,
+    User,
+    TaskCreate,
+    SearchRequest,
+    TaskUpdate,
+    Principal,
+    SearchMode,
+    BulkImportResult,
+    TaskSelection,
+    TaskStatusChange,
+    TasksChanged,
+    TaskChanges,
+    ExportFormat,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from . import crud
-from .services import get_ai_summary
-from .auth import create_access_token, get_current_user
-from .models import UserDB
-from .ai import get_embedding
+from . import crud, metrics
+from .services import get_ai_summary, summary_stats
+from .auth import (
+    create_access_token,
+    get_current_user,
+    password_hasher,
+    principal_cache,
+)
+from .ai import get_batcher, get_embedding, embedding_cache, task_text
+from .matrix import matrix_cache
+from .resilience import unavailable_errors
+from .profiling import ProfilingMiddleware
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from .config import settings
+from .enrichment import start_workers, wake_workers
+from .bulk import import_tasks, read_items
+from .export import stream_tasks
+
+
+logger = logging.getLogger(__name__)
+
+# pgvector keeps a vector column's dimensions in its type modifier; no row
+# before the tables exist
+EMBEDDINGS_WIDTH_QUERY = """
+SELECT atttypmod FROM pg_attribute
+WHERE attrelid = to_regclass('tasks') AND attname = 'embeddings'
+"""
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-    except Exception as e:
-        print(f"startup database error: {e}")
+    if settings.DB_CREATE_EXTENSION:
+        try:
+            async with async_engine.begin() as conn:
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        except Exception as e:
+            print(f"startup database error: {e}")
+
+    # the columns come from the migrations, not from the setting: a provider
+    # of another width would only fail later, on the first embedding stored
+    async with async_engine.connect() as conn:
+        width = await conn.scalar(text(EMBEDDINGS_WIDTH_QUERY))
+    if width is not None and width != settings.EMBEDDING_DIMENSIONS:
+        raise RuntimeError(
+            f"EMBEDDING_DIMENSIONS is {settings.EMBEDDING_DIMENSIONS} but "
+            f"tasks.embeddings holds vector({width}), migrate the schema first"
+        )
+
+    # in inline mode the workers only pick up what AI_DEGRADED_MODE deferred,
+    # and sleep until a request defers something
+    workers = None
+    if settings.ENRICHMENT_WORKERS > 0:
+        workers = start_workers(on_demand=settings.ENRICHMENT_MODE != "background")
 
     yield
 
+    if workers:
+        await workers.stop()
+
+    await async_engine.dispose()
+
 
 app = FastAPI(lifespan=lifespan)
 
@@ -37,7 +97,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Next-Cursor",
+        "ETag",
+        "X-Change-Version",
+        "X-Search-Degraded",
+    ],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 @app.get("/")
@@ -45,21 +113,41 @@ def health_check():
     return {"status": "System Operational"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+    body = metrics.render(
+        {
+            "embedding_cache": embedding_cache.stats(),
+            "embedding_batcher": get_batcher().stats(),
+            "summary": summary_stats(),
+            "auth_cache": principal_cache.stats(),
+            "password_hasher": password_hasher.stats(),
+            "matrix_cache": matrix_cache.stats(),
+        }
+    )
+    return Response(body, media_type=metrics.CONTENT_TYPE)
+
+
 @app.post("/users", response_model=User)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # check if user already exists
-    db_user = crud.get_user_by_username(db, username=user.username)
+    db_user = await crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    new_user = crud.create_user(db, user)
+    new_user = await crud.create_user(db, user)
 
     return new_user
 
 
 @app.post("/users/login")
-async def user_login(user: UserCreate, db: Session = Depends(get_db)):
-    curr_user = crud.authenticate_user(db, user)
+async def user_login(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    curr_user = await crud.authenticate_user(db, user)
 
     if curr_user:
         token = create_access_token(
@@ -69,41 +157,152 @@ async def user_login(user: UserCreate, db: Session = Depends(get_db)):
     raise HTTPException(status_code=401, detail="Incorrect username/password")
 
 
+async def set_change_version(response: Response, db: AsyncSession, user: Principal):
+    # the change version after a write, so a client can move its delta sync
+    # past its own change instead of getting it back from /tasks/changes
+    version = await crud.get_change_version(db, user)
+    response.headers["X-Change-Version"] = str(version)
+
+
 @app.post("/tasks", response_model=Task)
 async def create_task(
     task: TaskCreate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    ai_summary = await get_ai_summary(task.description)
-    task.summary = ai_summary
+    if settings.ENRICHMENT_MODE == "background":
+        new_task = await crud.create_pending_task(db, task, current_user)
+        await set_change_version(response, db, current_user)
+        return new_task
 
-    combine_text = f"{task.title}: {task.description}"
-    embeddings = get_embedding(combine_text, task_type="retrieval_document")
+    try:
+        ai_summary = await get_ai_summary(task.description)
+        embeddings = await get_embedding(
+            task_text(task.title, task.description), task_type="retrieval_document"
+        )
+    except unavailable_errors() as e:
+        if not settings.AI_DEGRADED_MODE:
+            raise
+        # the AI is down or too slow: keep the task anyway and let the
+        # enrichment workers add the summary and embedding later
+        logger.warning("creating task without AI, enrichment deferred: %r", e)
+        new_task = await crud.create_pending_task(db, task, current_user)
+        wake_workers()
+        await set_change_version(response, db, current_user)
+        return new_task
+
+    task.summary = ai_summary
 
-    new_task = crud.create_task(db, task, current_user, embeddings)
+    new_task = await crud.create_task(db, task, current_user, embeddings)
+    await set_change_version(response, db, current_user)
 
     return new_task
 
 
+@app.post("/tasks/bulk", response_model=BulkImportResult)
+async def bulk_create_tasks(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    # JSON array of tasks, or one task per line with Content-Type
+    # application/x-ndjson
+    return await import_tasks(db, current_user, read_items(request))
+
+
+def etag_matches(if_none_match: str | None, etag: str):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # compression proxies may weaken the tag, compare the opaque part only
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
 @app.get("/tasks", response_model=list[Task])
 async def read_tasks(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     status: str | None = None,
-    current_user: UserDB = Depends(get_current_user),
+    limit: int | None = Query(None, ge=1, le=1000),
+    cursor: int | None = None,
+    current_user: Principal = Depends(get_current_user),
 ):
-    tasks = crud.get_tasks(db, current_user, status)
+    # the list only changes with the user's change version, so that is the
+    # ETag: an unchanged list is answered with 304 before it is even queried.
+    # The user id is part of it, the browser caches by URL, not by token.
+    version = await crud.get_change_version(db, current_user)
+    headers = {
+        "ETag": f'"{current_user.id}-{version}"',
+        "X-Change-Version": str(version),
+        # always revalidate, but a 304 lets the browser reuse its copy
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    tasks = await crud.get_tasks(db, current_user, status, limit, cursor)
+
+    # a full page means there may be more, pass the cursor for the next one
+    if limit and len(tasks) == limit:
+        response.headers["X-Next-Cursor"] = str(tasks[-1].id)
 
     return tasks
 
 
+# declared before /tasks/{task_id} so "changes" isn't read as a task id
+@app.get("/tasks/changes", response_model=TaskChanges)
+async def read_task_changes(
+    since: int = Query(..., ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    # e.g. ?since=41 with the X-Change-Version of the last GET /tasks
+    changes = await crud.get_changes(db, current_user, since)
+
+    if changes is None:
+        # not a version this server handed out (e.g. the database was reset),
+        # or one older than the deletions still on record
+        raise HTTPException(
+            status_code=410, detail="Unknown change version, reload /tasks"
+        )
+
+    version, upserted, deleted = changes
+    return TaskChanges(version=version, upserted=upserted, deleted=deleted)
+
+
+# declared before /tasks/{task_id} so "export" isn't read as a task id
+@app.get("/tasks/export")
+async def export_tasks(
+    format: ExportFormat = ExportFormat.NDJSON,
+    embeddings: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    media_type = {
+        ExportFormat.NDJSON: "application/x-ndjson",
+        ExportFormat.CSV: "text/csv",
+    }[format]
+
+    return StreamingResponse(
+        stream_tasks(db, current_user, format, embeddings),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format.value}"'},
+    )
+
+
 @app.get("/tasks/{task_id}", response_model=Task)
 async def read_one(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    task = crud.get_task(db, task_id, current_user)
+    task = await crud.get_task(db, task_id, current_user)
 
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -111,31 +310,61 @@ async def read_one(
     return task
 
 
+@app.patch("/tasks/status", response_model=TasksChanged)
+async def set_tasks_status(
+    change: TaskStatusChange,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    # e.g. {"ids": [1, 2, 3], "status": "completed"}
+    ids = await crud.set_status(db, current_user, change, change.status)
+    await set_change_version(response, db, current_user)
+    return TasksChanged(count=len(ids), ids=ids)
+
+
+@app.delete("/tasks", response_model=TasksChanged)
+async def delete_tasks(
+    selection: TaskSelection,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    # e.g. {"where_status": "completed"} to clear all completed tasks
+    ids = await crud.delete_tasks(db, current_user, selection)
+    await set_change_version(response, db, current_user)
+    return TasksChanged(count=len(ids), ids=ids)
+
+
 @app.put("/tasks/{task_id}/complete", response_model=Task)
 async def mark_complete(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    task = crud.mark_complete(db, task_id, current_user)
+    task = await crud.mark_complete(db, task_id, current_user)
 
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
+    await set_change_version(response, db, current_user)
     return task
 
 
 @app.put("/tasks/{task_id}/pending", response_model=Task)
 async def mark_pending(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    task = crud.mark_pending(db, task_id, current_user)
+    task = await crud.mark_pending(db, task_id, current_user)
 
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
+    await set_change_version(response, db, current_user)
     return task
 
 
@@ -143,36 +372,76 @@ async def mark_pending(
 async def update_task(
     task_id: int,
     task_update: TaskUpdate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    task = await crud.update_task(db, task_id, task_update, current_user)
+    try:
+        task = await crud.update_task(db, task_id, task_update, current_user)
+    except crud.TaskConflictError:
+        raise HTTPException(
+            status_code=409, detail="Task keeps changing, try the update again"
+        )
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    await set_change_version(response, db, current_user)
     return task
 
 
 @app.delete("/tasks/{task_id}", response_model=Task)
-def delete_task(
+async def delete_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    deleted_task = crud.delete_task(db, task_id, current_user)
+    deleted_task = await crud.delete_task(db, task_id, current_user)
 
     if not deleted_task:
         raise HTTPException(status_code=404, detail="Task not found")
 
+    await set_change_version(response, db, current_user)
     return deleted_task
 
 
 @app.post("/search", response_model=list[Task])
 async def search_tasks(
     search_request: SearchRequest,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    vectorized = get_embedding(search_request.search_term, task_type="retrieval_query")
-    tasks = crud.search_tasks(db, current_user, vectorized)
+    term = search_request.search_term
+    mode = search_request.mode
+    limit = search_request.limit
+
+    # fast path: keyword lookups never pay for an embedding
+    if mode == SearchMode.LEXICAL or (
+        mode == SearchMode.AUTO and crud.prefers_lexical(term)
+    ):
+        tasks = await crud.lexical_search(db, current_user, term, limit)
+        if tasks or mode == SearchMode.LEXICAL or crud.is_quoted(term):
+            return tasks
+        # a short term with no keyword hit may still match semantically
+        mode = SearchMode.HYBRID
+        # release the connection while the embedding call runs
+        await db.commit()
 
-    return tasks
+    try:
+        vectorized = await get_embedding(term, task_type="retrieval_query")
+    except unavailable_errors() as e:
+        if not settings.AI_DEGRADED_MODE:
+            raise
+        # keyword results beat an error while embeddings are unavailable
+        logger.warning("searching lexically, embedding failed: %r", e)
+        response.headers["X-Search-Degraded"] = "lexical"
+        return await crud.lexical_search(db, current_user, term, limit)
+
+    if mode == SearchMode.SEMANTIC:
+        return await crud.search_tasks(
+            db, current_user, vectorized, limit, search_request.threshold
+        )
+
+    return await crud.hybrid_search(
+        db, current_user, term, vectorized, limit, search_request.threshold
+    )
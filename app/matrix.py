@@ -0,0 +1,276 @@
+"""
+In-process brute-force vector search.
+
+With VECTOR_MATRIX_SEARCH on, a searching user's embeddings are loaded once
+into a contiguous float32 matrix (rows L2-normalized) next to an array of
+task ids, and each query is answered with a single matrix-vector product
+instead of a pgvector round trip. Matrices live in an LRU bounded by
+VECTOR_MATRIX_MEMORY_MB and are patched in place when this process creates,
+re-embeds or deletes a task, even while they are being loaded. They expire
+after VECTOR_MATRIX_TTL seconds so changes made by other processes (other API
+workers, standalone enrichment workers) show up too.
+
+Users with more than VECTOR_MATRIX_MAX_TASKS embedded tasks stay on pgvector.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .ai import current_embeddings
+from .cache import LRUCache
+from .config import settings
+from .models import TaskDB
+
+
+def normalize(vectors: np.ndarray):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class UserMatrix:
+    """One user's embeddings: `ids[i]` is the task of row `vectors[i]`."""
+
+    def __init__(self, ids, vectors, dimensions: int = 768):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.vectors = normalize(
+            np.asarray(vectors, dtype=np.float32).reshape(len(self.ids), dimensions)
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self.vectors.nbytes
+
+    def search(self, query_vector, limit: int, threshold: float):
+        """[(task_id, cosine distance)] of the closest rows, nearest first."""
+        if not len(self.ids):
+            return []
+
+        query = normalize(np.asarray(query_vector, dtype=np.float32))
+        distances = 1.0 - self.vectors @ query
+
+        if limit < len(distances):
+            top = np.argpartition(distances, limit - 1)[:limit]
+        else:
+            top = np.arange(len(distances))
+        top = top[np.argsort(distances[top], kind="stable")]
+        top = top[distances[top] < threshold]
+
+        return list(zip(self.ids[top].tolist(), distances[top].tolist()))
+
+    def upsert(self, task_id: int, vector):
+        vector = normalize(np.asarray(vector, dtype=np.float32))
+        rows = np.flatnonzero(self.ids == task_id)
+
+        if len(rows):
+            self.vectors[rows[0]] = vector
+        else:
+            self.ids = np.append(self.ids, task_id)
+            self.vectors = np.vstack([self.vectors, vector])
+
+    def remove(self, task_ids):
+        keep = ~np.isin(self.ids, list(task_ids))
+        self.ids = self.ids[keep]
+        self.vectors = self.vectors[keep]
+
+
+class MatrixCache:
+    """
+    LRU of UserMatrix by user id, bounded by total bytes instead of entries.
+    Only matrices of at most `max_tasks` rows are kept.
+    """
+
+    def __init__(self, max_bytes: int, max_tasks: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.max_tasks = max_tasks
+        self.ttl = ttl
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # user id -> [loads in flight, changes made meanwhile]: a load may
+        # read the tasks before a change commits, so the changes are replayed
+        # onto the loaded matrix
+        self._loading = {}
+        # users known to be over max_tasks, so we don't count their tasks on
+        # every search
+        self._oversized = LRUCache(10000, ttl=ttl)
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            matrix, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._drop(user_id)
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return matrix
+
+    def put(self, user_id: int, matrix: UserMatrix):
+        with self._lock:
+            self._put(user_id, matrix)
+
+    def upsert(self, user_id: int, task_id: int, vector):
+        """Patch a cached matrix after a task got a new embedding."""
+        if vector is None:
+            return
+
+        with self._lock:
+            self._record(user_id, "upsert", task_id, vector)
+            entry = self._data.get(user_id)
+            if entry is None:
+                return
+
+            matrix = entry[0]
+            self.nbytes -= matrix.nbytes
+            matrix.upsert(task_id, vector)
+            self.nbytes += matrix.nbytes
+
+            if len(matrix) > self.max_tasks:
+                self._drop(user_id)
+            else:
+                self._evict()
+
+    def remove(self, user_id: int, task_ids):
+        with self._lock:
+            self._record(user_id, "remove", task_ids)
+            entry = self._data.get(user_id)
+            if entry is None:
+                return
+
+            matrix = entry[0]
+            self.nbytes -= matrix.nbytes
+            matrix.remove(task_ids)
+            self.nbytes += matrix.nbytes
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._record(user_id, "invalidate")
+            self._drop(user_id)
+        self._oversized.pop(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+        self._oversized.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._data),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    # callers hold the lock
+    def _put(self, user_id: int, matrix: UserMatrix):
+        self._drop(user_id)
+        if len(matrix) > self.max_tasks or matrix.nbytes > self.max_bytes:
+            return
+
+        self._data[user_id] = (matrix, time.monotonic() + self.ttl)
+        self.nbytes += matrix.nbytes
+        self._evict()
+
+    def _record(self, user_id: int, *change):
+        loading = self._loading.get(user_id)
+        if loading is not None:
+            loading[1].append(change)
+
+    def _drop(self, user_id: int):
+        entry = self._data.pop(user_id, None)
+        if entry is not None:
+            self.nbytes -= entry[0].nbytes
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._data:
+            _, (matrix, _) = self._data.popitem(last=False)
+            self.nbytes -= matrix.nbytes
+
+    async def load(self, db: AsyncSession, user_id: int):
+        """The user's matrix, loading it if needed; None means use pgvector."""
+        matrix = self.get(user_id)
+        if matrix is not None:
+            return matrix
+
+        if self._oversized.get(user_id):
+            self.fallbacks += 1
+            return None
+
+        with self._lock:
+            loading = self._loading.setdefault(user_id, [0, []])
+            loading[0] += 1
+        try:
+            return await self._load(db, user_id, loading[1])
+        finally:
+            with self._lock:
+                loading[0] -= 1
+                if not loading[0]:
+                    del self._loading[user_id]
+
+    async def _load(self, db: AsyncSession, user_id: int, changes: list):
+        embedded = (
+            TaskDB.owner_id == user_id,
+            TaskDB.embeddings.isnot(None),
+            *current_embeddings(),
+        )
+        count = await db.scalar(
+            select(func.count()).select_from(TaskDB).where(*embedded)
+        )
+        if count > self.max_tasks:
+            self._oversized.set(user_id, True)
+            self.fallbacks += 1
+            return None
+
+        rows = (
+            await db.execute(
+                select(TaskDB.id, TaskDB.embeddings)
+                .where(*embedded)
+                .order_by(TaskDB.id)
+            )
+        ).all()
+        matrix = UserMatrix(
+            [row.id for row in rows],
+            [row.embeddings for row in rows],
+            settings.EMBEDDING_DIMENSIONS,
+        )
+
+        with self._lock:
+            # replaying is harmless for changes the query already saw
+            for change in changes:
+                if change[0] == "upsert":
+                    matrix.upsert(*change[1:])
+                elif change[0] == "remove":
+                    matrix.remove(change[1])
+                else:
+                    # can't tell what the load missed; serve it, don't keep it
+                    return matrix
+            self._put(user_id, matrix)
+
+        return matrix
+
+
+matrix_cache = MatrixCache(
+    settings.VECTOR_MATRIX_MEMORY_MB * 2**20,
+    settings.VECTOR_MATRIX_MAX_TASKS,
+    settings.VECTOR_MATRIX_TTL,
+)
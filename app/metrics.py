@@ -0,0 +1,267 @@
+"""
+Prometheus metrics, served in the text exposition format by GET /metrics.
+
+Instrumentation stays out of the routes: MetricsMiddleware times every
+request by route template, SQLAlchemy event hooks time queries and count
+pool checkouts, and `track()` wraps the few places that call out to Groq,
+the embedding provider and bcrypt. Counters the caches and the batcher
+already keep are added as gauges when the endpoint renders.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds, from a cached query up to a timed out AI call
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines += self._samples(key, value)
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_labels(self.labels, key)} {value}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [per-bucket counts..., count, sum]
+            state = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[-2] if state else 0
+
+    def _samples(self, key, state):
+        le = (*self.labels, "le")
+        bounds = [*self.buckets, "+Inf"]
+        counts = [*state[: len(self.buckets)], state[-2]]
+
+        return [
+            *(
+                f"{self.name}_bucket{_labels(le, (*key, bound))} {n}"
+                for bound, n in zip(bounds, counts)
+            ),
+            f"{self.name}_count{_labels(self.labels, key)} {state[-2]}",
+            f"{self.name}_sum{_labels(self.labels, key)} {state[-1]}",
+        ]
+
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer an HTTP request, by route template.",
+    ("method", "route", "status"),
+)
+dependency_call_seconds = Histogram(
+    "dependency_call_duration_seconds",
+    "Time spent in calls to Groq, the embedding provider and bcrypt.",
+    ("dependency",),
+)
+dependency_errors = Counter(
+    "dependency_errors_total",
+    "Calls to Groq, the embedding provider or bcrypt that raised.",
+    ("dependency",),
+)
+db_query_seconds = Histogram(
+    "db_query_duration_seconds",
+    "Time to execute a database statement.",
+    ("operation",),
+)
+db_errors = Counter(
+    "db_errors_total", "Database statements that raised.", ("operation",)
+)
+db_pool_wait_seconds = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time to get a connection from the pool, including opening a new one.",
+)
+db_pool_in_use = Gauge(
+    "db_pool_connections_in_use", "Connections checked out of the pool."
+)
+
+
+@contextmanager
+def track(dependency: str):
+    """Time a call to `dependency`, counting it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        dependency_errors.inc(dependency=dependency)
+        raise
+    finally:
+        dependency_call_seconds.observe(
+            time.perf_counter() - start, dependency=dependency
+        )
+
+
+class MetricsMiddleware:
+    """
+    Times requests by route template ("/tasks/{task_id}"), so ids don't
+    become labels. Requests no route matched are labelled "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            http_request_seconds.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route.path if route else "unmatched",
+                status=status,
+            )
+
+
+def _operation(statement: str):
+    words = statement.split(None, 1)
+    word = words[0].lower() if words else ""
+    return word if word in ("select", "insert", "update", "delete") else "other"
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    # no pool event fires before a checkout starts waiting, so the wait is
+    # timed here; dispose() recreates the pool from the same class
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait_seconds.observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine):
+    """Time the statements of a (sync, or an async engine's sync) engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["metrics_start"].pop()
+        db_query_seconds.observe(
+            time.perf_counter() - start, operation=_operation(statement)
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        db_errors.inc(operation=_operation(context.statement or ""))
+        # after_cursor_execute won't run for this statement
+        starts = (
+            context.connection.info.get("metrics_start") if context.connection else None
+        )
+        if starts:
+            starts.pop()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_in_use.inc()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        db_pool_in_use.dec()
+
+
+def render(stats: dict[str, dict] | None = None):
+    """
+    The exposition text. `stats` maps a prefix to one of the `stats()` dicts
+    (e.g. {"embedding_cache": {"hit_ratio": 0.9}}), rendered as gauges.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+
+    for prefix, values in (stats or {}).items():
+        for key, value in values.items():
+            if isinstance(value, (int, float)):
+                lines += [f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {value}"]
+
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,24 @@
-from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey
-from pgvector.sqlalchemy import Vector
-from .schemas import TaskStatus
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy import (
+    DDL,
+    event,
+    text,
+    Column,
+    Integer,
+    BigInteger,
+    String,
+    Enum,
+    ForeignKey,
+    DateTime,
+    Index,
+    Computed,
+    func,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from pgvector.sqlalchemy import Vector, BIT
+from .schemas import TaskStatus, EnrichmentState
 from .database import Base
+from .config import settings
 
 
 class TaskDB(Base):
@@ -14,7 +30,157 @@ class TaskDB(Base):
     summary = Column(String, nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("UserDB", back_populates="tasks")
-    embeddings = Column(Vector(768))
+    # deferred: none of the Task responses return the vector, so plain
+    # loads never pull 3 KB per row off the wire
+    embeddings = deferred(Column(Vector(settings.EMBEDDING_DIMENSIONS)))
+    # sign bits of `embeddings`, kept in sync by the tasks_quantize_embeddings
+    # trigger: 96 bytes per task for the coarse pass of binary search
+    embeddings_bq = deferred(Column(BIT(settings.EMBEDDING_DIMENSIONS)))
+    # what produced `embeddings`: the provider's model id and
+    # EMBEDDING_VERSION. Search only compares vectors of the current pair.
+    embedding_model = Column(String, nullable=True)
+    embedding_version = Column(Integer, nullable=True)
+    # sha256 of the text `embeddings` was made from (ai.content_hash)
+    content_hash = Column(String(64), nullable=True)
+    enrichment_state = Column(
+        Enum(EnrichmentState), default=EnrichmentState.READY, server_default="READY"
+    )
+    # the owner's change_version when this task last changed, set by the
+    # tasks_track_changes triggers; GET /tasks/changes reads it
+    change_version = Column(BigInteger, nullable=False, server_default="0")
+    # full-text side of hybrid search, kept up to date by postgres itself
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+                "setweight(to_tsvector('english', coalesce(summary, '')), 'C')",
+                persisted=True,
+            ),
+        )
+    )
+
+    __table_args__ = (
+        # backs keyset pagination of GET /tasks, with and without ?status
+        Index("ix_tasks_owner_status_id", "owner_id", "status", "id"),
+        Index("ix_tasks_owner_id_id", "owner_id", "id"),
+        Index("ix_tasks_owner_change_version", "owner_id", "change_version"),
+        Index(
+            "ix_tasks_embeddings_hnsw",
+            "embeddings",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embeddings": "vector_cosine_ops"},
+        ),
+        Index("ix_tasks_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+
+# binary_quantize() only exists from pgvector 0.7 on, this works everywhere
+QUANTIZE_EMBEDDINGS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION tasks_quantize_embeddings() RETURNS trigger AS $$
+BEGIN
+    IF NEW.embeddings IS NULL THEN
+        NEW.embeddings_bq := NULL;
+    ELSE
+        NEW.embeddings_bq := (
+            SELECT string_agg(CASE WHEN x > 0 THEN '1' ELSE '0' END, '' ORDER BY i)
+            FROM unnest(NEW.embeddings::real[]) WITH ORDINALITY AS t(x, i)
+        )::bit({settings.EMBEDDING_DIMENSIONS});
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+QUANTIZE_EMBEDDINGS_TRIGGER = """
+CREATE TRIGGER tasks_quantize_embeddings
+BEFORE INSERT OR UPDATE OF embeddings ON tasks
+FOR EACH ROW EXECUTE FUNCTION tasks_quantize_embeddings()
+"""
+
+# HNSW over bit columns needs pgvector >= 0.7; older versions scan
+# embeddings_bq sequentially, which is still ~30x less data than the vectors
+BINARY_HNSW_INDEX = (
+    "CREATE INDEX IF NOT EXISTS ix_tasks_embeddings_bq_hnsw ON tasks "
+    "USING hnsw (embeddings_bq bit_hamming_ops) WITH (m = 16, ef_construction = 64)"
+)
+
+
+# every change to a user's tasks bumps their task_change_versions row and
+# stamps the task with the new version. The row lock also makes concurrent
+# writers commit in version order, so a client that has seen version N has
+# seen every change before it.
+TRACK_CHANGES_FUNCTION = """
+CREATE OR REPLACE FUNCTION tasks_track_changes() RETURNS trigger AS $$
+DECLARE
+    new_version bigint;
+BEGIN
+    INSERT INTO task_change_versions AS v (owner_id, version)
+    VALUES (COALESCE(NEW.owner_id, OLD.owner_id), 1)
+    ON CONFLICT (owner_id) DO UPDATE SET version = v.version + 1
+    RETURNING v.version INTO new_version;
+
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO task_tombstones (owner_id, change_version, task_id)
+        VALUES (OLD.owner_id, new_version, OLD.id);
+        RETURN OLD;
+    END IF;
+
+    NEW.change_version := new_version;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TRACK_CHANGES_TRIGGERS = [
+    """
+    CREATE TRIGGER tasks_track_inserts
+    BEFORE INSERT ON tasks
+    FOR EACH ROW EXECUTE FUNCTION tasks_track_changes()
+    """,
+    # only what a Task response shows: re-embedding or a no-op PUT is no change
+    """
+    CREATE TRIGGER tasks_track_updates
+    BEFORE UPDATE ON tasks
+    FOR EACH ROW WHEN (
+        (OLD.title, OLD.description, OLD.status, OLD.summary, OLD.enrichment_state)
+        IS DISTINCT FROM
+        (NEW.title, NEW.description, NEW.status, NEW.summary, NEW.enrichment_state)
+    )
+    EXECUTE FUNCTION tasks_track_changes()
+    """,
+    """
+    CREATE TRIGGER tasks_track_deletes
+    AFTER DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION tasks_track_changes()
+    """,
+]
+
+
+def pgvector_version(connection):
+    version = connection.execute(
+        text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    ).scalar()
+    return tuple(int(p) for p in (version or "0").split(".")[:2])
+
+
+def _supports_bit_hnsw(ddl, target, bind, **kw):
+    return pgvector_version(bind) >= (0, 7)
+
+
+# create_all (tests, fresh dev databases) gets what the migrations set up
+event.listen(TaskDB.__table__, "after_create", DDL(QUANTIZE_EMBEDDINGS_FUNCTION))
+event.listen(TaskDB.__table__, "after_create", DDL(QUANTIZE_EMBEDDINGS_TRIGGER))
+event.listen(
+    TaskDB.__table__,
+    "after_create",
+    DDL(BINARY_HNSW_INDEX).execute_if(callable_=_supports_bit_hnsw),
+)
+event.listen(TaskDB.__table__, "after_create", DDL(TRACK_CHANGES_FUNCTION))
+for trigger in TRACK_CHANGES_TRIGGERS:
+    event.listen(TaskDB.__table__, "after_create", DDL(trigger))
 
 
 class UserDB(Base):
@@ -23,3 +189,55 @@ class UserDB(Base):
     tasks = relationship("TaskDB", back_populates="user")
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
+
+
+# the latest change version of each user's tasks (see TRACK_CHANGES_FUNCTION)
+class TaskChangeVersionDB(Base):
+    __tablename__ = "task_change_versions"
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    # newest tombstone dropped after TASK_TOMBSTONE_RETENTION_DAYS: changes
+    # since an older version can't be listed anymore
+    pruned_version = Column(BigInteger, nullable=False, server_default="0")
+
+
+# one row per deleted task, so GET /tasks/changes can report deletions
+class TaskTombstoneDB(Base):
+    __tablename__ = "task_tombstones"
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    change_version = Column(BigInteger, primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class EmbeddingCacheDB(Base):
+    __tablename__ = "embedding_cache"
+    key = Column(String(64), primary_key=True)
+    model = Column(String, index=True)
+    version = Column(Integer)
+    task_type = Column(String)
+    embedding = Column(Vector(settings.EMBEDDING_DIMENSIONS))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class SummaryCacheDB(Base):
+    __tablename__ = "summary_cache"
+    key = Column(String(64), primary_key=True)
+    model = Column(String, index=True)
+    summary = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class EnrichmentJobDB(Base):
+    __tablename__ = "enrichment_jobs"
+    id = Column(Integer, primary_key=True)
+    task_id = Column(
+        Integer, ForeignKey("tasks.id", ondelete="CASCADE"), unique=True, nullable=False
+    )
+    # bumped on every re-enqueue so a worker holding an older claim
+    # doesn't delete a job that was re-queued while it was running
+    generation = Column(Integer, default=0, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    run_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
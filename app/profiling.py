@@ -0,0 +1,274 @@
+"""
+On-demand profiling of single requests.
+
+A request is profiled when it carries a valid `X-Profile` token (see
+`python -m app.profiling`) or is picked by PROFILE_SAMPLE_RATE. While it
+runs, a thread samples the event loop's call stack every
+PROFILE_INTERVAL_MS, and every SQL statement it executes is timed.
+Read-only statements slower than PROFILE_EXPLAIN_MS are run again under
+`EXPLAIN (ANALYZE, BUFFERS)`. The results go to PROFILE_DIR:
+
+- `<id>.speedscope.json`: open in https://www.speedscope.app
+- `<id>.sql.json`: the statements, their timings and plans
+
+and the response names the profile in an `X-Profile-Id` header.
+
+The loop runs other requests too. Samples taken while another task holds
+the loop, or while it waits on I/O, are recorded as "(waiting)".
+
+When neither trigger fires, the middleware only looks for the header, and
+each statement costs one context variable lookup.
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from jose import JWTError, jwt
+from sqlalchemy import event
+from .config import settings
+
+
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+WAITING = ("(waiting)", "", 0)
+
+
+# signed with the access token key, so the audience keeps the two apart:
+# access tokens carry none and fail here, profile tokens fail verify_token
+PROFILE_AUDIENCE = "profile"
+
+
+def create_profile_token(minutes: int):
+    """A token that makes requests carrying it in X-Profile get profiled."""
+    expire = datetime.now(timezone.utc) + timedelta(minutes=minutes)
+    return jwt.encode(
+        {"scope": "profile", "aud": PROFILE_AUDIENCE, "exp": expire},
+        settings.SECRET_KEY,
+        settings.ALGORITHM,
+    )
+
+
+def valid_profile_token(token: str):
+    try:
+        claims = jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            [settings.ALGORITHM],
+            audience=PROFILE_AUDIENCE,
+            options={"require_aud": True},
+        )
+    except JWTError:
+        return False
+    return claims.get("scope") == "profile"
+
+
+class Sampler(threading.Thread):
+    """Samples the stack of `thread_id` while `task` holds its loop."""
+
+    def __init__(self, thread_id: int, loop, task, interval: float):
+        super().__init__(daemon=True, name="profile-sampler")
+        self.thread_id = thread_id
+        self.loop = loop
+        self.task = task
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+
+            stack = [WAITING]
+            if frame is not None and asyncio.current_task(self.loop) is self.task:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    name = getattr(code, "co_qualname", code.co_name)
+                    stack.append((name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.reverse()
+
+            self.samples.append((tuple(stack), now - last))
+            last = now
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Profile:
+    def __init__(self, name: str):
+        self.name = name
+        self.id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.statements = []
+        self.sampler = None
+
+    def speedscope(self):
+        frames, index, samples, weights = [], {}, [], []
+        for stack, seconds in self.sampler.samples:
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    name, file, line = frame
+                    frames.append({"name": name, "file": file, "line": line})
+            samples.append([index[frame] for frame in stack])
+            weights.append(seconds * 1000)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+            "name": self.name,
+            "exporter": "sync-ai",
+        }
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.id)
+
+        with open(f"{base}.speedscope.json", "w") as f:
+            json.dump(self.speedscope(), f)
+        with open(f"{base}.sql.json", "w") as f:
+            json.dump({"request": self.name, "statements": self.statements}, f)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    def _wanted(self, scope):
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return valid_profile_token(value.decode("latin-1"))
+
+        rate = settings.PROFILE_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+
+        profile = Profile(f"{scope['method']} {scope['path']}")
+        profile.sampler = Sampler(
+            threading.get_ident(),
+            asyncio.get_running_loop(),
+            asyncio.current_task(),
+            settings.PROFILE_INTERVAL_MS / 1000,
+        )
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = [*message.get("headers", [])]
+                headers.append((b"x-profile-id", profile.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_profile.set(profile)
+        profile.sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.sampler.stop()
+            current_profile.reset(token)
+
+            route = scope.get("route")
+            if route:
+                profile.name = f"{scope['method']} {route.path}"
+            await asyncio.to_thread(profile.save, settings.PROFILE_DIR)
+
+
+# a WITH can hide an INSERT/UPDATE/DELETE in one of its queries
+DATA_MODIFYING = re.compile(r"\b(insert|update|delete|merge)\b", re.IGNORECASE)
+
+
+def _read_only(statement: str):
+    # ANALYZE runs the statement again, which only a query that writes
+    # nothing can afford
+    head = statement.lstrip()[:6].lower()
+    if head == "select":
+        return True
+    return head[:4] == "with" and not DATA_MODIFYING.search(statement)
+
+
+def _explain(conn, statement, parameters):
+    # inside a savepoint, so a failing EXPLAIN can't abort the request's
+    # transaction
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT profile_explain")
+        try:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+            plan = [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT profile_explain")
+            plan = [f"EXPLAIN failed: {e}"]
+        cursor.execute("RELEASE SAVEPOINT profile_explain")
+        return plan
+    finally:
+        cursor.close()
+
+
+def capture_statements(engine):
+    """Record the statements profiled requests run on `engine` (a sync engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        if profile is None or not conn.info.get("profile_start"):
+            return
+
+        ms = (time.perf_counter() - conn.info["profile_start"].pop()) * 1000
+        entry = {"statement": statement, "ms": round(ms, 3)}
+        if (
+            ms >= settings.PROFILE_EXPLAIN_MS
+            and not executemany
+            and _read_only(statement)
+        ):
+            entry["plan"] = _explain(conn, statement, parameters)
+        profile.statements.append(entry)
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        starts = (
+            context.connection.info.get("profile_start") if context.connection else None
+        )
+        if current_profile.get() is not None and starts:
+            starts.pop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a profiling token.")
+    parser.add_argument("--minutes", type=int, default=15, help="valid for")
+    args = parser.parse_args()
+
+    print(create_profile_token(args.minutes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Backfill embeddings after a model or EMBEDDING_VERSION change.
+
+Tasks whose vector was made by another model/version ("stale") are read in
+id order, --batch-size at a time, and re-embedded with up to --concurrency
+batches in flight. A new vector is only written if the task's title and
+description are still the ones it was computed from; an edited task got
+re-embedded by the edit already. After every round the last id done is
+saved to --checkpoint, so an interrupted run picks up where it stopped.
+--rate caps the tasks per second, leaving provider quota for live traffic.
+
+Search keeps working during the backfill: it only compares vectors of the
+current model and version, so a stale task is just missing from semantic
+results until its turn comes.
+
+    python -m app.reembed --batch-size 100 --concurrency 4 --rate 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from sqlalchemy import bindparam, or_, select, update
+from .ai import content_hash, embedding_stamp, get_embeddings, task_text
+from .database import AsyncSessionLocal
+from .models import TaskDB
+
+
+logger = logging.getLogger(__name__)
+
+
+def stale_embeddings(stamp: dict):
+    return (
+        TaskDB.embeddings.isnot(None),
+        or_(
+            TaskDB.embedding_model.is_distinct_from(stamp["embedding_model"]),
+            TaskDB.embedding_version.is_distinct_from(stamp["embedding_version"]),
+        ),
+    )
+
+
+def load_checkpoint(path: str, run: str):
+    """Last id done by an earlier run towards the same model/version."""
+    try:
+        with open(path) as f:
+            return json.load(f).get(run, 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def save_checkpoint(path: str, run: str, last_id: int):
+    try:
+        with open(path) as f:
+            checkpoints = json.load(f)
+    except (FileNotFoundError, ValueError):
+        checkpoints = {}
+
+    checkpoints[run] = last_id
+    # write and rename, a crash mid-write must not lose the old checkpoint
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(checkpoints, f)
+    os.replace(f"{path}.tmp", path)
+
+
+async def reembed_batch(session_factory, rows, stamp: dict):
+    """Embed and write back one batch, returns how many tasks were updated."""
+    embeddings = await get_embeddings(
+        [task_text(row.title, row.description) for row in rows],
+        task_type="retrieval_document",
+    )
+
+    table = TaskDB.__table__
+    stmt = (
+        update(table)
+        .where(
+            table.c.id == bindparam("task_id"),
+            table.c.title == bindparam("old_title"),
+            table.c.description.is_not_distinct_from(bindparam("old_description")),
+        )
+        .values(
+            embeddings=bindparam("new_embeddings", type_=table.c.embeddings.type),
+            content_hash=bindparam("new_content_hash"),
+            embedding_model=stamp["embedding_model"],
+            embedding_version=stamp["embedding_version"],
+        )
+    )
+
+    async with session_factory() as db:
+        result = await db.execute(
+            stmt,
+            [
+                {
+                    "task_id": row.id,
+                    "old_title": row.title,
+                    "old_description": row.description,
+                    "new_embeddings": embedding,
+                    "new_content_hash": content_hash(row.title, row.description),
+                }
+                for row, embedding in zip(rows, embeddings)
+            ],
+        )
+        await db.commit()
+
+    return result.rowcount if result.rowcount >= 0 else len(rows)
+
+
+async def reembed(
+    batch_size: int = 100,
+    concurrency: int = 4,
+    rate: float = 0,
+    checkpoint: str | None = None,
+    session_factory=AsyncSessionLocal,
+):
+    """Re-embed every stale task, returns how many were updated."""
+    stamp = embedding_stamp()
+    run = f"{stamp['embedding_model']}@{stamp['embedding_version']}"
+    last_id = load_checkpoint(checkpoint, run) if checkpoint else 0
+    if last_id:
+        logger.info("resuming %s after task %s", run, last_id)
+
+    scanned = updated = 0
+    started = time.monotonic()
+
+    while True:
+        async with session_factory() as db:
+            rows = (
+                await db.execute(
+                    select(TaskDB.id, TaskDB.title, TaskDB.description)
+                    .where(*stale_embeddings(stamp), TaskDB.id > last_id)
+                    .order_by(TaskDB.id)
+                    .limit(batch_size * concurrency)
+                )
+            ).all()
+
+        if not rows:
+            break
+
+        batches = [rows[i : i + batch_size] for i in range(0, len(rows), batch_size)]
+        counts = await asyncio.gather(
+            *(reembed_batch(session_factory, batch, stamp) for batch in batches)
+        )
+
+        scanned += len(rows)
+        updated += sum(counts)
+        last_id = rows[-1].id
+        if checkpoint:
+            save_checkpoint(checkpoint, run, last_id)
+        logger.info("re-embedded %s tasks, up to id %s", updated, last_id)
+
+        if rate:
+            # sleep off whatever we are ahead of the target rate
+            ahead = scanned / rate - (time.monotonic() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="max tasks per second, 0 = no limit"
+    )
+    parser.add_argument("--checkpoint", default=".reembed-checkpoint.json")
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore the saved checkpoint"
+    )
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    updated = asyncio.run(
+        reembed(args.batch_size, args.concurrency, args.rate, args.checkpoint)
+    )
+    print(f"re-embedded {updated} tasks")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
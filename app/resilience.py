@@ -0,0 +1,232 @@
+"""
+Guardrails for calls to the AI backends.
+
+Every Groq and embedding call goes through a Guard, which gives it:
+
+- a deadline: the whole call, retries and hedge included, is cancelled
+  after `timeout` seconds and raises asyncio.TimeoutError;
+- a circuit breaker: after AI_BREAKER_FAILURES outages in a row (only
+  `unavailable_errors()` count), calls fail fast with CircuitOpenError for
+  AI_BREAKER_RESET_SECONDS. Then one probe call is let through
+  (half-open). It closes the circuit if it succeeds and reopens it if it
+  fails;
+- optional hedging: with AI_HEDGE_PERCENTILE set, a call still running
+  after that percentile of recent latencies gets a second identical
+  request, and whichever answers first wins.
+
+What to do when a call fails anyway (store the task for the enrichment
+workers, search lexically) is up to the callers, see AI_DEGRADED_MODE.
+They fall back only on `unavailable_errors()`; anything else (a bug, a
+rejected key) still fails the request.
+"""
+
+import asyncio
+import sys
+import time
+from collections import deque
+from .config import settings
+from .metrics import Counter, Gauge
+
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+breaker_state = Gauge(
+    "circuit_breaker_state",
+    "0 closed, 1 half-open (probing), 2 open.",
+    ("dependency",),
+)
+breaker_transitions = Counter(
+    "circuit_breaker_transitions_total",
+    "Circuit breaker state changes, by the state entered.",
+    ("dependency", "state"),
+)
+deadline_exceeded = Counter(
+    "dependency_deadline_exceeded_total",
+    "Calls cancelled at their deadline.",
+    ("dependency",),
+)
+hedged_calls = Counter(
+    "dependency_hedged_calls_total",
+    "Calls that sent a second, hedged request.",
+    ("dependency",),
+)
+
+
+class CircuitOpenError(Exception):
+    """The dependency failed too often lately, the call wasn't attempted."""
+
+
+def unavailable_errors():
+    """
+    The exceptions that mean an AI backend is down, overloaded or too slow:
+    the deadline, an open circuit, connection errors, 5xx and 429 answers.
+    The SDKs are imported on first use, and one that isn't loaded yet can't
+    have raised anything.
+    """
+    errors = [asyncio.TimeoutError, CircuitOpenError]
+
+    groq = sys.modules.get("groq")
+    if groq:
+        errors += [
+            groq.APIConnectionError,
+            groq.InternalServerError,
+            groq.RateLimitError,
+        ]
+
+    google = sys.modules.get("google.api_core.exceptions")
+    if google:
+        errors += [
+            google.ServiceUnavailable,
+            google.DeadlineExceeded,
+            google.InternalServerError,
+            google.ResourceExhausted,
+            google.RetryError,
+        ]
+
+    return tuple(errors)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int, reset_seconds: float):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.reset()
+
+    def reset(self):
+        self.state = CLOSED
+        self.failed = 0
+        self.opened_at = 0.0
+        self.probing = False
+        breaker_state.set(0, dependency=self.name)
+
+    def _enter(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        breaker_transitions.inc(dependency=self.name, state=state)
+        breaker_state.set((CLOSED, HALF_OPEN, OPEN).index(state), dependency=self.name)
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError. True if it is the probe."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self._enter(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self.probing:
+                raise CircuitOpenError(f"{self.name} circuit is half-open")
+            self.probing = True
+            return True
+
+        return False
+
+    def record(self, ok: bool, probe: bool):
+        if probe:
+            self.probing = False
+
+        if ok:
+            self.failed = 0
+            self._enter(CLOSED)
+            return
+
+        self.failed += 1
+        if probe or (self.failures and self.failed >= self.failures):
+            self.opened_at = time.monotonic()
+            self._enter(OPEN)
+
+    def abandon(self, probe: bool):
+        # a cancelled probe says nothing about the dependency
+        if probe:
+            self.probing = False
+
+
+class LatencyWindow:
+    """The last `size` call latencies, for the hedging percentile."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float):
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Guard:
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(
+            name, settings.AI_BREAKER_FAILURES, settings.AI_BREAKER_RESET_SECONDS
+        )
+        self.latencies = LatencyWindow()
+
+    async def call(self, attempt, timeout: float):
+        """
+        Run `attempt()` (a coroutine function, called again for a hedge)
+        within the deadline, the breaker and the hedging policy.
+        """
+        probe = self.breaker.before_call()
+        try:
+            result = await asyncio.wait_for(self._hedged(attempt), timeout)
+        except asyncio.TimeoutError:
+            deadline_exceeded.inc(dependency=self.name)
+            self.breaker.record(False, probe)
+            raise
+        except unavailable_errors():
+            self.breaker.record(False, probe)
+            raise
+        except BaseException:
+            # a bug or a rejected key says nothing about an outage, it must
+            # not open the circuit and turn into CircuitOpenError
+            self.breaker.abandon(probe)
+            raise
+
+        self.breaker.record(True, probe)
+        return result
+
+    async def _hedged(self, attempt):
+        start = time.perf_counter()
+
+        delay = None
+        if settings.AI_HEDGE_PERCENTILE:
+            delay = self.latencies.percentile(settings.AI_HEDGE_PERCENTILE)
+
+        if delay is None:
+            result = await attempt()
+        else:
+            result = await self._race(attempt, delay)
+
+        self.latencies.add(time.perf_counter() - start)
+        return result
+
+    async def _race(self, attempt, delay: float):
+        tasks = [asyncio.ensure_future(attempt())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return tasks[0].result()
+
+            hedged_calls.inc(dependency=self.name)
+            tasks.append(asyncio.ensure_future(attempt()))
+
+            # first success wins; if both fail, the last error is raised
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
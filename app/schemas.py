@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from enum import Enum
 
 
@@ -7,6 +7,24 @@ class TaskStatus(Enum):
     COMPLETED = "completed"
 
 
+class EnrichmentState(Enum):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class SearchMode(Enum):
+    AUTO = "auto"
+    HYBRID = "hybrid"
+    SEMANTIC = "semantic"
+    LEXICAL = "lexical"
+
+
+class ExportFormat(Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
 class TaskBase(BaseModel):
     title: str
     description: str
@@ -25,10 +43,53 @@ class TaskUpdate(BaseModel):
 
 class Task(TaskBase):
     id: int
+    enrichment_state: EnrichmentState = EnrichmentState.READY
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class BulkTaskResult(BaseModel):
+    # position of the task in the submitted array / NDJSON stream
+    index: int
+    id: int | None = None
+    error: str | None = None
+
+
+class BulkImportResult(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkTaskResult]
+
+
+class TaskSelection(BaseModel):
+    """Tasks picked by id, by current status, or both."""
+
+    ids: list[int] | None = Field(None, max_length=10000)
+    where_status: TaskStatus | None = None
+
+    @model_validator(mode="after")
+    def check_not_empty(self):
+        if self.ids is None and self.where_status is None:
+            raise ValueError("select tasks with ids and/or where_status")
+        return self
+
+
+class TaskStatusChange(TaskSelection):
+    status: TaskStatus
+
+
+class TasksChanged(BaseModel):
+    count: int
+    ids: list[int]
+
+
+class TaskChanges(BaseModel):
+    # pass `version` as ?since= next time
+    version: int
+    upserted: list[Task]
+    deleted: list[int]
+
+
 class UserCreate(BaseModel):
     username: str
     password: str
@@ -42,5 +103,20 @@ class User(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class Principal(BaseModel):
+    """The authenticated user as routes see it: no ORM state, no relationships."""
+
+    id: int
+    username: str
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+
 class SearchRequest(BaseModel):
     search_term: str
+    # auto: short or "quoted" terms are answered from the full-text index
+    # without an embedding call, everything else goes hybrid
+    mode: SearchMode = SearchMode.AUTO
+    limit: int = Field(5, ge=1, le=50)
+    # max cosine distance for the semantic side
+    threshold: float = Field(0.40, ge=0, le=2)
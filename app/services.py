@@ -1,35 +1,230 @@
+import asyncio
+import sys
 from .config import settings
-from groq import AsyncGroq
+from .cache import SummaryCache, normalize_text, summary_cache_key
+from .metrics import track
+from .resilience import Guard, unavailable_errors
 
 
-# create the Async Groq client
-client = AsyncGroq(api_key=settings.GROQ_API_KEY)
+# the Async Groq client, created on first use: importing the SDK and setting
+# up its HTTP client (TLS context included) is a noticeable part of startup
+client = None
+
+
+def get_client():
+    global client
+
+    if client is None:
+        from groq import AsyncGroq
+
+        client = AsyncGroq(api_key=settings.GROQ_API_KEY)
+
+    return client
+
+
+# bump when the prompts below change, so cached summaries from the old prompt
+# are no longer used
+SUMMARY_PROMPT_VERSION = 1
+
+SUMMARY_PROMPT = (
+    "You are a specialized task summarization tool, not a chatbot. "
+    "Your ONLY job is to output a summary of the user's input in 5 words or less. "
+    "Rules:\n"
+    "1. Do NOT answer questions or search for products.\n"
+    "2. If the input is short (e.g. 'milk'), just return 'Buy milk'.\n"
+    "3. If the input is vague, summarize it literally.\n"
+    "4. NEVER say 'no description provided' or 'I cannot summarize'. "
+    "Just return the input itself if you are unsure."
+)
+
+# several descriptions per completion for bulk imports; same rules, so the
+# results share the cache with single summaries
+BATCH_SUMMARY_PROMPT = SUMMARY_PROMPT + (
+    "\n\nYou will get several numbered task descriptions. Summarize each one "
+    "separately and reply with exactly one line per description, in the same "
+    "order, formatted as '<number>. <summary>'."
+)
+
+# unchanged descriptions (re-saved tasks, common chores) skip the LLM call
+summary_cache = SummaryCache(
+    settings.SUMMARY_CACHE_SIZE, persist=settings.SUMMARY_CACHE_PERSIST
+)
+fast_path_hits = 0
+llm_calls = 0
+# deadline, circuit breaker and hedging for every completion
+groq_guard = Guard("groq")
+
+
+def fast_summary(text: str):
+    """
+    A few words are already a summary: return them tidied up instead of
+    asking the LLM, or None if the description is too long for that.
+    """
+    words = normalize_text(text).split()
+    if len(words) > settings.SUMMARY_FAST_PATH_WORDS:
+        return None
+
+    summary = " ".join(words).rstrip(".,;:!")
+    return summary[:1].upper() + summary[1:]
+
+
+def summary_errors():
+    """
+    What a failed completion raises: an outage (see `unavailable_errors`) or
+    any other error answer from Groq. Anything else is a bug.
+    """
+    errors = unavailable_errors()
+
+    groq = sys.modules.get("groq")
+    if groq:
+        errors += (groq.APIError,)
+
+    return errors
+
+
+async def _complete(prompt: str, content: str, max_tokens: int):
+    global llm_calls
+
+    llm_calls += 1
+
+    async def attempt():
+        with track("groq"):
+            return await get_client().chat.completions.create(
+                messages=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": content},
+                ],
+                model=settings.SUMMARY_MODEL,
+                temperature=0.3,  # Lower temperature = less creative/hallucinatory
+                max_tokens=max_tokens,
+            )
+
+    res = await groq_guard.call(attempt, settings.SUMMARY_TIMEOUT)
+    return res.choices[0].message.content.strip()
 
 
 async def get_ai_summary(text: str):
+    global fast_path_hits
+
     if not text or len(text.strip()) == 0:
         return "No description"
 
-    res = await client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a specialized task summarization tool, not a chatbot. "
-                    "Your ONLY job is to output a summary of the user's input in 5 words or less. "
-                    "Rules:\n"
-                    "1. Do NOT answer questions or search for products.\n"
-                    "2. If the input is short (e.g. 'milk'), just return 'Buy milk'.\n"
-                    "3. If the input is vague, summarize it literally.\n"
-                    "4. NEVER say 'no description provided' or 'I cannot summarize'. "
-                    "Just return the input itself if you are unsure."
-                ),
-            },
-            {"role": "user", "content": f"Task description: {text}"},
-        ],
-        model="llama-3.1-8b-instant",
-        temperature=0.3,  # Lower temperature = less creative/hallucinatory
-        max_tokens=10,
+    summary = fast_summary(text)
+    if summary:
+        fast_path_hits += 1
+        return summary
+
+    key = summary_cache_key(text, settings.SUMMARY_MODEL, SUMMARY_PROMPT_VERSION)
+    summary = await summary_cache.get(key)
+    if summary is not None:
+        return summary
+
+    summary = await _complete(SUMMARY_PROMPT, f"Task description: {text}", 10)
+    await summary_cache.set(key, summary, settings.SUMMARY_MODEL)
+
+    return summary
+
+
+async def _summarize_batch(texts: list[str]):
+    """One completion for several descriptions, None if the reply is garbled."""
+    content = "\n".join(
+        f"{i}. {normalize_text(text)}" for i, text in enumerate(texts, 1)
     )
+    reply = await _complete(BATCH_SUMMARY_PROMPT, content, 12 * len(texts))
 
-    return res.choices[0].message.content.strip()
+    lines = [line.strip() for line in reply.splitlines() if line.strip()]
+    if len(lines) != len(texts):
+        return None
+
+    summaries = []
+    for number, line in enumerate(lines, 1):
+        prefix = f"{number}."
+        if not line.startswith(prefix):
+            return None
+        summaries.append(line[len(prefix) :].strip())
+
+    return summaries
+
+
+async def get_ai_summaries(texts: list[str]):
+    """
+    Summaries for many descriptions (bulk imports). Fast path and cache
+    first, then the misses go to the LLM SUMMARY_BATCH_SIZE per completion,
+    at most SUMMARY_MAX_CONCURRENCY completions at a time. A batch whose
+    reply can't be matched up or fails is retried one description at a time.
+    A failed summary (see `summary_errors`) comes back as its exception,
+    other errors are raised.
+    """
+    global fast_path_hits
+
+    summaries = {}
+    keys = {}
+    for text in dict.fromkeys(texts):
+        if not text or len(text.strip()) == 0:
+            summaries[text] = "No description"
+        elif summary := fast_summary(text):
+            fast_path_hits += 1
+            summaries[text] = summary
+        else:
+            keys[text] = summary_cache_key(
+                text, settings.SUMMARY_MODEL, SUMMARY_PROMPT_VERSION
+            )
+
+    cached = await summary_cache.get_many(list(keys.values()))
+    missing = []
+    for text, key in keys.items():
+        if key in cached:
+            summaries[text] = cached[key]
+        else:
+            missing.append(text)
+
+    semaphore = asyncio.Semaphore(settings.SUMMARY_MAX_CONCURRENCY)
+
+    async def limited(coro):
+        async with semaphore:
+            return await coro
+
+    async def summarize(batch):
+        try:
+            results = await limited(_summarize_batch(batch))
+        except summary_errors():
+            results = None
+
+        if results is None:
+            results = await asyncio.gather(
+                *(limited(get_ai_summary(text)) for text in batch),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception) and not isinstance(
+                    result, summary_errors()
+                ):
+                    raise result
+        else:
+            await summary_cache.set_many(
+                {keys[text]: summary for text, summary in zip(batch, results)},
+                settings.SUMMARY_MODEL,
+            )
+
+        summaries.update(zip(batch, results))
+
+    size = settings.SUMMARY_BATCH_SIZE
+    await asyncio.gather(
+        *(summarize(missing[i : i + size]) for i in range(0, len(missing), size))
+    )
+
+    return [summaries[text] for text in texts]
+
+
+def summary_stats():
+    cache = summary_cache.stats()
+    requests = (
+        fast_path_hits + cache["memory_hits"] + cache["db_hits"] + cache["misses"]
+    )
+
+    return {
+        **cache,
+        "fast_path_hits": fast_path_hits,
+        "fast_path_ratio": fast_path_hits / requests if requests else 0.0,
+        "llm_calls": llm_calls,
+    }
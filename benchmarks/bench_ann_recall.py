@@ -0,0 +1,209 @@
+"""
+Recall vs latency of the HNSW index compared with exact search.
+
+Loads a synthetic corpus of --tasks clustered, normalized 768-d vectors
+spread over --users owners into a scratch table (`ann_bench`), builds the
+same HNSW index as `tasks.embeddings`, then runs --queries owner-filtered
+top-k searches exactly (index scans disabled) and through the index at each
+--ef value. Prints recall@k and latency percentiles per setting.
+
+    DATABASE_URL=... python -m benchmarks.bench_ann_recall --tasks 1000000
+
+Loading and indexing 1M vectors takes a while; pass --skip-load to rerun the
+queries against an existing `ann_bench` table.
+"""
+
+import argparse
+import io
+import json
+import struct
+import time
+import numpy as np
+from sqlalchemy import create_engine
+from app.config import settings
+
+DIM = 768
+
+
+def synthetic_vectors(rng, centroids, n):
+    # tasks cluster around topics ("groceries", "work", ...) rather than
+    # being uniformly random, which is what makes ANN recall interesting
+    picks = rng.integers(0, len(centroids), n)
+    vectors = centroids[picks] + rng.normal(0, 0.35, (n, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def copy_chunk(cursor, owners, vectors):
+    # binary COPY: int16 field count, then length-prefixed fields; pgvector's
+    # binary format is int16 dim, int16 unused, float4[dim]
+    row = np.dtype(
+        [
+            ("nfields", ">i2"),
+            ("owner_len", ">i4"),
+            ("owner", ">i4"),
+            ("vec_len", ">i4"),
+            ("dim", ">i2"),
+            ("unused", ">i2"),
+            ("vec", ">f4", (DIM,)),
+        ]
+    )
+    rows = np.empty(len(owners), dtype=row)
+    rows["nfields"] = 2
+    rows["owner_len"] = 4
+    rows["owner"] = owners
+    rows["vec_len"] = 4 + 4 * DIM
+    rows["dim"] = DIM
+    rows["unused"] = 0
+    rows["vec"] = vectors
+
+    buf = io.BytesIO()
+    buf.write(b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0))
+    buf.write(rows.tobytes())
+    buf.write(struct.pack(">h", -1))
+    buf.seek(0)
+
+    cursor.copy_expert(
+        "COPY ann_bench (owner_id, embedding) FROM STDIN WITH (FORMAT binary)", buf
+    )
+
+
+def load(conn, args, rng, centroids):
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS ann_bench")
+    cursor.execute(
+        "CREATE TABLE ann_bench "
+        f"(id bigserial PRIMARY KEY, owner_id integer, embedding vector({DIM}))"
+    )
+
+    start = time.perf_counter()
+    for offset in range(0, args.tasks, args.chunk):
+        n = min(args.chunk, args.tasks - offset)
+        owners = rng.integers(1, args.users + 1, n)
+        copy_chunk(cursor, owners, synthetic_vectors(rng, centroids, n))
+        conn.commit()
+        print(f"loaded {offset + n}/{args.tasks} rows", end="\r", flush=True)
+    print(f"\nloaded in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    cursor.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+    cursor.execute(
+        "CREATE INDEX ann_bench_hnsw ON ann_bench "
+        "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+    )
+    cursor.execute("ANALYZE ann_bench")
+    conn.commit()
+    print(f"built HNSW index in {time.perf_counter() - start:.1f}s")
+
+
+def search(cursor, owner, vector, k):
+    literal = "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+    start = time.perf_counter()
+    cursor.execute(
+        "SELECT id FROM ann_bench WHERE owner_id = %s "
+        "ORDER BY embedding <=> %s::vector LIMIT %s",
+        (int(owner), literal, k),
+    )
+    ids = [row[0] for row in cursor.fetchall()]
+    return ids, time.perf_counter() - start
+
+
+def iterative_scan_supported(cursor):
+    cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    version = tuple(int(p) for p in cursor.fetchone()[0].split(".")[:2])
+    return version >= (0, 8)
+
+
+def run_queries(conn, queries, k, ef_search=None, iterative_scan=None):
+    cursor = conn.cursor()
+    results, latencies = [], []
+
+    for owner, vector in queries:
+        if ef_search is None:
+            cursor.execute("SET LOCAL enable_indexscan = off")
+        else:
+            cursor.execute("SET LOCAL hnsw.ef_search = %s", (ef_search,))
+            if iterative_scan:
+                cursor.execute("SET LOCAL hnsw.iterative_scan = %s", (iterative_scan,))
+
+        ids, elapsed = search(cursor, owner, vector, k)
+        conn.rollback()
+        results.append(ids)
+        latencies.append(elapsed * 1000)
+
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ef", type=int, nargs="+", default=[20, 40, 80, 160])
+    parser.add_argument("--iterative-scan", default=settings.HNSW_ITERATIVE_SCAN)
+    parser.add_argument("--chunk", type=int, default=50_000)
+    parser.add_argument("--maintenance-work-mem", default="2GB")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centroids = rng.normal(0, 1, (256, DIM)).astype(np.float32)
+
+    engine = create_engine(settings.DATABASE_URL)
+    conn = engine.raw_connection()
+
+    if not args.skip_load:
+        load(conn, args, rng, centroids)
+
+    iterative_scan = args.iterative_scan
+    if iterative_scan != "off" and not iterative_scan_supported(conn.cursor()):
+        print("pgvector < 0.8: iterative index scans unavailable")
+        iterative_scan = None
+
+    queries = list(
+        zip(
+            rng.integers(1, args.users + 1, args.queries),
+            synthetic_vectors(rng, centroids, args.queries),
+        )
+    )
+
+    exact, exact_latencies = run_queries(conn, queries, args.k)
+    report = [
+        {
+            "mode": "exact",
+            "recall": 1.0,
+            "p50_ms": float(np.percentile(exact_latencies, 50)),
+            "p95_ms": float(np.percentile(exact_latencies, 95)),
+        }
+    ]
+
+    for ef in args.ef:
+        ann, latencies = run_queries(conn, queries, args.k, ef, iterative_scan)
+        hits = sum(len(set(a) & set(e)) for a, e in zip(ann, exact))
+        wanted = sum(len(e) for e in exact)
+        report.append(
+            {
+                "mode": f"hnsw ef_search={ef}",
+                "recall": hits / wanted if wanted else 1.0,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+            }
+        )
+
+    print(f"{'mode':<22}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in report:
+        print(
+            f"{row['mode']:<22}{row['recall']:>10.3f}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Importing many tasks: POST /tasks one by one vs a single POST /tasks/bulk.
+
+Runs in-process against the app with simulated AI backends: every Groq
+completion and every embedding request sleeps --ai-latency ms (embeddings
+come from the hashing provider), so the numbers show round trips rather
+than model speed. Times --single sequential POST /tasks calls and
+extrapolates them to --tasks, then imports --tasks through /tasks/bulk as a
+JSON array and as NDJSON.
+
+    DATABASE_URL=... python -m benchmarks.bench_bulk_import --tasks 10000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch
+import httpx
+from app import services
+from app.main import app
+from app.database import Base, engine, async_engine
+from app.embeddings import HashingProvider
+
+
+class SlowHashingProvider(HashingProvider):
+    def __init__(self, dimensions, latency):
+        super().__init__(dimensions)
+        self.latency = latency
+
+    async def embed(self, texts, task_type):
+        await asyncio.sleep(self.latency)
+        return self._embed(texts)
+
+
+def make_tasks(n, run):
+    # unique, long enough to skip the summary fast path and the caches
+    return [
+        {
+            "title": f"imported task {i}",
+            "description": f"follow up on item {i} from the {run} migration batch",
+        }
+        for i in range(n)
+    ]
+
+
+async def run(args):
+    latency = args.ai_latency / 1000
+
+    async def completion(messages, **kwargs):
+        await asyncio.sleep(latency)
+        # batched prompts number their descriptions, answer each line
+        lines = messages[-1]["content"].splitlines()
+        content = "\n".join(f"{i}. Follow up" for i in range(1, len(lines) + 1))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        user = {"username": f"bench-{uuid.uuid4().hex[:8]}", "password": "password123"}
+        (await client.post("/users", json=user)).raise_for_status()
+        login = await client.post("/users/login", json=user)
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        with (
+            patch.object(services.get_client().chat.completions, "create", completion),
+            patch(
+                "app.ai.get_provider",
+                return_value=SlowHashingProvider(768, latency),
+            ),
+        ):
+            start = time.perf_counter()
+            for task in make_tasks(args.single, uuid.uuid4().hex):
+                (
+                    await client.post("/tasks", json=task, headers=headers)
+                ).raise_for_status()
+            single = (time.perf_counter() - start) / args.single
+
+            start = time.perf_counter()
+            res = await client.post(
+                "/tasks/bulk",
+                json=make_tasks(args.tasks, uuid.uuid4().hex),
+                headers=headers,
+            )
+            array = time.perf_counter() - start
+            array_created = res.json()["created"]
+
+            body = "\n".join(
+                json.dumps(task) for task in make_tasks(args.tasks, uuid.uuid4().hex)
+            )
+            start = time.perf_counter()
+            res = await client.post(
+                "/tasks/bulk",
+                content=body,
+                headers={**headers, "Content-Type": "application/x-ndjson"},
+            )
+            ndjson = time.perf_counter() - start
+            ndjson_created = res.json()["created"]
+
+    await async_engine.dispose()
+
+    print(
+        f"POST /tasks:       {single * 1000:.0f} ms per task, "
+        f"~{single * args.tasks:.0f}s for {args.tasks}"
+    )
+    print(f"bulk JSON array:   {array:.1f}s for {array_created} tasks")
+    print(f"bulk NDJSON:       {ndjson:.1f}s for {ndjson_created} tasks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--single", type=int, default=100)
+    parser.add_argument("--ai-latency", type=float, default=100)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares get_embedding with and without the request-coalescing batcher.
+
+A burst of --requests concurrent calls (with --duplicates of them repeating
+an earlier text) goes through app.ai.get_embedding while the Gemini call is
+a stub that takes --latency seconds per request, regardless of batch size,
+and only allows EMBEDDING_MAX_CONCURRENCY requests in flight like a quota
+would. Reports remote calls made and p50/p99 latency per mode.
+
+    python -m benchmarks.bench_embedding_batching --requests 500
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from unittest.mock import patch
+from app import ai
+from app.cache import EmbeddingCache
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def burst(texts):
+    async def one(text):
+        start = time.perf_counter()
+        await ai.get_embedding(text, task_type="retrieval_query")
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(one(text) for text in texts))
+
+
+def run(mode, batching, texts, latency):
+    calls = 0
+
+    async def remote(batch, task_type):
+        nonlocal calls
+        calls += 1
+        semaphore = ai._get_semaphore()
+        async with semaphore:
+            await asyncio.sleep(latency)
+        return [[0.1] * 768 for _ in batch]
+
+    with (
+        patch.object(ai.settings, "EMBEDDING_BATCHING", batching),
+        patch.object(ai, "embedding_cache", EmbeddingCache(0, persist=False)),
+        patch("app.ai._embed_remote", remote),
+    ):
+        start = time.perf_counter()
+        latencies = asyncio.run(burst(texts))
+        wall = time.perf_counter() - start
+
+    print(
+        f"{mode:>10}: {calls:>4} remote calls, {wall:.2f}s wall, "
+        f"p50 {percentile(latencies, 50) * 1000:.0f} ms, "
+        f"p99 {percentile(latencies, 99) * 1000:.0f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--duplicates", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    texts = []
+    for i in range(args.requests):
+        if texts and rng.random() < args.duplicates:
+            texts.append(rng.choice(texts))
+        else:
+            texts.append(f"search term {i}")
+
+    run("unbatched", False, texts, args.latency)
+    run("batched", True, texts, args.latency)
+
+
+if __name__ == "__main__":
+    main()
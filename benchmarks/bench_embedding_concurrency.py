@@ -0,0 +1,110 @@
+"""
+Shows that concurrent /tasks and /search requests no longer serialize behind
+the embedding call.
+
+The Gemini call is replaced by a stub that takes --latency seconds, either by
+blocking the thread (how the old synchronous client behaved) or by awaiting
+(the async client). Both runs fire the same burst of concurrent requests at
+the app in-process; with a blocking client the wall time grows with the
+number of requests, with the async client it stays close to one round trip.
+Requests beyond the database pool size (15 by default) wait for a
+connection. Disable batching to measure one call per request.
+
+    DATABASE_URL=... EMBEDDING_BATCHING=false \
+        python -m benchmarks.bench_embedding_concurrency -n 20
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from unittest.mock import patch, AsyncMock
+import httpx
+from app.main import app
+from app.database import Base, engine, async_engine
+
+
+def blocking_stub(latency):
+    async def embed(texts, task_type):
+        time.sleep(latency)
+        return [[0.1] * 768 for _ in texts]
+
+    return embed
+
+
+def async_stub(latency):
+    async def embed(texts, task_type):
+        await asyncio.sleep(latency)
+        return [[0.1] * 768 for _ in texts]
+
+    return embed
+
+
+async def burst(client, headers, n):
+    async def one(i):
+        start = time.perf_counter()
+        if i % 2:
+            res = await client.post(
+                "/search",
+                json={"search_term": f"query {i} {uuid.uuid4()}"},
+                headers=headers,
+            )
+        else:
+            res = await client.post(
+                "/tasks",
+                json={"title": f"task {i}", "description": str(uuid.uuid4())},
+                headers=headers,
+            )
+        res.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(n)))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+async def run(mode, stub, n):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        user = {"username": f"bench-{uuid.uuid4().hex[:8]}", "password": "password123"}
+        (await client.post("/users", json=user)).raise_for_status()
+        login = await client.post("/users/login", json=user)
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        with (
+            patch("app.ai._embed_remote", stub),
+            patch(
+                "app.main.get_ai_summary", new_callable=AsyncMock, return_value="bench"
+            ),
+        ):
+            wall, latencies = await burst(client, headers, n)
+
+    # pooled asyncpg connections belong to this run's event loop
+    await async_engine.dispose()
+
+    p50 = latencies[len(latencies) // 2]
+    print(
+        f"{mode:>8}: {n} requests in {wall:.2f}s "
+        f"(p50 {p50 * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms)"
+    )
+    return wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    blocking = asyncio.run(run("blocking", blocking_stub(args.latency), args.requests))
+    nonblocking = asyncio.run(run("async", async_stub(args.latency), args.requests))
+
+    print(f"speedup: {blocking / nonblocking:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Task read latency during a login storm, with bcrypt on and off the event loop.
+
+Runs --logins concurrent logins (each a full bcrypt verify at BCRYPT_ROUNDS)
+alongside --reads GET /tasks requests from an already authenticated user,
+in-process against the app. The "inline" run hashes on the event loop like
+the handlers used to, the "pool" run goes through the bounded bcrypt thread
+pool. Reports p50/p95/max of the task reads and how many logins were shed
+with a 429 (raise PASSWORD_HASH_QUEUE to admit more).
+
+    DATABASE_URL=... python -m benchmarks.bench_login_storm --logins 40
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from unittest.mock import patch
+import httpx
+from app import auth
+from app.main import app
+from app.database import Base, engine, async_engine
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def inline(fn, *args):
+    return fn(*args)
+
+
+async def storm(client, user, headers, logins, reads):
+    async def login():
+        res = await client.post("/users/login", json=user)
+        return res.status_code
+
+    async def read():
+        start = time.perf_counter()
+        res = await client.get("/tasks", headers=headers)
+        res.raise_for_status()
+        return time.perf_counter() - start
+
+    async def reader():
+        # spread the reads over the storm instead of firing them all at once
+        latencies = []
+        for _ in range(reads):
+            latencies.append(await read())
+            await asyncio.sleep(0.01)
+        return latencies
+
+    results = await asyncio.gather(reader(), *(login() for _ in range(logins)))
+    return results[0], results[1:]
+
+
+async def run(mode, logins, reads):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        user = {"username": f"bench-{uuid.uuid4().hex[:8]}", "password": "password123"}
+        (await client.post("/users", json=user)).raise_for_status()
+        login = await client.post("/users/login", json=user)
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        start = time.perf_counter()
+        if mode == "inline":
+            with patch.object(auth.password_hasher, "run", inline):
+                latencies, statuses = await storm(client, user, headers, logins, reads)
+        else:
+            latencies, statuses = await storm(client, user, headers, logins, reads)
+        wall = time.perf_counter() - start
+
+    await async_engine.dispose()
+
+    print(
+        f"{mode:>7}: {wall:.2f}s wall, task reads "
+        f"p50 {percentile(latencies, 50) * 1000:.0f} ms, "
+        f"p95 {percentile(latencies, 95) * 1000:.0f} ms, "
+        f"max {max(latencies) * 1000:.0f} ms; "
+        f"{statuses.count(200)} logins ok, {statuses.count(429)} shed"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--reads", type=int, default=50)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    asyncio.run(run("inline", args.logins, args.reads))
+    asyncio.run(run("pool", args.logins, args.reads))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Semantic search latency: in-process NumPy matrices vs pgvector.
+
+For each --sizes N, creates a throwaway user with N tasks (synthetic vectors
+from bench_ann_recall) in the app's tables and runs --queries top-k searches
+through crud.search_tasks, once on the pgvector path and once with
+VECTOR_MATRIX_SEARCH on and the user's matrix warm. Also reports the bare
+matrix-vector product, the one-off cost of loading the matrix, and its size.
+
+    DATABASE_URL=... python -m benchmarks.bench_matrix_search --sizes 100 1000 10000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from unittest.mock import patch
+import numpy as np
+from sqlalchemy import delete, insert
+from app import crud
+from app.config import settings
+from app.database import AsyncSessionLocal, Base, async_engine, engine
+from app.matrix import matrix_cache
+from app.models import TaskDB, UserDB
+from app.schemas import Principal
+from benchmarks.bench_ann_recall import DIM, synthetic_vectors
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) * 1000
+
+
+def create_user(rng, centroids, size):
+    with engine.begin() as conn:
+        user_id = conn.execute(
+            insert(UserDB)
+            .values(username=f"bench-{uuid.uuid4().hex[:8]}", hashed_password="x")
+            .returning(UserDB.id)
+        ).scalar_one()
+
+        for start in range(0, size, 1000):
+            vectors = synthetic_vectors(rng, centroids, min(1000, size - start))
+            conn.execute(
+                insert(TaskDB),
+                [
+                    {
+                        "title": f"task {start + i}",
+                        "description": "benchmark",
+                        "owner_id": user_id,
+                        "embeddings": vector.tolist(),
+                    }
+                    for i, vector in enumerate(vectors)
+                ],
+            )
+
+    return user_id
+
+
+def drop_user(user_id):
+    with engine.begin() as conn:
+        conn.execute(delete(TaskDB).where(TaskDB.owner_id == user_id))
+        conn.execute(delete(UserDB).where(UserDB.id == user_id))
+
+
+async def run(user, queries, k):
+    async def searches():
+        latencies = []
+        for query in queries:
+            async with AsyncSessionLocal() as db:
+                start = time.perf_counter()
+                await crud.search_tasks(db, user, query.tolist(), k, threshold=2)
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    sql = await searches()
+
+    with patch.object(settings, "VECTOR_MATRIX_SEARCH", True):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            matrix = await matrix_cache.load(db, user.id)
+            load = time.perf_counter() - start
+        in_process = await searches()
+
+    await async_engine.dispose()
+
+    bare = []
+    for query in queries:
+        start = time.perf_counter()
+        matrix.search(query, k, threshold=2)
+        bare.append(time.perf_counter() - start)
+
+    return sql, in_process, bare, load, matrix.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centroids = rng.normal(0, 1, (256, DIM)).astype(np.float32)
+    Base.metadata.create_all(bind=engine)
+
+    print(
+        f"{'tasks':>8}{'sql p50':>10}{'sql p95':>10}{'matrix p50':>12}"
+        f"{'matrix p95':>12}{'numpy p50':>11}{'load ms':>9}{'MiB':>7}"
+    )
+    for size in args.sizes:
+        user_id = create_user(rng, centroids, size)
+        user = Principal(id=user_id, username="bench")
+        queries = synthetic_vectors(rng, centroids, args.queries)
+
+        try:
+            with patch.object(
+                matrix_cache, "max_tasks", max(size, matrix_cache.max_tasks)
+            ):
+                sql, in_process, bare, load, nbytes = asyncio.run(
+                    run(user, queries, args.k)
+                )
+        finally:
+            matrix_cache.invalidate(user_id)
+            drop_user(user_id)
+
+        print(
+            f"{size:>8}{percentile(sql, 50):>10.2f}{percentile(sql, 95):>10.2f}"
+            f"{percentile(in_process, 50):>12.2f}{percentile(in_process, 95):>12.2f}"
+            f"{percentile(bare, 50):>11.3f}{load * 1000:>9.0f}{nbytes / 2**20:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
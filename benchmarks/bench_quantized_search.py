@@ -0,0 +1,287 @@
+"""
+Storage, latency and recall@k of binary-quantized search with exact re-ranking.
+
+Loads --tasks synthetic vectors (same generator as bench_ann_recall) into a
+scratch table `quant_bench` holding both the float32 vector and its 1-bit
+quantization, the way `tasks.embeddings` / `tasks.embeddings_bq` are stored.
+Reports column and index sizes (plus what halfvec would take on pgvector >=
+0.7), then runs --queries owner-filtered top-k searches: exact, HNSW on the
+float vectors, and a hamming shortlist of each --candidates size re-ranked by
+exact cosine distance (what crud.search_tasks does with
+VECTOR_BINARY_SEARCH=true).
+
+    DATABASE_URL=... python -m benchmarks.bench_quantized_search --tasks 100000
+
+Pass --users 1 to see the coarse pass go through the bit HNSW index instead
+of the owner index.
+"""
+
+import argparse
+import io
+import json
+import struct
+import time
+import numpy as np
+from sqlalchemy import create_engine
+from app.config import settings
+from benchmarks.bench_ann_recall import DIM, synthetic_vectors
+
+
+def copy_chunk(cursor, owners, vectors):
+    # binary COPY: int16 field count, then length-prefixed fields. pgvector's
+    # binary format is int16 dim, int16 unused, float4[dim]; bit is int32
+    # length followed by the packed bits.
+    row = np.dtype(
+        [
+            ("nfields", ">i2"),
+            ("owner_len", ">i4"),
+            ("owner", ">i4"),
+            ("vec_len", ">i4"),
+            ("dim", ">i2"),
+            ("unused", ">i2"),
+            ("vec", ">f4", (DIM,)),
+            ("bits_len", ">i4"),
+            ("nbits", ">i4"),
+            ("bits", "u1", (DIM // 8,)),
+        ]
+    )
+    rows = np.empty(len(owners), dtype=row)
+    rows["nfields"] = 3
+    rows["owner_len"] = 4
+    rows["owner"] = owners
+    rows["vec_len"] = 4 + 4 * DIM
+    rows["dim"] = DIM
+    rows["unused"] = 0
+    rows["vec"] = vectors
+    rows["bits_len"] = 4 + DIM // 8
+    rows["nbits"] = DIM
+    rows["bits"] = np.packbits(vectors > 0, axis=1)
+
+    buf = io.BytesIO()
+    buf.write(b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0))
+    buf.write(rows.tobytes())
+    buf.write(struct.pack(">h", -1))
+    buf.seek(0)
+
+    cursor.copy_expert(
+        "COPY quant_bench (owner_id, embedding, embedding_bq) "
+        "FROM STDIN WITH (FORMAT binary)",
+        buf,
+    )
+
+
+def pgvector_version(cursor):
+    cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    return tuple(int(p) for p in cursor.fetchone()[0].split(".")[:2])
+
+
+def timed(cursor, sql):
+    start = time.perf_counter()
+    cursor.execute(sql)
+    return time.perf_counter() - start
+
+
+def load(conn, args, rng, centroids, bit_hnsw):
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS quant_bench")
+    cursor.execute(
+        "CREATE TABLE quant_bench (id bigserial PRIMARY KEY, owner_id integer, "
+        f"embedding vector({DIM}), embedding_bq bit({DIM}))"
+    )
+
+    for offset in range(0, args.tasks, args.chunk):
+        n = min(args.chunk, args.tasks - offset)
+        owners = rng.integers(1, args.users + 1, n)
+        copy_chunk(cursor, owners, synthetic_vectors(rng, centroids, n))
+        conn.commit()
+        print(f"loaded {offset + n}/{args.tasks} rows", end="\r", flush=True)
+    print()
+
+    cursor.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+    builds = {
+        "owner btree": timed(
+            cursor, "CREATE INDEX quant_bench_owner ON quant_bench (owner_id, id)"
+        ),
+        "vector hnsw": timed(
+            cursor,
+            "CREATE INDEX quant_bench_hnsw ON quant_bench "
+            "USING hnsw (embedding vector_cosine_ops) "
+            "WITH (m = 16, ef_construction = 64)",
+        ),
+    }
+    if bit_hnsw:
+        builds["bit hnsw"] = timed(
+            cursor,
+            "CREATE INDEX quant_bench_bq_hnsw ON quant_bench "
+            "USING hnsw (embedding_bq bit_hamming_ops) "
+            "WITH (m = 16, ef_construction = 64)",
+        )
+    cursor.execute("ANALYZE quant_bench")
+    conn.commit()
+
+    return builds
+
+
+def storage(conn, bit_hnsw):
+    cursor = conn.cursor()
+    columns = [
+        "avg(pg_column_size(embedding))",
+        "avg(pg_column_size(embedding_bq))",
+    ]
+    if bit_hnsw:
+        columns.append(f"avg(pg_column_size(embedding::halfvec({DIM})))")
+
+    cursor.execute(f"SELECT {', '.join(columns)} FROM quant_bench")
+    sizes = dict(zip(["vector", "bit", "halfvec"], map(float, cursor.fetchone())))
+
+    cursor.execute(
+        "SELECT c.relname, pg_relation_size(c.oid) FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = 'quant_bench'::regclass"
+    )
+    indexes = dict(cursor.fetchall())
+    cursor.execute("SELECT pg_table_size('quant_bench')")
+    table = cursor.fetchone()[0]
+    conn.rollback()
+
+    return {"bytes_per_row": sizes, "index_bytes": indexes, "table_bytes": table}
+
+
+def literal(vector):
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def run_queries(conn, queries, k, mode, bit_hnsw, candidates=None):
+    cursor = conn.cursor()
+    results, latencies = [], []
+    hamming = (
+        "embedding_bq <~> %s::bit(768)"
+        if bit_hnsw
+        else "bit_count(embedding_bq # %s::bit(768))"
+    )
+
+    for owner, vector in queries:
+        params = [int(owner), literal(vector), k]
+        if mode == "exact":
+            cursor.execute("SET LOCAL enable_indexscan = off")
+            sql = (
+                "SELECT id FROM quant_bench WHERE owner_id = %s "
+                "ORDER BY embedding <=> %s::vector LIMIT %s"
+            )
+        elif mode == "hnsw":
+            cursor.execute("SET LOCAL hnsw.ef_search = %s", (settings.HNSW_EF_SEARCH,))
+            sql = (
+                "SELECT id FROM quant_bench WHERE owner_id = %s "
+                "ORDER BY embedding <=> %s::vector LIMIT %s"
+            )
+        else:
+            bits = "".join("1" if x > 0 else "0" for x in vector)
+            params = [int(owner), bits, candidates, literal(vector), k]
+            sql = (
+                "WITH shortlist AS MATERIALIZED ("
+                "SELECT id FROM quant_bench WHERE owner_id = %s "
+                f"ORDER BY {hamming} LIMIT %s) "
+                "SELECT q.id FROM quant_bench q JOIN shortlist USING (id) "
+                "ORDER BY q.embedding <=> %s::vector LIMIT %s"
+            )
+
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        results.append([row[0] for row in cursor.fetchall()])
+        latencies.append((time.perf_counter() - start) * 1000)
+        conn.rollback()
+
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 20, 40, 80])
+    parser.add_argument("--chunk", type=int, default=50_000)
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centroids = rng.normal(0, 1, (256, DIM)).astype(np.float32)
+
+    engine = create_engine(settings.DATABASE_URL)
+    conn = engine.raw_connection()
+    bit_hnsw = pgvector_version(conn.cursor()) >= (0, 7)
+    if not bit_hnsw:
+        print("pgvector < 0.7: no bit HNSW index or halfvec, hamming is a scan")
+
+    builds = {}
+    if not args.skip_load:
+        builds = load(conn, args, rng, centroids, bit_hnsw)
+    sizes = storage(conn, bit_hnsw)
+
+    print(
+        "bytes per row: "
+        + ", ".join(
+            f"{name} {size:.0f}" for name, size in sizes["bytes_per_row"].items()
+        )
+    )
+    print(f"table: {sizes['table_bytes'] / 2**20:.1f} MiB")
+    for name, size in sizes["index_bytes"].items():
+        print(f"index {name}: {size / 2**20:.1f} MiB")
+    for name, seconds in builds.items():
+        print(f"built {name} in {seconds:.1f}s")
+
+    queries = list(
+        zip(
+            rng.integers(1, args.users + 1, args.queries),
+            synthetic_vectors(rng, centroids, args.queries),
+        )
+    )
+
+    exact, _ = run_queries(conn, queries, args.k, "exact", bit_hnsw)
+    modes = [("exact", "exact", None), ("hnsw", "hnsw float32", None)] + [
+        ("binary", f"binary top-{c} + rerank", c) for c in args.candidates
+    ]
+
+    report = []
+    for mode, label, candidates in modes:
+        found, latencies = run_queries(
+            conn, queries, args.k, mode, bit_hnsw, candidates
+        )
+        hits = sum(len(set(f) & set(e)) for f, e in zip(found, exact))
+        wanted = sum(len(e) for e in exact)
+        report.append(
+            {
+                "mode": label,
+                "recall": hits / wanted if wanted else 1.0,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+            }
+        )
+
+    print(f"{'mode':<28}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in report:
+        print(
+            f"{row['mode']:<28}{row['recall']:>10.3f}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "args": vars(args),
+                    "storage": sizes,
+                    "builds": builds,
+                    "results": report,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cold start: how long `import app.main` takes, checked against a budget.
+
+Imports the app --runs times, each in a fresh `python -X importtime`
+interpreter. Prints the median import time, the slowest imports directly
+under app.main, and any of the lazily imported SDKs (groq, the Gemini SDK,
+passlib) that still got imported at startup. Exits with status 1 if the
+median is over --budget-ms or a lazy SDK was imported, so CI catches an
+eager import creeping back in.
+
+    DATABASE_URL=... python -m benchmarks.bench_startup --budget-ms 600
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+
+# only needed once a request uses them, see services.get_client,
+# GeminiProvider and auth.get_pwd_context
+LAZY = ("groq", "google.generativeai", "passlib")
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_app():
+    """One fresh interpreter: (wall seconds, {module: (cumulative µs, depth)})."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode:
+        sys.exit(f"import app.main failed:\n{result.stderr}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            modules[name] = (int(cumulative), len(indent) // 2)
+
+    return wall, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=600)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [import_app() for _ in range(args.runs)]
+    imports = [modules["app.main"][0] / 1000 for _, modules in runs]
+    walls = [wall * 1000 for wall, _ in runs]
+    median = statistics.median(imports)
+
+    print(
+        f"import app.main: median {median:.0f} ms (min {min(imports):.0f}, "
+        f"max {max(imports):.0f}), interpreter wall time "
+        f"{statistics.median(walls):.0f} ms, budget {args.budget_ms:.0f} ms"
+    )
+
+    # direct children of app.main in the last run, slowest first
+    _, modules = runs[-1]
+    children = sorted(
+        ((us, name) for name, (us, depth) in modules.items() if depth == 1),
+        reverse=True,
+    )
+    for us, name in children[: args.top]:
+        print(f"  {us / 1000:>7.1f} ms  {name}")
+
+    eager = [
+        lazy
+        for lazy in LAZY
+        if any(name == lazy or name.startswith(f"{lazy}.") for name in modules)
+    ]
+    failed = False
+    if eager:
+        print(f"\nimported at startup, should be lazy: {', '.join(eager)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"\nover budget by {median - args.budget_ms:.0f} ms")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare two load test results and flag regressions.
+
+Reads two `python -m benchmarks.loadtest --out` files, usually the base
+commit and a change, and prints p50/p95/p99 and throughput per workload and
+endpoint, with the change relative to the base. Exits with status 1 if any
+endpoint's p95 grew, or its throughput fell, by more than --tolerance, so it
+can gate CI.
+
+    python -m benchmarks.compare main.json branch.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import sys
+
+
+def change(old, new):
+    return (new - old) / old if old else 0.0
+
+
+def compare(base, head, tolerance):
+    """Yields (workload, endpoint, rows, regressed) for endpoints in both."""
+    for name, workload in head["workloads"].items():
+        base_endpoints = base["workloads"].get(name, {}).get("endpoints", {})
+        for endpoint, new in workload["endpoints"].items():
+            old = base_endpoints.get(endpoint)
+            if old is None:
+                continue
+
+            rows = [
+                (key, old[key], new[key], change(old[key], new[key]))
+                for key in ("p50_ms", "p95_ms", "p99_ms", "throughput")
+            ]
+            regressed = (
+                change(old["p95_ms"], new["p95_ms"]) > tolerance
+                or change(old["throughput"], new["throughput"]) < -tolerance
+            )
+            yield name, endpoint, rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.15, help="allowed relative change"
+    )
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base['commit']}  head {head['commit']}")
+    regressions = []
+    for name, endpoint, rows, regressed in compare(base, head, args.tolerance):
+        print(f"\n{name}  {endpoint}" + ("  REGRESSED" if regressed else ""))
+        for key, old, new, delta in rows:
+            print(f"  {key:<12} {old:>9.1f} -> {new:>9.1f}  {delta:>+7.1%}")
+        if regressed:
+            regressions.append(f"{name} {endpoint}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Seeded users and tasks for load tests.
+
+Tasks are drawn from a few everyday topics, so titles, descriptions and
+search queries share vocabulary the way real ones do. Their vectors come from
+the hashing provider, the same vectors the fake Gemini server
+(benchmarks/fakes.py) returns for queries, so semantic search over seeded
+data finds what it should. The same seed always gives the same content.
+Usernames get a per-run prefix so runs can share a database.
+
+    DATABASE_URL=... python -m benchmarks.datagen --users 20 --tasks 200
+"""
+
+import argparse
+import random
+import uuid
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.ai import content_hash, embedding_stamp, task_text
+from app.auth import get_password_hash
+from app.database import Base, engine
+from app.embeddings import HashingProvider
+from app.models import TaskDB, UserDB
+from app.schemas import EnrichmentState, TaskStatus
+
+PASSWORD = "password123"
+
+TOPICS = {
+    "groceries": (
+        ["buy", "pick up", "restock", "order"],
+        ["milk", "eggs", "coffee", "bread", "spinach", "rice", "olive oil"],
+        ["at the farmers market", "before the weekend", "for the dinner party"],
+    ),
+    "work": (
+        ["review", "draft", "send", "prepare", "update"],
+        ["the quarterly report", "slides", "the budget", "the roadmap", "invoices"],
+        ["for the team sync", "before friday", "for the client", "for my manager"],
+    ),
+    "fitness": (
+        ["schedule", "do", "plan", "track"],
+        ["leg day", "a 5k run", "yoga", "swimming laps", "stretching"],
+        ["at the gym", "in the park", "after work", "tomorrow morning"],
+    ),
+    "home": (
+        ["fix", "clean", "replace", "paint"],
+        ["the kitchen sink", "the garage", "the bedroom wall", "smoke detectors"],
+        ["this weekend", "before guests arrive", "with the new tools"],
+    ),
+    "admin": (
+        ["renew", "pay", "file", "book"],
+        ["car insurance", "the electricity bill", "taxes", "a dentist appointment"],
+        ["online", "by the end of the month", "before it expires"],
+    ),
+    "software": (
+        ["fix", "refactor", "deploy", "write tests for"],
+        ["the login bug", "the search page", "the react app", "the api"],
+        ["in staging", "before the release", "with the new database"],
+    ),
+}
+
+
+def make_task(rng: random.Random):
+    topic = rng.choice(list(TOPICS))
+    verbs, things, contexts = TOPICS[topic]
+    verb, thing = rng.choice(verbs), rng.choice(things)
+
+    description = f"{verb} {thing} {rng.choice(contexts)}"
+    if rng.random() < 0.5:
+        description += f" and {rng.choice(verbs)} {rng.choice(things)}"
+
+    return {"title": f"{verb} {thing}".capitalize(), "description": description}
+
+
+def make_query(rng: random.Random):
+    """A search term: mostly a few topic words, sometimes a longer phrase."""
+    task = make_task(rng)
+    words = task["description"].split()
+    if rng.random() < 0.3:
+        return " ".join(words[:2])
+    return " ".join(words[: rng.randint(3, len(words))])
+
+
+def seed(users: int, tasks_per_user: int, seed: int = 1, batch_size: int = 1000):
+    """
+    Insert the users and their tasks. Returns {username: [task ids]}, every
+    user's password is PASSWORD.
+    """
+    rng = random.Random(seed)
+    provider = HashingProvider(768)
+    stamp = embedding_stamp()
+    # one bcrypt run for everyone, seeding 1000 users shouldn't take minutes
+    hashed = get_password_hash(PASSWORD)
+    prefix = f"load-{uuid.uuid4().hex[:6]}"
+
+    Base.metadata.create_all(bind=engine)
+    seeded = {}
+    with Session(engine) as db:
+        for i in range(users):
+            username = f"{prefix}-{i}"
+            user = UserDB(username=username, hashed_password=hashed)
+            db.add(user)
+            db.flush()
+
+            tasks = [make_task(rng) for _ in range(tasks_per_user)]
+            ids = []
+            for start in range(0, len(tasks), batch_size):
+                batch = tasks[start : start + batch_size]
+                vectors = provider._embed(
+                    [task_text(t["title"], t["description"]) for t in batch]
+                )
+                rows = [
+                    {
+                        **task,
+                        **stamp,
+                        "owner_id": user.id,
+                        "status": (
+                            TaskStatus.COMPLETED
+                            if rng.random() < 0.3
+                            else TaskStatus.PENDING
+                        ),
+                        "summary": task["title"],
+                        "embeddings": vector,
+                        "content_hash": content_hash(
+                            task["title"], task["description"]
+                        ),
+                        "enrichment_state": EnrichmentState.READY,
+                    }
+                    for task, vector in zip(batch, vectors)
+                ]
+                ids += db.scalars(
+                    insert(TaskDB).returning(TaskDB.id, sort_by_parameter_order=True),
+                    rows,
+                ).all()
+
+            db.commit()
+            seeded[username] = ids
+
+    return seeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=200, help="per user")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    seeded = seed(args.users, args.tasks, args.seed)
+    print(
+        f"seeded {len(seeded)} users with {args.tasks} tasks each, "
+        f"password {PASSWORD!r}: {', '.join(list(seeded)[:3])}, ..."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Local stand-ins for the AI backends, so load tests need no API keys or quota.
+
+- Groq: an HTTP server answering `POST /openai/v1/chat/completions` the way
+  the Groq API does. Batched summary prompts (numbered lines) get one
+  numbered line back per description.
+- Gemini: a plaintext gRPC server implementing GenerativeService
+  `EmbedContent` and `BatchEmbedContents` (the google-generativeai SDK
+  speaks gRPC). Vectors come from the hashing provider, so searches still
+  rank tasks by the words they share with the query.
+
+Every call waits --latency ms (normally distributed with --jitter ms
+standard deviation) and fails with probability --error-rate: HTTP 503 for
+Groq, UNAVAILABLE for Gemini. Point the app at them with
+
+    GROQ_BASE_URL=http://127.0.0.1:8911 GEMINI_API_ENDPOINT=127.0.0.1:8912
+
+or run them on their own:
+
+    python -m benchmarks.fakes --groq-port 8911 --gemini-port 8912 --latency 150
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+import grpc
+import uvicorn
+from google.ai import generativelanguage_v1beta as glm
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class Behaviour:
+    """Latency and failures shared by the calls of one fake server."""
+
+    def __init__(self, latency=100.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    async def wait(self):
+        """Sleep like a remote call would; True if this call should fail."""
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+
+        failed = self.random.random() < self.error_rate
+        self.errors += failed
+        return failed
+
+    def stats(self):
+        return {"calls": self.calls, "errors": self.errors}
+
+
+def summarize(content: str):
+    lines = content.splitlines()
+    if len(lines) == 1:
+        words = content.removeprefix("Task description: ").split()
+        return " ".join(words[:5])
+
+    # BATCH_SUMMARY_PROMPT: "<number>. <description>" in, same numbering out
+    return "\n".join(
+        f"{line.split('.', 1)[0]}. {' '.join(line.split('.', 1)[-1].split()[:5])}"
+        for line in lines
+    )
+
+
+def groq_app(behaviour: Behaviour):
+    async def completions(request):
+        body = await request.json()
+        if await behaviour.wait():
+            return JSONResponse(
+                {"error": {"message": "fake outage", "type": "server_error"}},
+                status_code=503,
+            )
+
+        content = summarize(body["messages"][-1]["content"])
+        return JSONResponse(
+            {
+                "id": f"chatcmpl-fake-{behaviour.calls}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 1,
+                    "completion_tokens": 1,
+                    "total_tokens": 2,
+                },
+            }
+        )
+
+    return Starlette(
+        routes=[Route("/openai/v1/chat/completions", completions, methods=["POST"])]
+    )
+
+
+def gemini_handler(behaviour: Behaviour):
+    def embed(requests):
+        # imported on first use: app.config reads the environment, which the
+        # load test only sets up once these servers have their ports
+        from app.embeddings import HashingProvider
+
+        by_dimensions = {}
+        for request in requests:
+            text = " ".join(part.text for part in request.content.parts)
+            dimensions = request.output_dimensionality or 768
+            by_dimensions.setdefault(dimensions, HashingProvider(dimensions))
+            yield by_dimensions[dimensions]._embed([text])[0]
+
+    async def embed_content(request, context):
+        if await behaviour.wait():
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "fake outage")
+        (values,) = embed([request])
+        return glm.EmbedContentResponse(embedding=glm.ContentEmbedding(values=values))
+
+    async def batch_embed_contents(request, context):
+        if await behaviour.wait():
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "fake outage")
+        return glm.BatchEmbedContentsResponse(
+            embeddings=[
+                glm.ContentEmbedding(values=values)
+                for values in embed(request.requests)
+            ]
+        )
+
+    def method(fn, request_type, response_type):
+        return grpc.unary_unary_rpc_method_handler(
+            fn,
+            request_deserializer=request_type.deserialize,
+            response_serializer=response_type.serialize,
+        )
+
+    return grpc.method_handlers_generic_handler(
+        "google.ai.generativelanguage.v1beta.GenerativeService",
+        {
+            "EmbedContent": method(
+                embed_content, glm.EmbedContentRequest, glm.EmbedContentResponse
+            ),
+            "BatchEmbedContents": method(
+                batch_embed_contents,
+                glm.BatchEmbedContentsRequest,
+                glm.BatchEmbedContentsResponse,
+            ),
+        },
+    )
+
+
+class FakeAI:
+    """
+    Both fakes on background threads (each with its own event loop), so they
+    can serve an app running in the caller's loop. Port 0 picks a free one.
+    """
+
+    def __init__(self, groq: Behaviour, gemini: Behaviour):
+        self.groq = groq
+        self.gemini = gemini
+        self.groq_url = None
+        self.gemini_endpoint = None
+        self._groq_server = None
+        self._gemini_loop = None
+        self._gemini_server = None
+        self._threads = []
+
+    def start(self, groq_port=0, gemini_port=0):
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", groq_port))
+        self.groq_url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+        self._groq_server = uvicorn.Server(
+            uvicorn.Config(groq_app(self.groq), log_level="warning")
+        )
+        self._spawn(lambda: self._groq_server.run(sockets=[sock]))
+
+        ready = threading.Event()
+
+        async def serve_gemini():
+            self._gemini_server = grpc.aio.server()
+            self._gemini_server.add_generic_rpc_handlers((gemini_handler(self.gemini),))
+            port = self._gemini_server.add_insecure_port(f"127.0.0.1:{gemini_port}")
+            await self._gemini_server.start()
+            self.gemini_endpoint = f"127.0.0.1:{port}"
+            ready.set()
+            await self._gemini_server.wait_for_termination()
+
+        def run_gemini():
+            self._gemini_loop = asyncio.new_event_loop()
+            self._gemini_loop.run_until_complete(serve_gemini())
+
+        self._spawn(run_gemini)
+
+        ready.wait(10)
+        deadline = time.monotonic() + 10
+        while not self._groq_server.started and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        return self
+
+    def _spawn(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        self._groq_server.should_exit = True
+        # not waited for: grpc.aio shares one poller per process, and once a
+        # client in another loop has used it the shutdown can stall. The
+        # threads are daemons, so they end with the process regardless.
+        asyncio.run_coroutine_threadsafe(self._gemini_server.stop(0), self._gemini_loop)
+        for thread in self._threads:
+            thread.join(5)
+
+    def stats(self):
+        return {"groq": self.groq.stats(), "gemini": self.gemini.stats()}
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=100, help="ms per AI call")
+    parser.add_argument("--jitter", type=float, default=20, help="ms, std dev")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def from_arguments(args):
+    return FakeAI(
+        Behaviour(args.latency, args.jitter, args.error_rate, args.seed),
+        Behaviour(args.latency, args.jitter, args.error_rate, args.seed + 1),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--groq-port", type=int, default=8911)
+    parser.add_argument("--gemini-port", type=int, default=8912)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    fakes = from_arguments(args).start(args.groq_port, args.gemini_port)
+    print(f"GROQ_BASE_URL={fakes.groq_url}")
+    print(f"GEMINI_API_ENDPOINT={fakes.gemini_endpoint}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(fakes.stats())
+        fakes.stop()
+
+
+if __name__ == "__main__":
+    main()
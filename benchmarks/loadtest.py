@@ -0,0 +1,369 @@
+"""
+End-to-end load test: seeded data, scripted workloads, fake AI backends.
+
+Starts the fake Groq and Gemini servers (benchmarks/fakes.py) with the
+given latency and error rate, seeds --users users with --tasks tasks each
+(benchmarks/datagen.py), then runs every --workload for --duration seconds
+with --concurrency clients, after --warmup seconds that aren't measured.
+Requests go to the app in-process through httpx's ASGI transport, or to
+--url. A server behind --url must talk to fakes you start yourself with
+`python -m benchmarks.fakes`, using the environment that prints.
+
+Workloads:
+
+- login_storm: POST /users/login
+- create_burst: POST /tasks, each with a summary and an embedding call
+- search_heavy: POST /search, plus GET /tasks revalidated with its ETag
+- mixed: list, search, create, edit, toggle, delta sync and delete
+
+Prints throughput and p50/p95/p99 per endpoint. --out writes the same as
+JSON, with the commit and arguments, for `python -m benchmarks.compare`.
+
+    DATABASE_URL=... python -m benchmarks.loadtest --workload mixed --out mixed.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import httpx
+from benchmarks import fakes
+
+WORKLOADS = {
+    "login_storm": {"login": 1},
+    "create_burst": {"create": 1},
+    "search_heavy": {"search": 7, "list": 3},
+    "mixed": {
+        "list": 35,
+        "search": 20,
+        "create": 15,
+        "edit": 10,
+        "toggle": 10,
+        "changes": 5,
+        "delete": 5,
+    },
+}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def add(self, endpoint, status, seconds):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+    def report(self, duration):
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            statuses = self.statuses[endpoint]
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "errors": sum(
+                    n
+                    for status, n in statuses.items()
+                    if status == "exception" or int(status) >= 400
+                ),
+                "throughput": len(latencies) / duration,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "max_ms": max(latencies) * 1000,
+                "statuses": {str(status): n for status, n in statuses.items()},
+            }
+
+        requests = sum(e["requests"] for e in endpoints.values())
+        return {
+            "duration": duration,
+            "requests": requests,
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "throughput": requests / duration,
+            "endpoints": endpoints,
+        }
+
+
+class User:
+    """A seeded user as a client sees it: token, task ids, last list state."""
+
+    def __init__(self, username, task_ids):
+        self.username = username
+        self.task_ids = list(task_ids)
+        self.headers = {}
+        self.etag = None
+        self.version = None
+
+
+class Workload:
+    def __init__(self, client, users, recorder, datagen):
+        self.client = client
+        self.users = users
+        self.recorder = recorder
+        self.datagen = datagen
+
+    async def request(self, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            res = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            res = None
+        if self.recorder:
+            status = res.status_code if res is not None else "exception"
+            self.recorder.add(endpoint, status, time.perf_counter() - start)
+        return res
+
+    async def login(self, user, rng):
+        await self.request(
+            "POST /users/login",
+            "POST",
+            "/users/login",
+            json={"username": user.username, "password": self.datagen.PASSWORD},
+        )
+
+    async def list(self, user, rng):
+        headers = dict(user.headers)
+        if user.etag:
+            headers["If-None-Match"] = user.etag
+
+        res = await self.request("GET /tasks", "GET", "/tasks", headers=headers)
+        if res is not None and res.status_code == 200:
+            user.etag = res.headers.get("etag")
+            user.version = res.headers.get("x-change-version")
+
+    async def changes(self, user, rng):
+        if user.version is None:
+            return await self.list(user, rng)
+
+        res = await self.request(
+            "GET /tasks/changes",
+            "GET",
+            "/tasks/changes",
+            params={"since": user.version},
+            headers=user.headers,
+        )
+        if res is not None and res.status_code == 200:
+            user.version = res.json()["version"]
+
+    async def search(self, user, rng):
+        await self.request(
+            "POST /search",
+            "POST",
+            "/search",
+            json={"search_term": self.datagen.make_query(rng)},
+            headers=user.headers,
+        )
+
+    async def create(self, user, rng):
+        res = await self.request(
+            "POST /tasks",
+            "POST",
+            "/tasks",
+            json=self.datagen.make_task(rng),
+            headers=user.headers,
+        )
+        if res is not None and res.status_code == 200:
+            user.task_ids.append(res.json()["id"])
+
+    async def edit(self, user, rng):
+        if not user.task_ids:
+            return await self.create(user, rng)
+
+        task = self.datagen.make_task(rng)
+        await self.request(
+            "PUT /tasks/{id}",
+            "PUT",
+            f"/tasks/{rng.choice(user.task_ids)}",
+            json={"description": task["description"]},
+            headers=user.headers,
+        )
+
+    async def toggle(self, user, rng):
+        if not user.task_ids:
+            return await self.create(user, rng)
+
+        status = rng.choice(["complete", "pending"])
+        await self.request(
+            f"PUT /tasks/{{id}}/{status}",
+            "PUT",
+            f"/tasks/{rng.choice(user.task_ids)}/{status}",
+            headers=user.headers,
+        )
+
+    async def delete(self, user, rng):
+        if not user.task_ids:
+            return await self.create(user, rng)
+
+        task_id = user.task_ids.pop(rng.randrange(len(user.task_ids)))
+        await self.request(
+            "DELETE /tasks/{id}", "DELETE", f"/tasks/{task_id}", headers=user.headers
+        )
+
+    async def run(self, mix, concurrency, duration, seed):
+        operations = [getattr(self, name) for name in mix]
+        weights = list(mix.values())
+        deadline = time.perf_counter() + duration
+
+        async def worker(n):
+            rng = random.Random(seed * 1000 + n)
+            while time.perf_counter() < deadline:
+                operation = rng.choices(operations, weights)[0]
+                await operation(rng.choice(self.users), rng)
+
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+async def run(args, client_factory):
+    # app modules read settings on import, after main() pointed them at the
+    # fakes
+    from benchmarks import datagen
+
+    seeded = datagen.seed(args.users, args.tasks, args.seed)
+    users = [User(username, ids) for username, ids in seeded.items()]
+
+    results = {}
+    async with client_factory() as client:
+        for user in users:
+            res = await client.post(
+                "/users/login",
+                json={"username": user.username, "password": datagen.PASSWORD},
+            )
+            res.raise_for_status()
+            user.headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+        for name in args.workload:
+            mix = WORKLOADS[name]
+            if args.warmup:
+                await Workload(client, users, None, datagen).run(
+                    mix, args.concurrency, args.warmup, args.seed
+                )
+
+            recorder = Recorder()
+            start = time.perf_counter()
+            await Workload(client, users, recorder, datagen).run(
+                mix, args.concurrency, args.duration, args.seed
+            )
+            results[name] = recorder.report(time.perf_counter() - start)
+
+    return results
+
+
+def print_results(results):
+    for name, workload in results.items():
+        print(
+            f"\n{name}: {workload['requests']} requests, "
+            f"{workload['throughput']:.1f}/s, {workload['errors']} errors"
+        )
+        for endpoint, stats in workload["endpoints"].items():
+            print(
+                f"  {endpoint:<28} {stats['requests']:>6} "
+                f"{stats['throughput']:>7.1f}/s  p50 {stats['p50_ms']:>7.1f}  "
+                f"p95 {stats['p95_ms']:>7.1f}  p99 {stats['p99_ms']:>7.1f} ms"
+                + (f"  {stats['errors']} errors" if stats["errors"] else "")
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--workload",
+        nargs="+",
+        choices=list(WORKLOADS),
+        default=list(WORKLOADS),
+    )
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=100, help="per user")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20, help="s per workload")
+    parser.add_argument("--warmup", type=float, default=2, help="s, not measured")
+    parser.add_argument("--url", help="a running server instead of in-process")
+    parser.add_argument("--out", help="write the results as JSON")
+    fakes.add_arguments(parser)
+    args = parser.parse_args()
+
+    ai = None
+    if args.url:
+
+        def client_factory():
+            return httpx.AsyncClient(
+                base_url=args.url,
+                timeout=60,
+                limits=httpx.Limits(max_connections=args.concurrency),
+            )
+
+    else:
+        ai = fakes.from_arguments(args).start()
+        os.environ.update(
+            GROQ_BASE_URL=ai.groq_url,
+            GEMINI_API_ENDPOINT=ai.gemini_endpoint,
+            EMBEDDING_PROVIDER="gemini",
+        )
+        os.environ.setdefault("GROQ_API_KEY", "fake")
+        os.environ.setdefault("GEMINI_API_KEY", "fake")
+        from app.main import app
+
+        def client_factory():
+            return httpx.AsyncClient(
+                # a 500, as a real server would answer, not a crashed run
+                transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+                base_url="http://loadtest",
+                timeout=60,
+            )
+
+    async def run_all():
+        try:
+            return await run(args, client_factory)
+        finally:
+            if not args.url:
+                from app.database import async_engine
+
+                await async_engine.dispose()
+
+    started = datetime.now(timezone.utc).isoformat()
+    results = asyncio.run(run_all())
+    print_results(results)
+
+    report = {
+        "commit": git_commit(),
+        "started": started,
+        "python": platform.python_version(),
+        "args": vars(args),
+        "ai": ai.stats() if ai else None,
+        "workloads": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.out}")
+
+    if ai:
+        ai.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,4 +8,6 @@ alembic upgrade head
 # 2. Start the Application
 # This hands over control to the actual API server
 echo "Starting Server..."
+# the migrations above created the vector extension already
+export DB_CREATE_EXTENSION=false
 exec uvicorn app.main:app --host 0.0.0.0 --port 8000
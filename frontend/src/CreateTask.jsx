@@ -27,7 +27,7 @@ export default function CreateTask({ onTaskCreated }) {
       if (!response.ok) throw new Error("Failed to create task");
 
       const newTask = await response.json();
-      onTaskCreated(newTask);
+      onTaskCreated(newTask, response);
       
       // Reset and close
       setTitle("");
@@ -12,6 +12,8 @@ export default function TaskBoard() {
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState("");
   const [searchQuery, setSearchQuery] = useState("");
+  // X-Change-Version of the list we hold, for delta syncs
+  const [version, setVersion] = useState(null);
   
   // State for the selected task (Modal)
   const [selectedTask, setSelectedTask] = useState(null);
@@ -39,6 +41,7 @@ export default function TaskBoard() {
       if (!response.ok) throw new Error("Failed to fetch tasks");
       const data = await response.json();
       setTasks(data);
+      setVersion(query.trim() ? null : response.headers.get("X-Change-Version"));
     } catch (err) {
       setError(err.message);
     } finally {
@@ -48,6 +51,47 @@ export default function TaskBoard() {
 
   useEffect(() => { fetchTasks(); }, []);
 
+  // only what changed since the list we hold, instead of the whole list.
+  // it can't undo a failed optimistic edit (nothing changed on the server),
+  // so failed mutations reload with fetchTasks instead
+  const syncTasks = async () => {
+    if (version === null) return fetchTasks(searchQuery);
+    try {
+      const response = await fetch(`${API_URL}/tasks/changes?since=${version}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (!response.ok) return fetchTasks(searchQuery);
+      const changes = await response.json();
+
+      const changed = new Map(changes.upserted.map(t => [t.id, t]));
+      setTasks(prev => [
+        ...changes.upserted.filter(t => !prev.some(p => p.id === t.id)).reverse(),
+        ...prev
+          .filter(t => !changes.deleted.includes(t.id))
+          .map(t => changed.get(t.id) || t),
+      ]);
+      setVersion(changes.version);
+    } catch (err) { fetchTasks(searchQuery); }
+  };
+
+  // a write of ours answers with the version it produced. When that is the
+  // version we hold plus our own changes, nobody else changed anything in
+  // between and we can skip past it; otherwise the next sync sends it again
+  const advanceVersion = (response, changes = 1) => {
+    const next = Number(response.headers.get("X-Change-Version"));
+    setVersion(v => (v !== null && Number(v) + changes === next ? next : v));
+  };
+
+  // pick up changes from other tabs and devices, and enrichment results,
+  // when the board is shown again
+  useEffect(() => {
+    const onVisible = () => {
+      if (document.visibilityState === "visible") syncTasks();
+    };
+    document.addEventListener("visibilitychange", onVisible);
+    return () => document.removeEventListener("visibilitychange", onVisible);
+  }, [version, searchQuery]);
+
   const handleSearchChange = (e) => {
     const query = e.target.value;
     setSearchQuery(query);
@@ -67,8 +111,9 @@ export default function TaskBoard() {
     fetchTasks("");
   };
 
-  const handleTaskCreated = (newTask) => {
+  const handleTaskCreated = (newTask, response) => {
     setTasks([newTask, ...tasks]);
+    advanceVersion(response);
   };
 
   const updateTask = async (taskId, updatedData) => {
@@ -95,10 +140,11 @@ export default function TaskBoard() {
       
       const savedTask = await response.json();
       setTasks(prev => prev.map(t => t.id === taskId ? savedTask : t))
+      advanceVersion(response);
 
     } catch (err) {
       console.error(err);
-      fetchTasks()
+      fetchTasks(searchQuery)
     }
   };
 
@@ -106,22 +152,44 @@ export default function TaskBoard() {
     e.stopPropagation(); // Stop card click
     setTasks(tasks.map(t => t.id === taskId ? { ...t, status: isCompleted ? "pending" : "completed" } : t));
     try {
-      await fetch(`${API_URL}/tasks/${taskId}/${isCompleted ? "pending" : "complete"}`, {
+      const response = await fetch(`${API_URL}/tasks/${taskId}/${isCompleted ? "pending" : "complete"}`, {
         method: "PUT",
         headers: { Authorization: `Bearer ${token}` },
       });
-    } catch (err) { fetchTasks(); }
+      if (!response.ok) throw new Error("Failed to update task");
+      advanceVersion(response);
+    } catch (err) { fetchTasks(searchQuery); }
   };
 
   const deleteTask = async (e, taskId) => {
     e.stopPropagation(); // Stop card click
     setTasks(tasks.filter(t => t.id !== taskId));
     try {
-      await fetch(`${API_URL}/tasks/${taskId}`, {
+      const response = await fetch(`${API_URL}/tasks/${taskId}`, {
         method: "DELETE",
         headers: { Authorization: `Bearer ${token}` },
       });
-    } catch (err) { fetchTasks(); }
+      if (!response.ok) throw new Error("Failed to delete task");
+      advanceVersion(response);
+    } catch (err) { fetchTasks(searchQuery); }
+  };
+
+  // one request for all of them, instead of a DELETE per task
+  const clearCompleted = async () => {
+    setTasks(tasks.filter(t => t.status !== "completed"));
+    try {
+      const response = await fetch(`${API_URL}/tasks`, {
+        method: "DELETE",
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${token}`
+        },
+        body: JSON.stringify({ where_status: "completed" }),
+      });
+      if (!response.ok) throw new Error("Failed to clear completed tasks");
+      const cleared = await response.json();
+      advanceVersion(response, cleared.count);
+    } catch (err) { fetchTasks(searchQuery); }
   };
 
   if (error) return <div className="text-red-400 text-center p-8">Error: {error}</div>;
@@ -140,6 +208,16 @@ export default function TaskBoard() {
       <div className="flex flex-col md:flex-row gap-4 justify-between items-start md:items-center">
         <CreateTask onTaskCreated={handleTaskCreated} />
 
+        {tasks.some(t => t.status === "completed") && (
+          <button
+            onClick={clearCompleted}
+            className="flex items-center gap-2 h-10 px-3 rounded-lg text-sm text-zinc-500 hover:text-red-400 hover:bg-zinc-900 transition-colors"
+          >
+            <Trash2 className="w-4 h-4" />
+            Clear completed
+          </button>
+        )}
+
         <form onSubmit={handleSearch} className="relative w-full md:w-80 group">
           <Search className="absolute left-3 top-2.5 h-4 w-4 text-zinc-500 group-focus-within:text-indigo-400 transition-colors" />
           <input 
@@ -3,9 +3,15 @@ from dotenv import load_dotenv
 import pytest
 from app.database import Base
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.main import app
-from app.database import get_db
+from app.database import create_app_async_engine, get_async_db
+from app.auth import principal_cache
+from app.matrix import matrix_cache
+from app.services import groq_guard, summary_cache
+from app.ai import embedding_guard
 from fastapi.testclient import TestClient
 from unittest.mock import patch, AsyncMock
 
@@ -16,12 +22,19 @@ TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
 test_engine = create_engine(TEST_DATABASE_URL)
 TestingSessionLocal = sessionmaker(bind=test_engine, autocommit=False, autoflush=False)
 
+# TestClient and asyncio.run each bring their own event loop, and asyncpg
+# connections can't move between loops, so the async engine doesn't pool
+async_test_engine = create_app_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(
+    async_test_engine, autoflush=False, expire_on_commit=False
+)
+
 
 @pytest.fixture(autouse=True)
 def mock_ai_embedding():
     with (
-        patch("app.crud.get_embedding") as mock_crud,
-        patch("app.main.get_embedding") as mock_main,
+        patch("app.crud.get_embedding", new_callable=AsyncMock) as mock_crud,
+        patch("app.main.get_embedding", new_callable=AsyncMock) as mock_main,
     ):
         mock_vec = [0.1] * 768
         mock_crud.return_value = mock_vec
@@ -40,15 +53,12 @@ def mock_ai_summary():
 @pytest.fixture
 def client():
     # 1. Define the override function inner function
-    def override_get_db():
-        try:
-            db = TestingSessionLocal()
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
             yield db
-        finally:
-            db.close()
 
     # 2. Apply the override to the app
-    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_db
 
     # 3. Create the TestClient(app) and yield it
     yield TestClient(app)
@@ -68,6 +78,19 @@ def test_task(client, token):
     yield res.json()
 
 
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    # ids are reused once the tables are recreated
+    principal_cache.clear()
+    matrix_cache.clear()
+    summary_cache.memory.clear()
+    groq_guard.breaker.reset()
+    embedding_guard.breaker.reset()
+    # POST /tasks calls the real get_ai_summary, keep its cache on the test DB
+    with patch.object(summary_cache, "session_factory", TestingAsyncSessionLocal):
+        yield
+
+
 @pytest.fixture(scope="function", autouse=True)
 def clean_db():
     with test_engine.connect() as connection:
@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app import ai
+from app.ai import EmbeddingBatcher
+
+
+def test_remote_calls_are_bounded_and_concurrent():
+    in_flight = 0
+    peak = 0
+
+    async def fake_embed_content_async(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return {"embedding": [[0.1] * 768]}
+
+    async def burst():
+        return await asyncio.gather(
+            *(ai._embed_remote([f"text {i}"], "retrieval_query") for i in range(10))
+        )
+
+    with (
+        patch.object(ai.settings, "EMBEDDING_MAX_CONCURRENCY", 3),
+        patch("google.generativeai.embed_content_async", fake_embed_content_async),
+    ):
+        results = asyncio.run(burst())
+
+    assert len(results) == 10
+    assert peak == 3
+
+
+def test_remote_call_times_out():
+    async def hang(**kwargs):
+        await asyncio.sleep(1)
+
+    with (
+        patch.object(ai.settings, "EMBEDDING_TIMEOUT", 0.01),
+        patch("google.generativeai.embed_content_async", hang),
+    ):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(ai._embed_remote(["slow"], "retrieval_query"))
+
+
+def fake_batch_embedder(calls):
+    async def embed_batch(texts, task_type):
+        calls.append(list(texts))
+        await asyncio.sleep(0.01)
+        return [[float(len(text))] * 768 for text in texts]
+
+    return embed_batch
+
+
+def test_batcher_coalesces_concurrent_calls():
+    calls = []
+
+    async def burst():
+        batcher = EmbeddingBatcher(fake_batch_embedder(calls), window=0.01, max_size=64)
+        texts = ["a", "bb", "ccc", "dddd"]
+        results = await asyncio.gather(
+            *(batcher.submit(text, "retrieval_query") for text in texts)
+        )
+        return batcher, results
+
+    batcher, results = asyncio.run(burst())
+
+    assert calls == [["a", "bb", "ccc", "dddd"]]
+    assert [r[0] for r in results] == [1.0, 2.0, 3.0, 4.0]
+    assert batcher.stats()["batches"] == 1
+
+
+def test_batcher_flushes_at_max_size_and_dedupes():
+    calls = []
+
+    async def burst():
+        batcher = EmbeddingBatcher(fake_batch_embedder(calls), window=10, max_size=2)
+        results = await asyncio.gather(
+            batcher.submit("milk", "retrieval_query"),
+            batcher.submit("milk", "retrieval_query"),
+            batcher.submit("eggs", "retrieval_query"),
+        )
+        return batcher, results
+
+    batcher, results = asyncio.run(burst())
+
+    # the 10s window never elapses, the batch is sent because it is full
+    assert calls == [["milk", "eggs"]]
+    assert results[0] == results[1]
+    assert batcher.stats()["deduplicated"] == 1
+
+
+def test_batcher_fans_out_errors():
+    async def broken(texts, task_type):
+        raise RuntimeError("quota exceeded")
+
+    async def burst():
+        batcher = EmbeddingBatcher(broken, window=0.001, max_size=64)
+        return await asyncio.gather(
+            batcher.submit("a", "retrieval_query"),
+            batcher.submit("b", "retrieval_query"),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(burst())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
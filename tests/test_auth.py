@@ -0,0 +1,134 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from sqlalchemy import event
+from app import crud
+from app.auth import principal_cache, PasswordHasher
+from app.models import UserDB
+from app.schemas import UserCreate
+from tests.conftest import async_test_engine, TestingAsyncSessionLocal
+
+
+@contextmanager
+def count_user_queries():
+    queries = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if "FROM users" in statement:
+            queries.append(statement)
+
+    event.listen(
+        async_test_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    try:
+        yield queries
+    finally:
+        event.remove(
+            async_test_engine.sync_engine,
+            "before_cursor_execute",
+            before_cursor_execute,
+        )
+
+
+def test_warm_token_skips_user_lookup(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with count_user_queries() as queries:
+        assert client.get("/tasks", headers=headers).status_code == 200
+        assert len(queries) == 1
+
+        for _ in range(3):
+            assert client.get("/tasks", headers=headers).status_code == 200
+        assert len(queries) == 1
+
+    stats = principal_cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_user_change_drops_cached_principal(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/tasks", headers=headers).status_code == 200
+    assert len(principal_cache) == 1
+
+    async def rename():
+        async with TestingAsyncSessionLocal() as db:
+            user = await db.get(UserDB, 1)
+            user.username = "benjamin"
+            await db.commit()
+
+    asyncio.run(rename())
+    assert len(principal_cache) == 0
+
+
+def test_deleted_user_is_rejected(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/tasks", headers=headers).status_code == 200
+
+    async def delete_user():
+        async with TestingAsyncSessionLocal() as db:
+            await db.delete(await db.get(UserDB, 1))
+            await db.commit()
+
+    asyncio.run(delete_user())
+    assert client.get("/tasks", headers=headers).status_code == 404
+
+
+def test_login_rehashes_when_cost_changes(client, token):
+    cheaper = CryptContext(
+        schemes=["bcrypt"], bcrypt__rounds=4, bcrypt__min_rounds=4, bcrypt__max_rounds=4
+    )
+    user = {"username": "benny", "password": "password123"}
+
+    with patch("app.auth.pwd_context", cheaper):
+        assert client.post("/users/login", json=user).status_code == 200
+
+    async def stored_hash():
+        async with TestingAsyncSessionLocal() as db:
+            return (await db.get(UserDB, 1)).hashed_password
+
+    assert asyncio.run(stored_hash()).startswith("$2b$04$")
+
+    with patch("app.auth.pwd_context", cheaper):
+        assert client.post("/users/login", json=user).status_code == 200
+        assert (
+            client.post("/users/login", json={**user, "password": "x"}).status_code
+            == 401
+        )
+
+
+def test_signup_releases_connection_while_hashing():
+    async def signup():
+        async with TestingAsyncSessionLocal() as db:
+            in_transaction = []
+
+            async def hash_password(password):
+                in_transaction.append(db.in_transaction())
+                return "hashed"
+
+            user = UserCreate(username="newcomer", password="password123")
+            assert await crud.get_user_by_username(db, user.username) is None
+            with patch("app.crud.hash_password", hash_password):
+                await crud.create_user(db, user)
+            return in_transaction
+
+    assert asyncio.run(signup()) == [False]
+
+
+def test_password_hasher_sheds_load_when_saturated():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+
+    async def storm():
+        return await asyncio.gather(
+            *(hasher.run(time.sleep, 0.05) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(storm())
+
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 1
+    assert rejected[0].status_code == 429
+    assert hasher.stats()["rejected"] == 1
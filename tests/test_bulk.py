@@ -0,0 +1,153 @@
+import asyncio
+import json
+from unittest.mock import patch, AsyncMock
+import pytest
+from app.config import settings
+from app.models import EnrichmentJobDB, TaskDB
+from app.resilience import CircuitOpenError
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def bulk_ai():
+    async def summaries(texts):
+        return [
+            RuntimeError("groq is down") if text == "fail" else f"Summary {text}"
+            for text in texts
+        ]
+
+    async def embeddings(texts, task_type):
+        return [[0.1] * 768 for _ in texts]
+
+    with (
+        patch("app.bulk.get_ai_summaries", side_effect=summaries) as summary,
+        patch("app.bulk.get_embeddings", side_effect=embeddings) as embedding,
+    ):
+        yield summary, embedding
+
+
+def test_bulk_import_reports_each_item(client, token, bulk_ai):
+    headers = {"Authorization": f"Bearer {token}"}
+    tasks = [{"title": f"task {i}", "description": f"do {i}"} for i in range(5)]
+    tasks[1] = {"title": "no description"}
+    tasks[3]["description"] = "fail"
+
+    with patch.object(settings, "BULK_CHUNK_SIZE", 2):
+        res = client.post("/tasks/bulk", json=tasks, headers=headers)
+
+    assert res.status_code == 200
+    body = res.json()
+    assert (body["created"], body["failed"]) == (3, 2)
+    assert [r["index"] for r in body["results"]] == [0, 1, 2, 3, 4]
+    assert "description" in body["results"][1]["error"]
+    assert body["results"][3]["error"] == "summary failed: groq is down"
+
+    # one batched AI call per chunk of valid tasks
+    summary, embedding = bulk_ai
+    assert summary.call_count == embedding.call_count == 2
+
+    with TestingSessionLocal() as db:
+        saved = {t.id: t for t in db.query(TaskDB).all()}
+    for result, task in zip(body["results"], tasks):
+        if result["id"]:
+            assert saved[result["id"]].title == task["title"]
+            assert saved[result["id"]].summary == f"Summary {task['description']}"
+
+
+def test_bulk_import_reads_ndjson(client, token, bulk_ai):
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/x-ndjson",
+    }
+    lines = [
+        json.dumps({"title": "milk", "description": "buy milk"}),
+        "",
+        "{not json",
+        json.dumps({"title": "eggs", "description": "buy eggs"}),
+    ]
+
+    res = client.post("/tasks/bulk", content="\n".join(lines), headers=headers)
+
+    body = res.json()
+    assert body["created"] == 2
+    assert body["results"][1]["error"].startswith("invalid JSON")
+    assert body["results"][2]["id"] is not None
+
+
+def test_bulk_import_rejects_bad_bodies(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    res = client.post("/tasks/bulk", json={"title": "a"}, headers=headers)
+    assert res.status_code == 400
+
+    with patch.object(settings, "BULK_MAX_TASKS", 1):
+        res = client.post(
+            "/tasks/bulk",
+            json=[{"title": "a", "description": "b"}] * 2,
+            headers=headers,
+        )
+    assert res.status_code == 413
+
+    with patch.object(settings, "BULK_MAX_BODY_BYTES", 100):
+        res = client.post(
+            "/tasks/bulk",
+            json=[{"title": "a", "description": "b" * 100}],
+            headers=headers,
+        )
+    assert res.status_code == 413
+
+    with patch.object(settings, "BULK_MAX_LINE_BYTES", 100):
+        res = client.post(
+            "/tasks/bulk",
+            content=json.dumps({"title": "a", "description": "b" * 100}),
+            headers={**headers, "Content-Type": "application/x-ndjson"},
+        )
+    assert res.status_code == 413
+
+
+def test_bulk_import_defers_enrichment_during_an_outage(client, token, bulk_ai):
+    headers = {"Authorization": f"Bearer {token}"}
+    tasks = [{"title": f"task {i}", "description": f"do {i}"} for i in range(4)]
+
+    summary, embedding = bulk_ai
+    with patch.object(settings, "BULK_CHUNK_SIZE", 2):
+        # first chunk: groq is down; second: the embedding provider is
+        summary.side_effect = [
+            [CircuitOpenError("groq"), "Summary do 1"],
+            ["Summary do 2", "Summary do 3"],
+        ]
+        embedding.side_effect = [
+            [[0.1] * 768] * 2,
+            asyncio.TimeoutError(),
+        ]
+        res = client.post("/tasks/bulk", json=tasks, headers=headers)
+
+    body = res.json()
+    assert (body["created"], body["failed"]) == (4, 0)
+
+    with TestingSessionLocal() as db:
+        saved = {t.title: t for t in db.query(TaskDB).all()}
+        queued = {job.task_id for job in db.query(EnrichmentJobDB).all()}
+    assert saved["task 1"].summary == "Summary do 1"
+    assert saved["task 1"].enrichment_state.value == "ready"
+    pending = {saved[title].id for title in ("task 0", "task 2", "task 3")}
+    assert queued == pending
+    assert all(saved[t].summary is None for t in ("task 0", "task 2", "task 3"))
+
+
+def test_bulk_import_queues_enrichment_in_background_mode(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    tasks = [{"title": f"task {i}", "description": f"do {i}"} for i in range(3)]
+
+    with (
+        patch.object(settings, "ENRICHMENT_MODE", "background"),
+        patch("app.bulk.get_embeddings", new_callable=AsyncMock) as embedding,
+    ):
+        res = client.post("/tasks/bulk", json=tasks, headers=headers)
+
+    assert res.json()["created"] == 3
+    embedding.assert_not_called()
+
+    with TestingSessionLocal() as db:
+        queued = {job.task_id for job in db.query(EnrichmentJobDB).all()}
+    assert queued == {r["id"] for r in res.json()["results"]}
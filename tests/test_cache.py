@@ -0,0 +1,123 @@
+import asyncio
+import time
+from unittest.mock import patch, AsyncMock
+from app import ai
+from app.cache import LRUCache, EmbeddingCache, embedding_cache_key
+from app.models import EmbeddingCacheDB
+from tests.conftest import TestingSessionLocal, TestingAsyncSessionLocal
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_entries_expire():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert len(cache) == 1
+
+
+def test_cache_key_depends_on_model_task_type_and_text():
+    key = embedding_cache_key("buy milk", "retrieval_query", "model-a", 768)
+
+    assert key == embedding_cache_key(
+        "  buy   milk ", "retrieval_query", "model-a", 768
+    )
+    assert key != embedding_cache_key("buy milk", "retrieval_document", "model-a", 768)
+    assert key != embedding_cache_key("buy milk", "retrieval_query", "model-b", 768)
+    assert key != embedding_cache_key("buy milk", "retrieval_query", "model-a", 256)
+    assert key != embedding_cache_key(
+        "buy milk", "retrieval_query", "model-a", 768, version=2
+    )
+
+
+def test_repeated_text_skips_remote_call():
+    cache = EmbeddingCache(maxsize=8, persist=False)
+
+    with (
+        patch.object(ai, "embedding_cache", cache),
+        patch(
+            "app.ai._embed_remote", new_callable=AsyncMock, return_value=[[0.2] * 768]
+        ) as remote,
+    ):
+        first = asyncio.run(ai.get_embedding("groceries", task_type="retrieval_query"))
+        second = asyncio.run(
+            ai.get_embedding("groceries ", task_type="retrieval_query")
+        )
+
+    assert first == second
+    remote.assert_called_once()
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_persistent_tier_survives_memory_eviction():
+    cache = EmbeddingCache(maxsize=1, session_factory=TestingAsyncSessionLocal)
+    key = embedding_cache_key("work", "retrieval_query")
+
+    asyncio.run(cache.set(key, [0.25] * 768, "retrieval_query"))
+    cache.memory.clear()
+
+    assert asyncio.run(cache.get(key)) == [0.25] * 768
+    assert cache.stats()["db_hits"] == 1
+
+
+def test_invalidate_drops_other_models_and_versions():
+    cache = EmbeddingCache(maxsize=8, session_factory=TestingAsyncSessionLocal)
+
+    async def fill():
+        await cache.set("old", [0.1] * 768, "retrieval_query", model="models/old-model")
+        await cache.set("new", [0.1] * 768, "retrieval_query", model="models/new-model")
+        with patch.object(ai.settings, "EMBEDDING_VERSION", 2):
+            await cache.set(
+                "new-v2", [0.1] * 768, "retrieval_query", model="models/new-model"
+            )
+
+    asyncio.run(fill())
+
+    assert asyncio.run(cache.invalidate(model="models/new-model", version=2)) == 2
+
+    with TestingSessionLocal() as db:
+        keys = [row.key for row in db.query(EmbeddingCacheDB).all()]
+
+    assert keys == ["new-v2"]
+    assert len(cache.memory) == 0
+
+
+def test_get_embeddings_batches_misses_and_reads_the_table_once():
+    cache = EmbeddingCache(maxsize=8, session_factory=TestingAsyncSessionLocal)
+    key = embedding_cache_key("known", "retrieval_document")
+    asyncio.run(cache.set(key, [0.5] * 768, "retrieval_document"))
+    cache.memory.clear()
+
+    async def remote(texts, task_type):
+        return [[0.2] * 768 for _ in texts]
+
+    with (
+        patch.object(ai, "embedding_cache", cache),
+        patch.object(ai.settings, "EMBEDDING_BATCH_MAX_SIZE", 2),
+        patch("app.ai._embed_remote", side_effect=remote) as embed,
+    ):
+        vectors = asyncio.run(
+            ai.get_embeddings(["a", "known", "b", "a ", "c"], "retrieval_document")
+        )
+
+    assert vectors[1] == [0.5] * 768
+    assert vectors[0] == vectors[3] == [0.2] * 768
+    assert sorted(len(call.args[0]) for call in embed.call_args_list) == [1, 2]
+    assert cache.stats()["db_hits"] == 1
@@ -0,0 +1,183 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app import ai
+from app.cache import EmbeddingCache
+from app.embeddings import (
+    EmbeddingProvider,
+    HashingProvider,
+    LocalProvider,
+    GeminiProvider,
+    create_provider,
+    fit_dimensions,
+    local_model_id,
+)
+
+
+def cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_hashing_provider_is_deterministic_and_lexical():
+    provider = HashingProvider(768)
+    milk, milk_again, eggs, gym = asyncio.run(
+        provider.embed(
+            [
+                "buy milk and eggs",
+                "Buy milk and eggs",
+                "eggs and milk",
+                "leg day at the gym",
+            ],
+            "retrieval_document",
+        )
+    )
+
+    assert len(milk) == 768
+    assert milk == milk_again
+    assert np.linalg.norm(milk) == pytest.approx(1.0, abs=1e-5)
+    assert cosine(milk, eggs) > cosine(milk, gym)
+
+
+def test_hashing_provider_handles_empty_text():
+    (vector,) = asyncio.run(HashingProvider(768).embed([""], "retrieval_query"))
+
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+
+
+def test_fit_dimensions_pads_and_projects():
+    rng = np.random.default_rng(1)
+    narrow = rng.normal(size=(4, 384)).astype(np.float32)
+    wide = rng.normal(size=(4, 1024)).astype(np.float32)
+
+    padded = fit_dimensions(narrow, 768)
+    projected = fit_dimensions(wide, 768)
+
+    assert padded.shape == projected.shape == (4, 768)
+    assert cosine(padded[0], padded[1]) == pytest.approx(
+        cosine(narrow[0], narrow[1]), abs=1e-5
+    )
+    assert np.allclose(np.linalg.norm(projected, axis=1), 1.0, atol=1e-5)
+
+
+class FakeTokenizer:
+    def enable_truncation(self, max_length):
+        pass
+
+    def enable_padding(self):
+        pass
+
+    def encode_batch(self, texts):
+        width = max(len(t.split()) for t in texts)
+        return [
+            SimpleNamespace(
+                ids=[len(w) for w in t.split()] + [0] * (width - len(t.split())),
+                attention_mask=[1] * len(t.split()) + [0] * (width - len(t.split())),
+            )
+            for t in texts
+        ]
+
+
+class FakeSession:
+    def __init__(self):
+        self.batches = []
+
+    def get_inputs(self):
+        return [
+            SimpleNamespace(name="input_ids"),
+            SimpleNamespace(name="attention_mask"),
+        ]
+
+    def run(self, outputs, feeds):
+        ids = feeds["input_ids"]
+        self.batches.append(len(ids))
+        # token state = [token id, 1, 0, ...] so pooling is easy to check
+        hidden = np.zeros((*ids.shape, 384), dtype=np.float32)
+        hidden[..., 0] = ids
+        hidden[..., 1] = 1
+        return [hidden]
+
+
+def local_model(directory, weights: bytes):
+    directory.mkdir(parents=True)
+    (directory / "model.onnx").write_bytes(weights)
+    return str(directory)
+
+
+def test_local_provider_runs_batched_inference(tmp_path):
+    session = FakeSession()
+    provider = LocalProvider(
+        local_model(tmp_path / "mini", b"weights"),
+        768,
+        batch_size=2,
+        session=session,
+        tokenizer=FakeTokenizer(),
+    )
+
+    vectors = asyncio.run(provider.embed(["a", "bb", "bb cc dd"], "retrieval_document"))
+
+    assert session.batches == [2, 1]
+    assert provider.model.startswith("local:mini:")
+    assert all(len(v) == 768 for v in vectors)
+    # padding tokens are ignored: "bb cc dd" pools to [2, 1] like "bb"
+    assert vectors[1] == pytest.approx(vectors[2])
+    assert vectors[0] != pytest.approx(vectors[1])
+
+
+def test_local_model_id_tells_same_named_models_apart(tmp_path):
+    v1 = local_model_id(local_model(tmp_path / "v1" / "model", b"one"))
+    v2 = local_model_id(local_model(tmp_path / "v2" / "model", b"two"))
+
+    assert v1 != v2
+    assert v1 == local_model_id(str(tmp_path / "v1" / "model"))
+
+
+def test_providers_must_implement_embed():
+    class Incomplete(EmbeddingProvider):
+        model = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_create_provider_from_settings():
+    assert isinstance(create_provider("gemini"), GeminiProvider)
+    assert isinstance(create_provider("hashing"), HashingProvider)
+
+    with pytest.raises(ValueError):
+        create_provider("local")
+    with pytest.raises(ValueError):
+        create_provider("openai")
+
+
+def test_get_embedding_through_hashing_provider():
+    with (
+        patch("app.ai.get_provider", return_value=HashingProvider(768)),
+        patch.object(ai, "embedding_cache", EmbeddingCache(8, persist=False)),
+    ):
+        vector = asyncio.run(ai.get_embedding("walk the dog", "retrieval_query"))
+
+    assert len(vector) == 768
+
+
+def test_gemini_provider_against_the_fake_server():
+    from benchmarks.fakes import Behaviour, FakeAI
+
+    fakes = FakeAI(Behaviour(latency=0), Behaviour(latency=0)).start()
+    try:
+        provider = GeminiProvider(
+            "models/fake", 768, None, endpoint=fakes.gemini_endpoint
+        )
+        vectors = asyncio.run(
+            provider.embed(["buy milk", "gym leg day"], "retrieval_document")
+        )
+    finally:
+        fakes.stop()
+
+    expected = asyncio.run(
+        HashingProvider(768).embed(["buy milk", "gym leg day"], "retrieval_document")
+    )
+    # the vectors travel as float32
+    assert np.allclose(vectors, expected, atol=1e-6)
+    assert fakes.stats()["gemini"] == {"calls": 1, "errors": 0}
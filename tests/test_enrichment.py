@@ -0,0 +1,190 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+from app import enrichment
+from app.config import settings
+from app.models import EnrichmentJobDB
+from tests.conftest import TestingSessionLocal, TestingAsyncSessionLocal
+
+
+@pytest.fixture
+def background_mode():
+    with patch.object(settings, "ENRICHMENT_MODE", "background"):
+        yield
+
+
+@pytest.fixture
+def worker_ai():
+    with (
+        patch(
+            "app.enrichment.get_ai_summary",
+            new_callable=AsyncMock,
+            return_value="Worker Summary",
+        ) as summary,
+        patch(
+            "app.enrichment.get_embedding",
+            new_callable=AsyncMock,
+            return_value=[0.1] * 768,
+        ) as embedding,
+    ):
+        yield summary, embedding
+
+
+def run_worker_once():
+    return asyncio.run(enrichment.process_next(TestingAsyncSessionLocal))
+
+
+def test_create_task_returns_before_enrichment(
+    client, token, background_mode, worker_ai, mock_ai_summary
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    res = client.post(
+        "/tasks", json={"title": "gym", "description": "leg day"}, headers=headers
+    )
+
+    assert res.status_code == 200
+    assert res.json()["enrichment_state"] == "pending"
+    assert res.json()["summary"] is None
+    mock_ai_summary.assert_not_called()
+
+    assert run_worker_once() is True
+    assert run_worker_once() is False
+
+    task = client.get(f"/tasks/{res.json()['id']}", headers=headers).json()
+    assert task["enrichment_state"] == "ready"
+    assert task["summary"] == "Worker Summary"
+
+
+def test_update_task_requeues_enrichment(
+    client, test_task, token, background_mode, worker_ai
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    res = client.put(
+        f"/tasks/{test_task['id']}",
+        json={"description": "walk the dog"},
+        headers=headers,
+    )
+
+    assert res.status_code == 200
+    assert res.json()["description"] == "walk the dog"
+    assert res.json()["enrichment_state"] == "pending"
+
+    assert run_worker_once() is True
+    summary, _ = worker_ai
+    summary.assert_called_once_with("walk the dog")
+
+
+def test_failed_jobs_retry_then_give_up(client, token, background_mode, worker_ai):
+    headers = {"Authorization": f"Bearer {token}"}
+    task_id = client.post(
+        "/tasks", json={"title": "gym", "description": "leg day"}, headers=headers
+    ).json()["id"]
+
+    summary, _ = worker_ai
+    summary.side_effect = RuntimeError("groq is down")
+
+    with (
+        patch.object(settings, "ENRICHMENT_MAX_ATTEMPTS", 2),
+        patch.object(settings, "ENRICHMENT_RETRY_BASE_SECONDS", 0),
+    ):
+        assert run_worker_once() is True
+
+        with TestingSessionLocal() as db:
+            job = db.query(EnrichmentJobDB).one()
+            assert job.attempts == 1
+            assert job.last_error == "groq is down"
+
+        assert run_worker_once() is True
+
+    with TestingSessionLocal() as db:
+        assert db.query(EnrichmentJobDB).count() == 0
+
+    task = client.get(f"/tasks/{task_id}", headers=headers).json()
+    assert task["enrichment_state"] == "failed"
+
+
+def test_edit_during_enrichment_keeps_stale_results_out(
+    client, token, background_mode, worker_ai
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    task_id = client.post(
+        "/tasks", json={"title": "gym", "description": "leg day"}, headers=headers
+    ).json()["id"]
+
+    async def edit_meanwhile(description):
+        client.put(
+            f"/tasks/{task_id}", json={"description": "arm day"}, headers=headers
+        )
+        return "Leg day summary"
+
+    summary, _ = worker_ai
+    summary.side_effect = edit_meanwhile
+    with patch("app.enrichment.matrix_cache.upsert") as upsert:
+        assert run_worker_once() is True
+
+    upsert.assert_not_called()
+    task = client.get(f"/tasks/{task_id}", headers=headers).json()
+    assert task["summary"] is None
+    assert task["enrichment_state"] == "pending"
+
+
+def test_whitespace_edit_during_enrichment_still_completes(
+    client, token, background_mode, worker_ai
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    task_id = client.post(
+        "/tasks", json={"title": "gym", "description": "leg day"}, headers=headers
+    ).json()["id"]
+
+    async def edit_meanwhile(description):
+        client.put(
+            f"/tasks/{task_id}", json={"description": "leg  day "}, headers=headers
+        )
+        return "Leg day summary"
+
+    summary, _ = worker_ai
+    summary.side_effect = edit_meanwhile
+    assert run_worker_once() is True
+
+    task = client.get(f"/tasks/{task_id}", headers=headers).json()
+    assert task["description"] == "leg  day "
+    assert task["summary"] == "Leg day summary"
+    assert task["enrichment_state"] == "ready"
+    with TestingSessionLocal() as db:
+        assert db.query(EnrichmentJobDB).count() == 0
+
+
+def test_on_demand_worker_sleeps_while_queue_is_empty(
+    client, token, background_mode, worker_ai
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    process_next = AsyncMock(wraps=enrichment.process_next)
+
+    async def scenario():
+        stop, wake = asyncio.Event(), asyncio.Event()
+        worker = asyncio.create_task(
+            enrichment.run_worker(stop, TestingAsyncSessionLocal, wake=wake)
+        )
+        await asyncio.sleep(0.2)
+        idle_calls = process_next.await_count
+
+        task_id = client.post(
+            "/tasks", json={"title": "gym", "description": "leg day"}, headers=headers
+        ).json()["id"]
+        wake.set()
+        await asyncio.sleep(0.2)
+
+        stop.set()
+        wake.set()
+        await worker
+        return idle_calls, task_id
+
+    with (
+        patch.object(settings, "ENRICHMENT_POLL_SECONDS", 0.01),
+        patch("app.enrichment.process_next", process_next),
+    ):
+        idle_calls, task_id = asyncio.run(scenario())
+
+    assert idle_calls == 1
+    task = client.get(f"/tasks/{task_id}", headers=headers).json()
+    assert task["enrichment_state"] == "ready"
@@ -0,0 +1,47 @@
+import base64
+import csv
+import io
+import json
+from unittest.mock import patch
+import numpy as np
+from app.config import settings
+
+
+def test_export_streams_ndjson_with_embeddings(client, test_task, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    for title in ["one", "two"]:
+        client.post(
+            "/tasks", json={"title": title, "description": title}, headers=headers
+        )
+
+    with patch.object(settings, "EXPORT_BATCH_SIZE", 2):
+        res = client.get("/tasks/export?embeddings=true", headers=headers)
+
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert [row["title"] for row in rows] == ["groceries", "one", "two"]
+    assert rows[0]["status"] == "pending"
+
+    vector = np.frombuffer(base64.b64decode(rows[0]["embedding"]), "<f4")
+    assert vector.shape == (768,)
+    assert np.allclose(vector, 0.1)
+
+
+def test_export_csv_is_owner_scoped(client, test_task, token, attacker_token):
+    res = client.get(
+        "/tasks/export?format=csv", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    rows = list(csv.DictReader(io.StringIO(res.text)))
+    assert res.headers["content-disposition"] == 'attachment; filename="tasks.csv"'
+    assert [row["title"] for row in rows] == ["groceries"]
+    assert "embedding" not in rows[0]
+
+    res = client.get(
+        "/tasks/export?format=csv",
+        headers={"Authorization": f"Bearer {attacker_token}"},
+    )
+    assert res.text.strip() == ",".join(
+        ["id", "title", "description", "status", "summary", "enrichment_state"]
+    )
@@ -1,3 +1,10 @@
+import subprocess
+import sys
+from sqlalchemy import text
+from app.models import EnrichmentJobDB, TaskDB, TaskTombstoneDB
+from tests.conftest import TestingSessionLocal
+
+
 def test_create_task(client, token):
     task = {"title": "get milk", "description": "stop by store for milk after work"}
     response = client.post(
@@ -82,6 +89,82 @@ def test_update_task_description_regenerates_ai(
     mock_ai_embedding.assert_called()
 
 
+def test_update_task_only_redoes_ai_work_for_changed_content(
+    client, test_task, token, mock_ai_summary, mock_ai_embedding
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    task_id = test_task["id"]
+
+    # same content, whitespace aside: nothing to recompute
+    res = client.put(
+        f"/tasks/{task_id}",
+        json={"title": "groceries", "description": "get milk when i  get out of work"},
+        headers=headers,
+    )
+    assert res.status_code == 200
+    mock_ai_summary.assert_not_called()
+    mock_ai_embedding.assert_not_called()
+
+    # a new title changes the embedded text but not the summary
+    res = client.put(f"/tasks/{task_id}", json={"title": "errands"}, headers=headers)
+    assert res.json()["summary"] == test_task["summary"]
+    mock_ai_summary.assert_not_called()
+    mock_ai_embedding.assert_called_once_with(
+        "errands: get milk when i  get out of work", task_type="retrieval_document"
+    )
+
+
+def test_update_task_deleted_during_ai_work(client, test_task, token, mock_ai_summary):
+    headers = {"Authorization": f"Bearer {token}"}
+    task_id = test_task["id"]
+
+    async def delete_meanwhile(*args, **kwargs):
+        with TestingSessionLocal() as db:
+            db.query(TaskDB).filter(TaskDB.id == task_id).delete()
+            db.commit()
+        return "a summary"
+
+    mock_ai_summary.side_effect = delete_meanwhile
+    res = client.put(
+        f"/tasks/{task_id}",
+        json={"description": "pick up the dry cleaning"},
+        headers=headers,
+    )
+
+    assert res.status_code == 404
+
+
+def test_update_task_edited_during_ai_work_redoes_it(
+    client, test_task, token, mock_ai_summary
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    task_id = test_task["id"]
+
+    async def summarize(description):
+        if mock_ai_summary.await_count == 1:
+            with TestingSessionLocal() as db:
+                db.query(TaskDB).filter(TaskDB.id == task_id).update(
+                    {"title": "errands"}
+                )
+                db.commit()
+        return f"summary of {description}"
+
+    mock_ai_summary.side_effect = summarize
+    res = client.put(
+        f"/tasks/{task_id}",
+        json={"description": "pick up the dry cleaning"},
+        headers=headers,
+    )
+
+    assert res.status_code == 200
+    assert res.json()["title"] == "errands"
+    assert res.json()["summary"] == "summary of pick up the dry cleaning"
+    assert res.json()["enrichment_state"] == "ready"
+    assert mock_ai_summary.await_count == 2
+    with TestingSessionLocal() as db:
+        assert db.query(EnrichmentJobDB).count() == 0
+
+
 def test_read_others_task(client, test_task, attacker_token):
     task_id = test_task["id"]
 
@@ -121,6 +204,117 @@ def test_delete_other_user_task(client, test_task, attacker_token):
     assert res.status_code == 404
 
 
+def test_bulk_status_change_and_delete(client, test_task, token, attacker_token):
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = [test_task["id"]]
+    for title in ["one", "two"]:
+        res = client.post(
+            "/tasks", json={"title": title, "description": title}, headers=headers
+        )
+        ids.append(res.json()["id"])
+
+    res = client.patch(
+        "/tasks/status", json={"ids": ids[:2], "status": "completed"}, headers=headers
+    )
+    assert res.json() == {"count": 2, "ids": ids[:2]}
+
+    # another user's selection never reaches our tasks
+    res = client.request(
+        "DELETE",
+        "/tasks",
+        json={"where_status": "completed"},
+        headers={"Authorization": f"Bearer {attacker_token}"},
+    )
+    assert res.json()["count"] == 0
+
+    res = client.request(
+        "DELETE", "/tasks", json={"where_status": "completed"}, headers=headers
+    )
+    assert sorted(res.json()["ids"]) == ids[:2]
+
+    remaining = client.get("/tasks", headers=headers).json()
+    assert [t["id"] for t in remaining] == ids[2:]
+
+    res = client.request("DELETE", "/tasks", json={}, headers=headers)
+    assert res.status_code == 422
+
+
+def test_unchanged_task_list_is_not_modified(client, test_task, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    res = client.get("/tasks", headers=headers)
+    etag = res.headers["etag"]
+
+    res = client.get("/tasks", headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.content == b""
+
+    client.put(f"/tasks/{test_task['id']}/complete", headers=headers)
+    res = client.get("/tasks", headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["etag"] != etag
+
+
+def test_task_changes_since_version(client, test_task, token, attacker_token):
+    headers = {"Authorization": f"Bearer {token}"}
+    version = int(client.get("/tasks", headers=headers).headers["x-change-version"])
+
+    res = client.get(f"/tasks/changes?since={version}", headers=headers)
+    assert res.json() == {"version": version, "upserted": [], "deleted": []}
+
+    res = client.post(
+        "/tasks", json={"title": "gym", "description": "leg day"}, headers=headers
+    )
+    new = res.json()
+    # writes report the version they produced
+    assert res.headers["x-change-version"] == str(version + 1)
+    res = client.put(f"/tasks/{test_task['id']}/complete", headers=headers)
+    assert res.headers["x-change-version"] == str(version + 2)
+    client.delete(f"/tasks/{new['id']}", headers=headers)
+    # other users' changes don't show up
+    client.post(
+        "/tasks",
+        json={"title": "spam", "description": "spam"},
+        headers={"Authorization": f"Bearer {attacker_token}"},
+    )
+
+    changes = client.get(f"/tasks/changes?since={version}", headers=headers).json()
+    assert changes["version"] == version + 3
+    assert [(t["id"], t["status"]) for t in changes["upserted"]] == [
+        (test_task["id"], "completed")
+    ]
+    assert changes["deleted"] == [new["id"]]
+
+    res = client.get(f"/tasks/changes?since={version + 10}", headers=headers)
+    assert res.status_code == 410
+
+
+def test_old_tombstones_are_pruned(client, test_task, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    version = int(client.get("/tasks", headers=headers).headers["x-change-version"])
+
+    client.delete(f"/tasks/{test_task['id']}", headers=headers)
+    with TestingSessionLocal() as db:
+        db.execute(
+            text("UPDATE task_tombstones SET deleted_at = now() - interval '31 days'")
+        )
+        db.commit()
+
+    new = client.post(
+        "/tasks", json={"title": "gym", "description": "leg day"}, headers=headers
+    ).json()
+    client.delete(f"/tasks/{new['id']}", headers=headers)
+
+    with TestingSessionLocal() as db:
+        assert db.query(TaskTombstoneDB.task_id).all() == [(new["id"],)]
+
+    # the first deletion is gone, a client from before it has to reload
+    res = client.get(f"/tasks/changes?since={version}", headers=headers)
+    assert res.status_code == 410
+
+    changes = client.get(f"/tasks/changes?since={version + 1}", headers=headers).json()
+    assert changes["deleted"] == [new["id"]]
+
+
 def test_update_task(client, test_task, token):
     task_id = test_task["id"]
 
@@ -160,9 +354,23 @@ def test_filter_tasks(client, token):
     assert res.json()[0]["title"] == "get coffee"
 
 
-def test_search_privacy(client, test_task, attacker_token):
-    task = test_task
+def test_paginate_tasks(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    for title in ["one", "two", "three"]:
+        client.post(
+            "/tasks", json={"title": title, "description": title}, headers=headers
+        )
+
+    page1 = client.get("/tasks?limit=2", headers=headers)
+    assert [t["title"] for t in page1.json()] == ["one", "two"]
+    cursor = page1.headers["X-Next-Cursor"]
 
+    page2 = client.get(f"/tasks?limit=2&cursor={cursor}", headers=headers)
+    assert [t["title"] for t in page2.json()] == ["three"]
+    assert "X-Next-Cursor" not in page2.headers
+
+
+def test_search_privacy(client, test_task, attacker_token):
     res = client.post(
         "/search",
         json={"search_term": "i am hungry"},
@@ -174,8 +382,6 @@ def test_search_privacy(client, test_task, attacker_token):
 
 
 def test_search(client, test_task, token):
-    task = test_task
-
     res = client.post(
         "/search",
         json={"search_term": "milk"},
@@ -229,3 +435,18 @@ def test_user_login(client):
     assert isinstance(token.json()["access_token"], str)
     assert isinstance(token.json()["token_type"], str)
     assert token.json()["token_type"] == "bearer"
+
+
+def test_ai_sdks_are_not_imported_at_startup():
+    # they load on first use (services.get_client, GeminiProvider,
+    # auth.get_pwd_context), see benchmarks/bench_startup.py
+    code = (
+        "import sys, app.main; "
+        "print([m for m in ('groq', 'google.generativeai', 'passlib') "
+        "if m in sys.modules])"
+    )
+    res = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert res.stdout.strip() == "[]"
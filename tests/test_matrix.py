@@ -0,0 +1,121 @@
+import asyncio
+from unittest.mock import patch
+import numpy as np
+from app.config import settings
+from app.embeddings import HashingProvider
+from app.matrix import MatrixCache, UserMatrix, matrix_cache
+from tests.conftest import TestingAsyncSessionLocal
+from tests.test_search import add_task, search
+
+
+def test_user_matrix_ranks_like_cosine_distance():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8))
+    query = rng.normal(size=8)
+    matrix = UserMatrix(range(100, 150), vectors, dimensions=8)
+
+    expected = 1 - vectors @ query / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+    )
+    order = np.argsort(expected)
+
+    found = matrix.search(query, limit=5, threshold=2)
+    assert [task_id for task_id, _ in found] == (order[:5] + 100).tolist()
+    assert np.allclose([d for _, d in found], expected[order[:5]], atol=1e-5)
+
+    cutoff = (expected[order[1]] + expected[order[2]]) / 2
+    assert len(matrix.search(query, limit=5, threshold=cutoff)) == 2
+
+    matrix.upsert(200, query)
+    matrix.remove([100 + order[0]])
+    found = matrix.search(query, limit=2, threshold=2)
+    assert [task_id for task_id, _ in found] == [200, 100 + order[1]]
+    assert found[0][1] < 1e-5
+
+
+def test_matrix_cache_evicts_by_memory_budget():
+    one = UserMatrix([1, 2], np.ones((2, 4)), dimensions=4)
+    cache = MatrixCache(max_bytes=one.nbytes * 2, max_tasks=3, ttl=60)
+
+    cache.put(1, one)
+    cache.put(2, UserMatrix([3, 4], np.ones((2, 4)), dimensions=4))
+    assert cache.get(1) is one
+
+    # user 2 is least recently used now
+    cache.put(3, UserMatrix([5, 6], np.ones((2, 4)), dimensions=4))
+    assert cache.get(2) is None
+    assert cache.stats()["bytes"] == one.nbytes * 2
+
+    # growing past max_tasks drops the matrix, the user goes back to pgvector
+    cache.upsert(1, 7, np.ones(4))
+    cache.upsert(1, 8, np.ones(4))
+    assert cache.get(1) is None
+    assert cache.stats()["users"] == 1
+
+
+def test_matrix_search_follows_task_changes(client, token, mock_ai_embedding):
+    headers = {"Authorization": f"Bearer {token}"}
+    texts = [
+        "dentist: book a cleaning appointment",
+        "groceries: milk and eggs",
+        "gym: leg day",
+    ]
+    vectors = dict(zip(texts, HashingProvider(768)._embed(texts)))
+
+    with patch("app.main.get_embedding") as embedding:
+        embedding.side_effect = lambda text, task_type: vectors[text]
+        tasks = {}
+        for text in texts:
+            title, description = text.split(": ")
+            tasks[title] = add_task(client, headers, title, description)
+
+    def semantic(text):
+        mock_ai_embedding.return_value = vectors[text]
+        with patch("app.main.get_embedding", mock_ai_embedding):
+            return search(
+                client, headers, search_term="x", mode="semantic", threshold=0.5
+            )
+
+    with patch.object(settings, "VECTOR_MATRIX_SEARCH", True):
+        assert semantic("groceries: milk and eggs") == ["groceries"]
+        assert matrix_cache.stats()["users"] == 1
+
+        # re-embedded in place: the gym task now has the groceries vector
+        mock_ai_embedding.return_value = vectors["groceries: milk and eggs"]
+        res = client.put(
+            f"/tasks/{tasks['gym']['id']}",
+            json={"title": "gym", "description": "milk and eggs"},
+            headers=headers,
+        )
+        assert res.status_code == 200
+        assert sorted(semantic("groceries: milk and eggs")) == ["groceries", "gym"]
+
+        client.delete(f"/tasks/{tasks['groceries']['id']}", headers=headers)
+        assert semantic("groceries: milk and eggs") == ["gym"]
+        assert matrix_cache.stats()["misses"] == 1
+
+        # too many tasks for the matrix: same answer from pgvector
+        matrix_cache.clear()
+        with patch.object(matrix_cache, "max_tasks", 1):
+            assert semantic("dentist: book a cleaning appointment") == ["dentist"]
+        assert matrix_cache.stats()["fallbacks"] == 1
+
+
+def test_matrix_cache_keeps_changes_made_during_a_load(token):
+    cache = MatrixCache(max_bytes=2**20, max_tasks=10, ttl=60)
+
+    async def load():
+        async with TestingAsyncSessionLocal() as db:
+            execute = db.execute
+
+            async def racing_execute(*args, **kwargs):
+                # a task gets embedded after the load read the user's tasks
+                result = await execute(*args, **kwargs)
+                cache.upsert(1, 42, np.ones(768))
+                return result
+
+            with patch.object(db, "execute", racing_execute):
+                return await cache.load(db, 1)
+
+    assert asyncio.run(load()).ids.tolist() == [42]
+    assert cache.get(1).ids.tolist() == [42]
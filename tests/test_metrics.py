@@ -0,0 +1,52 @@
+from unittest.mock import patch
+import pytest
+from app import metrics
+from app.config import settings
+
+
+def test_metrics_cover_routes_queries_and_dependencies(client, token, test_task):
+    headers = {"Authorization": f"Bearer {token}"}
+    route = dict(method="GET", route="/tasks/{task_id}", status=200)
+    before = metrics.http_request_seconds.count(**route)
+    selects = metrics.db_query_seconds.count(operation="select")
+    bcrypt = metrics.dependency_call_seconds.count(dependency="bcrypt")
+
+    client.get(f"/tasks/{test_task['id']}", headers=headers)
+    client.get("/no/such/page")
+    client.post("/users/login", json={"username": "benny", "password": "password123"})
+
+    assert metrics.http_request_seconds.count(**route) == before + 1
+    assert metrics.http_request_seconds.count(
+        method="GET", route="unmatched", status=404
+    )
+    assert metrics.db_query_seconds.count(operation="select") > selects
+    assert metrics.dependency_call_seconds.count(dependency="bcrypt") == bcrypt + 1
+    assert metrics.db_pool_in_use.value() == 0
+
+    body = client.get("/metrics").text
+    assert (
+        'http_request_duration_seconds_bucket{method="GET",'
+        'route="/tasks/{task_id}",status="200",le="+Inf"}'
+    ) in body
+    assert "# TYPE db_query_duration_seconds histogram" in body
+    assert "embedding_cache_hit_ratio " in body
+    assert "summary_fast_path_ratio " in body
+
+
+def test_track_counts_errors():
+    before = metrics.dependency_errors.value(dependency="groq")
+
+    with pytest.raises(RuntimeError):
+        with metrics.track("groq"):
+            raise RuntimeError("down")
+
+    assert metrics.dependency_errors.value(dependency="groq") == before + 1
+
+
+def test_metrics_token(client):
+    with patch.object(settings, "METRICS_TOKEN", "s3cret"):
+        assert client.get("/metrics").status_code == 401
+        res = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
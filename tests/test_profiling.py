@@ -0,0 +1,65 @@
+import json
+from unittest.mock import patch
+from app.auth import create_access_token
+from app.config import settings
+from app.profiling import _read_only, create_profile_token
+
+
+def test_profile_token_writes_stack_and_sql(client, token, test_task, tmp_path):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    res = client.get("/tasks", headers={**headers, "X-Profile": "not-a-token"})
+    assert "x-profile-id" not in res.headers
+
+    with (
+        patch.object(settings, "PROFILE_DIR", str(tmp_path)),
+        patch.object(settings, "PROFILE_EXPLAIN_MS", 0),
+    ):
+        res = client.get(
+            f"/tasks/{test_task['id']}",
+            headers={**headers, "X-Profile": create_profile_token(5)},
+        )
+    assert res.status_code == 200
+    profile_id = res.headers["x-profile-id"]
+
+    speedscope = json.loads((tmp_path / f"{profile_id}.speedscope.json").read_text())
+    assert speedscope["profiles"][0]["type"] == "sampled"
+    assert speedscope["name"] == "GET /tasks/{task_id}"
+
+    sql = json.loads((tmp_path / f"{profile_id}.sql.json").read_text())
+    (select,) = [s for s in sql["statements"] if "FROM tasks" in s["statement"]]
+    assert select["ms"] >= 0
+    assert any("Execution Time" in line for line in select["plan"])
+
+
+def test_sample_rate(client, tmp_path):
+    with patch.object(settings, "PROFILE_DIR", str(tmp_path)):
+        assert "x-profile-id" not in client.get("/").headers
+        with patch.object(settings, "PROFILE_SAMPLE_RATE", 1.0):
+            assert "x-profile-id" in client.get("/").headers
+
+
+def test_profile_token_is_not_an_access_token(client, token):
+    res = client.get(
+        "/tasks", headers={"Authorization": f"Bearer {create_profile_token(5)}"}
+    )
+    assert res.status_code == 403
+
+    # nor does a bearer token count as a profile token
+    res = client.get("/", headers={"X-Profile": token})
+    assert "x-profile-id" not in res.headers
+
+    no_subject = create_access_token({"username": "nobody"})
+    res = client.get("/tasks", headers={"Authorization": f"Bearer {no_subject}"})
+    assert res.status_code == 403
+
+
+def test_only_read_only_statements_are_explained():
+    assert _read_only("SELECT id FROM tasks")
+    assert _read_only(
+        "WITH shortlist AS (SELECT id FROM tasks LIMIT 10) SELECT * FROM shortlist"
+    )
+    assert not _read_only("UPDATE tasks SET title = 'x'")
+    assert not _read_only(
+        "WITH gone AS (DELETE FROM tasks RETURNING id) SELECT count(*) FROM gone"
+    )
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from unittest.mock import patch
+from sqlalchemy import update
+from app.ai import embedding_stamp
+from app.config import settings
+from app.models import TaskDB
+from app.reembed import reembed
+from tests.conftest import TestingSessionLocal, TestingAsyncSessionLocal
+
+
+def add_tasks(client, headers, *titles):
+    ids = []
+    for title in titles:
+        res = client.post(
+            "/tasks", json={"title": title, "description": "x y z w"}, headers=headers
+        )
+        ids.append(res.json()["id"])
+    return ids
+
+
+def make_stale(ids, model="old-model"):
+    with TestingSessionLocal() as db:
+        db.execute(
+            update(TaskDB).where(TaskDB.id.in_(ids)).values(embedding_model=model)
+        )
+        db.commit()
+
+
+def test_search_only_compares_the_current_model(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    add_tasks(client, headers, "dentist", "plumber")
+    make_stale(add_tasks(client, headers, "groceries"))
+
+    for matrix in (False, True):
+        with patch.object(settings, "VECTOR_MATRIX_SEARCH", matrix):
+            res = client.post(
+                "/search",
+                json={"search_term": "who fixes things", "mode": "semantic"},
+                headers=headers,
+            )
+        assert {task["title"] for task in res.json()} == {"dentist", "plumber"}
+
+
+def test_reembed_resumes_and_skips_edited_tasks(client, token, tmp_path):
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = add_tasks(client, headers, "a", "b", "c", "d")
+    make_stale(ids)
+
+    stamp = embedding_stamp()
+    checkpoint = tmp_path / "checkpoint.json"
+    run = f"{stamp['embedding_model']}@{stamp['embedding_version']}"
+    # an earlier run got through the first task
+    checkpoint.write_text(json.dumps({run: ids[0], "other@1": 99}))
+
+    async def embeddings(texts, task_type):
+        # "c" is edited while its batch is being embedded
+        with TestingSessionLocal() as db:
+            db.execute(update(TaskDB).where(TaskDB.id == ids[2]).values(title="C"))
+            db.commit()
+        return [[0.2] * 768 for _ in texts]
+
+    with patch("app.reembed.get_embeddings", side_effect=embeddings) as embed:
+        updated = asyncio.run(
+            reembed(
+                batch_size=1,
+                concurrency=2,
+                checkpoint=str(checkpoint),
+                session_factory=TestingAsyncSessionLocal,
+            )
+        )
+
+    assert updated == 2
+    assert embed.call_count == 3
+    assert json.loads(checkpoint.read_text()) == {run: ids[3], "other@1": 99}
+
+    with TestingSessionLocal() as db:
+        models = dict(db.query(TaskDB.title, TaskDB.embedding_model).all())
+    assert models == {
+        "a": "old-model",
+        "b": stamp["embedding_model"],
+        "C": "old-model",
+        "d": stamp["embedding_model"],
+    }
@@ -0,0 +1,198 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+import pytest
+from app.config import settings
+from app.models import EnrichmentJobDB
+from app.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Guard,
+    breaker_transitions,
+)
+from tests.conftest import TestingSessionLocal
+
+
+def test_breaker_opens_then_probes_half_open():
+    breaker = CircuitBreaker("test-breaker", failures=2, reset_seconds=0.05)
+
+    for _ in range(2):
+        probe = breaker.before_call()
+        breaker.record(False, probe)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    asyncio.run(asyncio.sleep(0.06))
+    # one probe at a time; it failing reopens the circuit
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(False, True)
+    assert breaker.state == "open"
+
+    asyncio.run(asyncio.sleep(0.06))
+    breaker.record(True, breaker.before_call())
+    assert breaker.state == "closed"
+    assert breaker_transitions.value(dependency="test-breaker", state="open") == 2
+    assert breaker_transitions.value(dependency="test-breaker", state="closed") == 1
+
+
+def test_guard_deadline_and_fail_fast():
+    calls = 0
+
+    async def hang():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(1)
+
+    with patch.object(settings, "AI_BREAKER_FAILURES", 2):
+        guard = Guard("test-deadline")
+
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(guard.call(hang, timeout=0.01))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(guard.call(hang, timeout=0.01))
+
+    assert calls == 2
+
+
+def test_guard_breaker_ignores_errors_that_are_not_outages():
+    async def misconfigured():
+        raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+    with patch.object(settings, "AI_BREAKER_FAILURES", 2):
+        guard = Guard("test-misconfigured")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            asyncio.run(guard.call(misconfigured, timeout=1))
+
+    assert guard.breaker.state == "closed"
+
+
+def test_guard_hedges_slow_calls():
+    attempts = []
+
+    async def attempt():
+        attempts.append(len(attempts))
+        # the first request stalls, the hedge answers quickly
+        await asyncio.sleep(1 if len(attempts) == 1 else 0.001)
+        return len(attempts)
+
+    guard = Guard("test-hedge")
+    for _ in range(20):
+        guard.latencies.add(0.01)
+
+    with patch.object(settings, "AI_HEDGE_PERCENTILE", 95):
+        result = asyncio.run(guard.call(attempt, timeout=0.5))
+
+    assert result == 2
+    assert attempts == [0, 1]
+
+
+def test_degraded_mode_stores_and_searches_without_ai(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with patch("app.main.get_embedding", side_effect=CircuitOpenError("down")):
+        res = client.post(
+            "/tasks",
+            json={"title": "dentist", "description": "book a cleaning appointment"},
+            headers=headers,
+        )
+        assert res.status_code == 200
+        assert res.json()["enrichment_state"] == "pending"
+        assert res.json()["summary"] is None
+
+        res = client.post(
+            "/search",
+            json={"search_term": "dentist appointment", "mode": "semantic"},
+            headers=headers,
+        )
+        assert res.headers["x-search-degraded"] == "lexical"
+        assert [task["title"] for task in res.json()] == ["dentist"]
+
+    with TestingSessionLocal() as db:
+        assert db.query(EnrichmentJobDB).count() == 1
+
+    with (
+        patch("app.main.get_embedding", side_effect=CircuitOpenError("down")),
+        patch.object(settings, "AI_DEGRADED_MODE", False),
+        pytest.raises(CircuitOpenError),
+    ):
+        client.post("/search", json={"search_term": "x y z w"}, headers=headers)
+
+
+def test_degraded_mode_only_covers_outages(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    task = {"title": "dentist", "description": "book a cleaning appointment"}
+
+    with patch("app.main.get_embedding", side_effect=asyncio.TimeoutError()):
+        res = client.post("/tasks", json=task, headers=headers)
+    assert res.json()["enrichment_state"] == "pending"
+
+    # a bug is not an outage, it still fails the request
+    with (
+        patch("app.main.get_embedding", side_effect=KeyError("embedding")),
+        pytest.raises(KeyError),
+    ):
+        client.post("/tasks", json=task, headers=headers)
+
+
+def test_inline_update_after_outage_supersedes_queued_job(
+    client, token, mock_ai_summary, mock_ai_embedding
+):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with patch("app.main.get_embedding", side_effect=CircuitOpenError("down")):
+        res = client.post(
+            "/tasks",
+            json={"title": "dentist", "description": "book a cleaning appointment"},
+            headers=headers,
+        )
+    task_id = res.json()["id"]
+
+    # the AI is back: the edit enriches the task inline
+    res = client.put(
+        f"/tasks/{task_id}", json={"description": "call to reschedule"}, headers=headers
+    )
+    assert res.json()["enrichment_state"] == "ready"
+    assert res.json()["summary"] == "Mocked AI Summary"
+
+    with TestingSessionLocal() as db:
+        assert db.query(EnrichmentJobDB).count() == 0
+
+
+def test_inline_update_after_outage_refreshes_stale_summary(
+    client, token, mock_ai_summary, mock_ai_embedding
+):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with patch(
+        "app.main.get_ai_summary", new_callable=AsyncMock, return_value="Dentist"
+    ):
+        res = client.post(
+            "/tasks",
+            json={"title": "dentist", "description": "book a cleaning appointment"},
+            headers=headers,
+        )
+    task_id = res.json()["id"]
+
+    # the description changes while the AI is down: the old summary stays
+    mock_ai_embedding.side_effect = CircuitOpenError("down")
+    res = client.put(
+        f"/tasks/{task_id}", json={"description": "call to reschedule"}, headers=headers
+    )
+    assert res.json()["enrichment_state"] == "pending"
+    assert res.json()["summary"] == "Dentist"
+
+    # the AI is back: a title-only edit still summarizes the new description
+    mock_ai_embedding.side_effect = None
+    mock_ai_summary.return_value = "Reschedule"
+    res = client.put(f"/tasks/{task_id}", json={"title": "dentist!"}, headers=headers)
+    assert res.json()["enrichment_state"] == "ready"
+    assert res.json()["summary"] == "Reschedule"
+    mock_ai_summary.assert_called_with("call to reschedule")
+
+    with TestingSessionLocal() as db:
+        assert db.query(EnrichmentJobDB).count() == 0
@@ -0,0 +1,124 @@
+import asyncio
+from unittest.mock import patch
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud
+from app.config import settings
+from app.embeddings import HashingProvider
+from app.models import TaskDB
+from tests.conftest import async_test_engine, TestingSessionLocal
+
+
+def test_hnsw_settings_are_transaction_local():
+    async def check():
+        # stay on one connection, the test engine doesn't pool them
+        async with async_test_engine.connect() as conn:
+            db = AsyncSession(bind=conn)
+            # loads the extension library, which registers the hnsw.* settings
+            await db.execute(text("SELECT '[1]'::vector"))
+            await db.commit()
+
+            await crud.apply_hnsw_settings(db)
+            assert await db.scalar(text("SHOW hnsw.ef_search")) == "123"
+
+            await db.rollback()
+            assert await db.scalar(text("SHOW hnsw.ef_search")) == "40"
+
+    with patch.object(settings, "HNSW_EF_SEARCH", 123):
+        asyncio.run(check())
+
+
+def add_task(client, headers, title, description):
+    res = client.post(
+        "/tasks", json={"title": title, "description": description}, headers=headers
+    )
+    assert res.status_code == 200
+    return res.json()
+
+
+def search(client, headers, **body):
+    res = client.post("/search", json=body, headers=headers)
+    assert res.status_code == 200
+    return [task["title"] for task in res.json()]
+
+
+def test_short_terms_skip_the_embedding_call(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    add_task(client, headers, "ticket OPS-4521", "rotate the staging certificates")
+    add_task(client, headers, "dentist", "book a cleaning appointment")
+
+    with patch("app.main.get_embedding") as embedding:
+        assert search(client, headers, search_term="OPS-4521") == ["ticket OPS-4521"]
+        assert search(client, headers, search_term='"staging certificates"') == [
+            "ticket OPS-4521"
+        ]
+        assert search(client, headers, search_term='"staging dentist"') == []
+
+    embedding.assert_not_called()
+
+
+def test_hybrid_search_fuses_keyword_and_vector_hits(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    add_task(client, headers, "dentist", "book a cleaning appointment")
+    add_task(client, headers, "call mom", "ask about the dentist she recommended")
+    add_task(client, headers, "groceries", "milk and eggs")
+
+    # every mocked embedding is identical, so each task is a semantic hit and
+    # the keyword side decides the order
+    titles = search(client, headers, search_term="find my dentist appointment")
+
+    assert titles[:2] == ["dentist", "call mom"]
+    assert set(titles) == {"dentist", "call mom", "groceries"}
+    assert search(client, headers, search_term="dentist", mode="hybrid", limit=1) == [
+        "dentist"
+    ]
+
+
+def test_search_modes_and_threshold(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    add_task(client, headers, "dentist", "book a cleaning appointment")
+
+    assert search(client, headers, search_term="plumber", mode="lexical") == []
+    assert search(client, headers, search_term="plumber", mode="semantic") == [
+        "dentist"
+    ]
+    assert (
+        search(client, headers, search_term="plumber", mode="semantic", threshold=0)
+        == []
+    )
+    # nothing matches the keyword, so auto falls back to hybrid
+    assert search(client, headers, search_term="plumber") == ["dentist"]
+
+
+def test_binary_search_reranks_shortlist_exactly(client, token, mock_ai_embedding):
+    headers = {"Authorization": f"Bearer {token}"}
+    texts = [
+        "dentist: book a cleaning appointment",
+        "groceries: milk and eggs",
+        "gym: leg day",
+    ]
+    vectors = dict(zip(texts, HashingProvider(768)._embed(texts)))
+
+    with patch("app.main.get_embedding") as embedding:
+        embedding.side_effect = lambda content, task_type: vectors[content]
+        for content in texts:
+            title, description = content.split(": ")
+            add_task(client, headers, title, description)
+
+    with TestingSessionLocal() as db:
+        bits = db.query(TaskDB.embeddings_bq).filter(TaskDB.title == "gym").scalar()
+    assert bits == "".join("1" if x > 0 else "0" for x in vectors["gym: leg day"])
+
+    mock_ai_embedding.return_value = vectors["groceries: milk and eggs"]
+    with (
+        patch.object(settings, "VECTOR_BINARY_SEARCH", True),
+        patch.object(settings, "VECTOR_RERANK_CANDIDATES", 2),
+        patch("app.main.get_embedding", mock_ai_embedding),
+    ):
+        titles = search(
+            client, headers, search_term="x", mode="semantic", threshold=2, limit=1
+        )
+        hybrid = search(client, headers, search_term="milk please", mode="hybrid")
+
+    assert titles == ["groceries"]
+    assert hybrid[0] == "groceries"
@@ -0,0 +1,109 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+import pytest
+from app import services
+from app.cache import SummaryCache, summary_cache_key
+from tests.conftest import TestingAsyncSessionLocal
+
+
+@pytest.fixture
+def groq():
+    reply = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=" Plan the offsite "))]
+    )
+    cache = SummaryCache(maxsize=8, session_factory=TestingAsyncSessionLocal)
+
+    with (
+        patch.object(services, "summary_cache", cache),
+        patch.object(services, "fast_path_hits", 0),
+        patch.object(services, "llm_calls", 0),
+        patch.object(
+            services.get_client().chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=reply,
+        ) as create,
+    ):
+        yield create
+
+
+def test_short_descriptions_skip_the_llm(groq):
+    assert asyncio.run(services.get_ai_summary("  milk ")) == "Milk"
+    assert asyncio.run(services.get_ai_summary("call the bank.")) == "Call the bank"
+    assert asyncio.run(services.get_ai_summary("   ")) == "No description"
+
+    groq.assert_not_called()
+    assert services.summary_stats()["fast_path_hits"] == 2
+
+
+def test_repeated_descriptions_are_summarized_once(groq):
+    text = "book a venue, caterer and travel for the team offsite in march"
+
+    first = asyncio.run(services.get_ai_summary(text))
+    second = asyncio.run(services.get_ai_summary(text.replace(" ", "  ")))
+
+    assert first == second == "Plan the offsite"
+    groq.assert_called_once()
+
+    # a restarted process finds it in the table
+    services.summary_cache.memory.clear()
+    assert asyncio.run(services.get_ai_summary(text)) == "Plan the offsite"
+    groq.assert_called_once()
+
+    stats = services.summary_stats()
+    assert stats["memory_hits"] == 1
+    assert stats["db_hits"] == 1
+    assert stats["llm_calls"] == 1
+
+
+def test_summary_key_depends_on_model_and_prompt_version():
+    key = summary_cache_key("walk the dog", "llama-3.1-8b-instant", 1)
+
+    assert key == summary_cache_key("walk  the dog ", "llama-3.1-8b-instant", 1)
+    assert key != summary_cache_key("walk the dog", "llama-3.3-70b-versatile", 1)
+    assert key != summary_cache_key("walk the dog", "llama-3.1-8b-instant", 2)
+
+
+def test_bulk_summaries_batch_descriptions_and_fall_back_per_item(groq):
+    texts = [f"prepare the quarterly report for region {i}" for i in range(5)]
+    texts.append("milk")
+
+    async def reply(messages, **kwargs):
+        lines = messages[-1]["content"].splitlines()
+        if len(lines) == 1:
+            content = "Single summary"
+        elif "region 3" in messages[-1]["content"]:
+            content = "not numbered"
+        else:
+            content = "\n".join(f"{i}. Report {i}" for i in range(1, len(lines) + 1))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+    groq.side_effect = reply
+    with patch.object(services.settings, "SUMMARY_BATCH_SIZE", 3):
+        summaries = asyncio.run(services.get_ai_summaries(texts + texts[:1]))
+
+    assert summaries[:3] == ["Report 1", "Report 2", "Report 3"]
+    # the second batch came back garbled, each of its items was retried alone
+    assert summaries[3:5] == ["Single summary", "Single summary"]
+    assert summaries[5:] == ["Milk", "Report 1"]
+    assert groq.call_count == 4
+
+
+def test_bulk_summaries_raise_errors_that_are_not_ai_failures(groq):
+    texts = [f"prepare the quarterly report for region {i}" for i in range(3)]
+    groq.side_effect = KeyError("choices")
+
+    with pytest.raises(KeyError):
+        asyncio.run(services.get_ai_summaries(texts))
+
+    # an outage is a failed summary, each item was retried alone
+    groq.side_effect = asyncio.TimeoutError()
+    groq.reset_mock()
+    services.groq_guard.breaker.reset()
+    summaries = asyncio.run(services.get_ai_summaries(texts))
+
+    assert all(isinstance(s, asyncio.TimeoutError) for s in summaries)
+    assert groq.call_count == 4